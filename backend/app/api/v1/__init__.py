@@ -12,7 +12,9 @@ from app.api.v1.issue import issue_router
 from app.api.v1.sprint import sprint_router
 from app.api.v1.logs_api import logs_router
 from app.api.v1.websocket import websocket_router
+from app.api.v1.sse import sse_router
 from app.api.v1.webhook import webhook_router
+from app.api.v1.admin import admin_router
 
 
 
@@ -25,4 +27,6 @@ api_router.include_router(issue_router,prefix='/issue',tags=['Issue'])
 api_router.include_router(sprint_router,prefix='/sprint',tags=['Sprint'])
 api_router.include_router(logs_router,prefix='/logs',tags=['Logs'])
 api_router.include_router(websocket_router,tags=['Websocket'])
+api_router.include_router(sse_router,tags=['SSE'])
 api_router.include_router(webhook_router,prefix='/webhook',tags=['Webhook'])
+api_router.include_router(admin_router,prefix='/admin',tags=['Admin'])
@@ -0,0 +1,67 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.dependencies import allow_min_role
+from app.models.model import User
+from app.core.enums import Role
+from app.core.profiler import list_profiles, load_profile
+from app.services.slow_query_log import slow_query_log
+from app.common.errors import NotFoundError
+
+admin_router = APIRouter()
+
+
+@admin_router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=500),
+    min_ms: float = Query(0, ge=0),
+    current_user: User = Depends(allow_min_role(Role.ADMIN)),
+):
+    """
+    Recent slow statements of this API process, newest first, with their
+    bound parameters and EXPLAIN (ANALYZE, BUFFERS) plan once captured
+    """
+    return {
+        "success": True,
+        "message": "Slow queries fetched successfully",
+        "data": slow_query_log.recent(limit=limit, min_ms=min_ms)
+    }
+
+
+@admin_router.get("/profiles")
+async def get_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(allow_min_role(Role.ADMIN)),
+):
+    """
+    Recent request profiles, newest first, without their stacks
+    """
+    return {
+        "success": True,
+        "message": "Profiles fetched successfully",
+        "data": await asyncio.to_thread(list_profiles, limit)
+    }
+
+
+@admin_router.get("/profiles/{request_id}")
+async def get_profile(
+    request_id: str,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    current_user: User = Depends(allow_min_role(Role.ADMIN)),
+):
+    """
+    Profile of one request; format=collapsed returns the stacks as plain text
+    for flamegraph.pl or speedscope
+    """
+    profile = await asyncio.to_thread(load_profile, request_id)
+    if not profile:
+        raise NotFoundError(message=f"No profile for request {request_id}")
+    if format == "collapsed":
+        return PlainTextResponse(profile["collapsed"])
+    return {
+        "success": True,
+        "message": "Profile fetched successfully",
+        "data": profile
+    }
@@ -9,8 +9,8 @@ from app.common.errors import NotFoundError, DatabaseErrors, PermissionDeniedErr
 from app.core.enums import IssueStatus, Role
 from app.schemas.issue import CreateIssueRequest, UpdateIssueRequest
 from app.db.crud.logs_crud import get_logs_by_issue_id
-from app.common.email_template import send_issue_assigned_mail, send_issue_status_update_mail
-from app.common.logging import Logger
+from app.common.email_template import send_issue_assigned_mail, notify_issue_status_change
+from app.common.logging import get_logger
 from app.db.crud.issue_crud import (
     get_all_issues,
     get_issue_by_id,
@@ -23,7 +23,17 @@ from app.db.crud.issue_crud import (
 from app.db.crud.user import get_user_by_id
 from app.services.email_service import send_email
 from app.tasks.email_task import send_email_task
-from app.services.redis_publisher import redis_publisher
+from app.services.redis_publisher import (
+    issue_event_data,
+    issue_filter_fields,
+    issue_created_event,
+    issue_updated_event,
+    issue_deleted_event,
+)
+from app.services.outbox import stage_redis_event, outbox_relay
+from app.common.logging.request import request_stage
+
+Logger = get_logger(__name__)
 
 issue_router = APIRouter()
 
@@ -85,10 +95,12 @@ async def create_issue_api(
     Create a new issue
     """
     issue_data = request.model_dump()
+    # Issue, Redis event and email are committed together (outbox), the relay delivers them afterwards
     created_issue = await create_issue(     
         session = session,  
         user_id = current_user.id,
-        payload = issue_data
+        payload = issue_data,
+        commit = False
     )
 
     if not created_issue:
@@ -98,30 +110,17 @@ async def create_issue_api(
         user = await get_user_by_id(user_id=issue_data.get('assigned_to'), session=session)
         if user:
             issue = await get_issue_by_id(issue_id=created_issue.id, session=session)
-            Logger.info(f"Issue assigned mail sent to {user.email}")
-            await send_issue_assigned_mail(assigned_to=user, issue=issue, assigned_by=current_user)
+            Logger.info(f"Issue assigned mail queued for {user.email}")
+            await send_issue_assigned_mail(assigned_to=user, issue=issue, assigned_by=current_user, session=session)
 
     # Convert SQLAlchemy model to dict for Redis publishing
-    issue_dict = {
-        "id": created_issue.id,
-        "name": created_issue.name,
-        "description": created_issue.description,
-        "status": created_issue.status.value if hasattr(created_issue.status, 'value') else str(created_issue.status),
-        "priority": created_issue.priority.value if hasattr(created_issue.priority, 'value') else str(created_issue.priority),
-        "type": created_issue.type.value if hasattr(created_issue.type, 'value') else str(created_issue.type),
-        "assigned_to": created_issue.assigned_to,
-        "assigned_by": created_issue.assigned_by,
-        "project_id": created_issue.project_id,
-        "sprint_id": created_issue.sprint_id,
-        "story_point": created_issue.story_point,
-        "time_estimate": float(created_issue.time_estimate) if created_issue.time_estimate else None,
-        "created_at": created_issue.created_at.isoformat() if created_issue.created_at else None,
-        "updated_at": created_issue.updated_at.isoformat() if created_issue.updated_at else None,
-    }
+    issue_dict = issue_event_data(created_issue)
     
-    # publish issue update to redis pub/sub
-    await redis_publisher.publish_issue_created(project_id=created_issue.project_id, issue_data=issue_dict)
+    # stage the issue_created event for redis pub/sub
+    stage_redis_event(session, *issue_created_event(project_id=created_issue.project_id, issue_data=issue_dict))
 
+    await session.commit()
+    outbox_relay.notify()
 
 
     return {
@@ -147,77 +146,42 @@ async def update_issue_api(
         raise PermissionDeniedError(message="You are not authorized to update issue status", response_code=status.HTTP_403_FORBIDDEN)
     
     # Get the issue before updating to capture old status
-    old_issue = await get_issue_by_id(issue_id=issue_id, session=session)
+    with request_stage("load"):
+        old_issue = await get_issue_by_id(issue_id=issue_id, session=session)
     if not old_issue:
         raise NotFoundError(message="Issue not found", response_code=status.HTTP_404_NOT_FOUND)
     
     old_status = old_issue.status.value if hasattr(old_issue.status, 'value') else str(old_issue.status)
+    # Filterable fields before the update, so filtered subscribers see issues leaving their view
+    previous_data = issue_filter_fields(old_issue)
     
-    updated_issue = await update_issue(session=session, issue_id=issue_id, payload=issue_data)
+    # Issue, Redis event and emails are committed together (outbox), the relay delivers them afterwards
+    with request_stage("update"):
+        updated_issue = await update_issue(session=session, issue_id=issue_id, payload=issue_data, commit=False)
 
     if not updated_issue:
         raise DatabaseErrors(message="Failed to update issue", response_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     # Reload issue with all relationships for email
-    updated_issue = await get_issue_by_id(issue_id=issue_id, session=session)
+    with request_stage("reload"):
+        updated_issue = await get_issue_by_id(issue_id=issue_id, session=session)
     if not updated_issue:
         raise DatabaseErrors(message="Failed to reload updated issue", response_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     # Convert SQLAlchemy model to dict for Redis publishing
-    issue_dict = {
-        "id": updated_issue.id,
-        "name": updated_issue.name,
-        "description": updated_issue.description,
-        "status": updated_issue.status.value if hasattr(updated_issue.status, 'value') else str(updated_issue.status),
-        "priority": updated_issue.priority.value if hasattr(updated_issue.priority, 'value') else str(updated_issue.priority),
-        "type": updated_issue.type.value if hasattr(updated_issue.type, 'value') else str(updated_issue.type),
-        "assigned_to": updated_issue.assigned_to,
-        "assigned_by": updated_issue.assigned_by,
-        "project_id": updated_issue.project_id,
-        "sprint_id": updated_issue.sprint_id,
-        "story_point": updated_issue.story_point,
-        "time_estimate": float(updated_issue.time_estimate) if updated_issue.time_estimate else None,
-        "created_at": updated_issue.created_at.isoformat() if updated_issue.created_at else None,
-        "updated_at": updated_issue.updated_at.isoformat() if updated_issue.updated_at else None,
-        "assignee": {
-            "id": updated_issue.assignee.id,
-            "name": updated_issue.assignee.name
-        } if updated_issue.assignee else None,
-        "reporter": {
-            "id": updated_issue.reporter.id,
-            "name": updated_issue.reporter.name
-        } if updated_issue.reporter else None,
-    }
+    issue_dict = issue_event_data(updated_issue, include_people=True)
     
-    # publish issue update to redis pub/sub
-    print(f"[ISSUE UPDATE] Publishing issue update to Redis for project {updated_issue.project_id}, issue {updated_issue.id}")
-    await redis_publisher.publish_issue_update(project_id=updated_issue.project_id, issue_data=issue_dict)
-    print(f"[ISSUE UPDATE] Published issue update to Redis for project {updated_issue.project_id}, issue {updated_issue.id}")
+    # stage the issue_updated event for redis pub/sub
+    stage_redis_event(session, *issue_updated_event(project_id=updated_issue.project_id, issue_data=issue_dict, previous_data=previous_data))
 
     # Send status update email if status changed
     if issue_status and old_status != updated_issue.status.value:
-        recipients = []
-        
-        # Add assignee if exists
-        if updated_issue.assignee and updated_issue.assignee.id != current_user.id:
-            recipients.append(updated_issue.assignee)
-        
-        # Add reporter if exists and different from assignee and current user
-        if updated_issue.reporter:
-            if updated_issue.reporter.id != current_user.id and updated_issue.reporter.id != (updated_issue.assignee.id if updated_issue.assignee else None):
-                recipients.append(updated_issue.reporter)
-        
-        # Add current user if not already in recipients
-        if current_user.id not in [r.id for r in recipients]:
-            recipients.append(current_user)
-        
-        if recipients:
-            await send_issue_status_update_mail(
-                issue=updated_issue,
-                old_status=old_status,
-                updated_by=current_user,
-                recipients=recipients
-            )
+        with request_stage("notify"):
+            await notify_issue_status_change(issue=updated_issue, old_status=old_status, updated_by=current_user, session=session)
+
+    with request_stage("commit"):
+        await session.commit()
+    outbox_relay.notify()
     
     return {
         "success": True,
@@ -238,12 +202,16 @@ async def delete_issue_api(
     if not issue:
         raise NotFoundError(message="Issue not found", response_code=status.HTTP_404_NOT_FOUND)
 
-    success = await delete_issue(session = session, issue_id = issue_id)
+    project_id, assigned_to = issue.project_id, issue.assigned_to
+    success = await delete_issue(session = session, issue_id = issue_id, commit = False)
     if not success:
         raise DatabaseErrors(message="Failed to delete issue", response_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    # publish issue update to redis pub/sub
-    await redis_publisher.publish_issue_deleted(project_id=issue.project_id, issue_id=issue_id)
+    # stage the issue_deleted event for redis pub/sub, committed with the delete
+    stage_redis_event(session, *issue_deleted_event(project_id=project_id, issue_id=issue_id, assigned_to=assigned_to))
+
+    await session.commit()
+    outbox_relay.notify()
 
     return {
         "success": True,
@@ -16,7 +16,9 @@ from app.db.crud.logs_crud import (
 )
 from app.common.errors import NotFoundError,DatabaseErrors
 from app.schemas.logs import CreateLogRequest,UpdateLogRequest
-from app.common.logging.logging_config import Logger
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
 
 
 
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.connection import get_db
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, get_current_user_id
 from app.models.model import User
 from app.db.crud.project_crud import (
     get_all_projects,
@@ -12,6 +12,8 @@ from app.db.crud.project_crud import (
 )
 from app.common.errors import NotFoundError, DatabaseErrors
 from app.schemas.project import ProjectRequest, ProjectUpdateRequest
+from app.services.presence_service import presence_service
+from app.core.membership import is_member_of_project, invalidate_project_members
 
 
 
@@ -80,6 +82,7 @@ async def create_new_project(
     )
     if not project:
         raise DatabaseErrors(message="Failed to create project")
+    await invalidate_project_members(project.id)
 
    
     return {
@@ -147,6 +150,8 @@ async def delete_project_api(
     )
     if not success:
         raise DatabaseErrors(message="Failed to delete project")
+    await invalidate_project_members(project.id)
+
 
     return {
         "success": True,
@@ -154,6 +159,26 @@ async def delete_project_api(
         "data": None
     }
 
+@project_router.get("/{project_id}/presence")
+async def get_project_presence_api(
+    project_id: int,
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """
+    Get the users currently connected to a project, read from Redis.
+    Membership comes from its cache, so the database is only hit on a miss.
+    """
+    if not await is_member_of_project(project_id, current_user_id):
+        raise NotFoundError(message="Project not found")
+
+    users = await presence_service.get_presence(project_id)
+
+    return {
+        "success": True,
+        "message": "Project presence fetched successfully",
+        "data": users
+    }
+
 @project_router.get("/{project_id}/team")
 async def get_all_team_members_api(
     project_id:int,
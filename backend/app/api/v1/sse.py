@@ -0,0 +1,94 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from app.core.websocket_manager import manager
+from app.core.principal import Principal
+from app.core.dependencies import get_principal_from_token
+from app.core.conf import WS_HEARTBEAT_SECONDS
+from app.core.event_codec import EncodedEvent
+from app.common.logging.logging_config import get_logger
+from app.api.v1.websocket import parse_subscription_filter
+
+Logger = get_logger(__name__)
+
+sse_router = APIRouter()
+
+
+async def _authenticate(request: Request) -> Principal:
+    """
+    EventSource can't send headers, so the token may come as ?token=xxx;
+    a Bearer Authorization header works too.
+    """
+    token = request.query_params.get("token")
+    authorization = request.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    return await get_principal_from_token(token)
+
+
+def _format_event(event: EncodedEvent) -> str:
+    # The JSON frame is a single line, so it fits in one data field
+    return f"id: {event.id}\nevent: {event.type or 'message'}\ndata: {event.json_frame}\n\n"
+
+
+@sse_router.get("/sse/issues/{project_id}")
+async def project_event_stream(project_id: int, request: Request):
+    """
+    Server-Sent Events feed of project updates for read-only screens
+    Token in query params (?token=xxx) or Authorization header
+    Accepts the same filters as the WebSocket: ?sprint_id=1,2&assignee=me&issue_type=bug
+    Resumes after the Last-Event-ID header (or ?last_event_id=); if that event is
+    no longer buffered a "resync" event tells the client to refetch
+    """
+    user = await _authenticate(request)
+    last_event_id: Optional[str] = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+
+    filters = parse_subscription_filter(request, user.id)
+
+    async def event_generator():
+        # Registered only once the response streams: a client gone before the first
+        # iteration never runs this generator, so its finally couldn't close the stream
+        stream = await manager.open_stream(project_id=project_id, user_id=user.id, filters=filters)
+        try:
+            yield f"retry: {WS_HEARTBEAT_SECONDS * 1000}\n\n"
+
+            sent_ids = set()
+            if last_event_id:
+                missed = manager.replay_since(project_id, last_event_id)
+                if missed is None:
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    for event in missed:
+                        if stream.filters.matches(event.route):
+                            sent_ids.add(event.id)
+                            yield _format_event(event)
+
+            while True:
+                try:
+                    event = await stream.next_event(timeout=WS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+
+                if event is None:
+                    break
+                if stream.overflowed:
+                    # Fell too far behind - let the client reconnect and resume
+                    Logger.warning(f"SSE stream for user {user.id} on project {project_id} overflowed")
+                    yield "event: resync\ndata: {}\n\n"
+                    break
+                if event.id in sent_ids:
+                    continue
+                yield _format_event(event)
+        finally:
+            manager.close_stream(stream)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
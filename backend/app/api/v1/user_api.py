@@ -16,6 +16,7 @@ from app.db.crud.user import get_user_by_id
 from app.common.errors import NotFoundError,PermissionDeniedError
 from typing import Optional
 from app.db.crud.user import get_all_team_users_under_manager,get_all_managers
+from app.core.principal import invalidate_principal
 
 
 
@@ -147,6 +148,7 @@ async def update_password(
     await session.delete(invite_token)
     await session.commit()
     await session.refresh(user)
+    await invalidate_principal(user.id)
 
     return {
         "message": "Password updated successfully",
@@ -178,6 +180,7 @@ async def delete_user(
 
     await session.delete(user)
     await session.commit()
+    await invalidate_principal(user_id)
 
     return {
         "message": f"User {user.email} deleted successfully."
@@ -227,6 +230,7 @@ async def update_user(
         setattr(user,key,value)
     await session.commit()
     await session.refresh(user)
+    await invalidate_principal(user_id)
     return {
         "success": True,
         "message": "User updated successfully",
@@ -1,75 +1,79 @@
+from typing import Optional, Set
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from starlette.requests import HTTPConnection
 from app.core.websocket_manager import manager
-from app.core.security import decode_token
-from app.db.connection import AsyncSessionLocal
-from app.db.crud.user import get_user_by_id
-from app.common.logging.logging_config import Logger
-import json
+from app.core.connection_registry import SubscriptionFilter
+from app.core.principal import Principal
+from app.core.dependencies import get_principal_from_token
+from app.core.event_codec import MSGPACK_SUBPROTOCOL, PROTOCOL_JSON, PROTOCOL_MSGPACK, decode_client_frame
+from app.services.board_commands import BOARD_COMMANDS, handle_board_command
+from app.common.errors import CredentialError
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
 
 websocket_router = APIRouter()
 
-@websocket_router.websocket("/ws/issues/{project_id}")
-async def websocket_endpoint(
-    websocket: WebSocket,
-    project_id: int,
-):
+
+def _parse_int_set(raw: Optional[str], current_user_id: int) -> Set[int]:
+    """Parse a comma separated id list, "me" resolves to the connecting user"""
+    if not raw:
+        return set()
+    values = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if part == "me":
+            values.add(current_user_id)
+        elif part.isdigit():
+            values.add(int(part))
+    return values
+
+
+def parse_subscription_filter(connection: HTTPConnection, current_user_id: int) -> SubscriptionFilter:
     """
-    WebSocket endpoint for real-time issue updates via Redis Pub/Sub
-    Token should be in query params: ?token=xxx
+    Build the server-side subscription filter from query params (WebSocket or SSE):
+    ?sprint_id=1,2&assignee=me,7&issue_type=bug,task
     """
-    user = None
-    
-    # Get token from query params
-    token = websocket.query_params.get("token")
-    if not token:
-        await websocket.close(code=1008, reason="Authentication required")
-        return
-    
-    # Verify token - decode_token raises ValueError on invalid/expired token
-    payload = decode_token(token)
-    user_id = payload.get("user_id")
-    
-    if not user_id:
-        await websocket.close(code=1008, reason="Invalid token")
-        return
-    
-    # Get user from database
-    async with AsyncSessionLocal() as session:
-        user = await get_user_by_id(user_id=user_id, session=session)
-        
-        if not user:
-            await websocket.close(code=1008, reason="User not found")
-            return
-        
-        # Accept the connection after authentication
-        await websocket.accept()
-        Logger.info(f"WebSocket accepted for user {user.id}, project {project_id}")
-        
-        # Connect to the project room
-        await manager.connect(
-            websocket=websocket,
-            project_id=project_id,
-            user_id=user.id,
-            user_name=user.name,
-        )
-        
-        # Send welcome message
-        await websocket.send_text(json.dumps({
-            "type": "connected",
-            "message": f"Connected to project {project_id}",
-            "user_id": user.id
-        }))
-        Logger.info(f"Welcome message sent to user {user.id}")
-    
+    params = connection.query_params
+    issue_types = params.get("issue_type")
+    return SubscriptionFilter(
+        sprint_ids=_parse_int_set(params.get("sprint_id"), current_user_id),
+        assignee_ids=_parse_int_set(params.get("assignee"), current_user_id),
+        issue_types={t.strip().lower() for t in issue_types.split(",") if t.strip()} if issue_types else set(),
+    )
+
+
+def negotiate_protocol(websocket: WebSocket) -> str:
+    """MessagePack when the client offers the binary subprotocol, JSON otherwise"""
+    if MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        return PROTOCOL_MSGPACK
+    return PROTOCOL_JSON
+
+
+async def _accept(websocket: WebSocket, protocol: str):
+    await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if protocol == PROTOCOL_MSGPACK else None)
+
+
+async def _message_loop(websocket: WebSocket, user, project_id: Optional[int] = None):
     # Message loop - WebSocketDisconnect is a normal disconnection event
+    # Board commands are only accepted on project sockets (project_id set)
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            manager.touch(websocket)
+            message = decode_client_frame(frame)
+            if not isinstance(message, dict):
+                continue
+
             # Handle ping/pong for keepalive
-            if message.get("type") == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+            message_type = message.get("type")
+            if message_type == "ping":
+                await manager.send_message(websocket, {"type": "pong"})
+            elif message_type in BOARD_COMMANDS and project_id is not None:
+                ack = await handle_board_command(user, project_id, message)
+                await manager.send_message(websocket, ack)
     except WebSocketDisconnect:
         # Normal disconnection - clean up
         Logger.info(f"WebSocket disconnected for user {user.id if user else 'unknown'}")
@@ -77,3 +81,84 @@ async def websocket_endpoint(
         # Ensure cleanup happens
         manager.disconnect(websocket)
         Logger.info(f"WebSocket message loop ended for user {user.id if user else 'unknown'}")
+
+
+async def _authenticate(websocket: WebSocket) -> Optional[Principal]:
+    """
+    Resolve the token in the query params to a cached principal.
+    Closes the socket and returns None when authentication fails.
+    No DB session is held past this call, so the handshake and the
+    message loop never pin a pool connection.
+    """
+    try:
+        return await get_principal_from_token(websocket.query_params.get("token"))
+    except CredentialError as e:
+        await websocket.close(code=1008, reason=e.message)
+        return None
+
+
+@websocket_router.websocket("/ws/issues/{project_id}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    project_id: int,
+):
+    """
+    WebSocket endpoint for real-time issue updates via Redis Pub/Sub
+    Token should be in query params: ?token=xxx
+    Optional filters: ?sprint_id=1,2&assignee=me&issue_type=bug
+    Offer the "zyro.msgpack.v1" subprotocol to receive binary MessagePack frames instead of JSON
+    Accepts board commands (move_issue, change_assignee), each answered with an "ack" frame
+    """
+    user = await _authenticate(websocket)
+    if not user:
+        return
+
+    # Accept the connection after authentication, negotiating the frame protocol
+    protocol = negotiate_protocol(websocket)
+    await _accept(websocket, protocol)
+    Logger.info(f"WebSocket accepted for user {user.id}, project {project_id}, protocol {protocol}")
+
+    # Connect to the project room
+    await manager.connect(
+        websocket=websocket,
+        project_id=project_id,
+        user_id=user.id,
+        user_name=user.name,
+        filters=parse_subscription_filter(websocket, user.id),
+        protocol=protocol,
+    )
+
+    # Send welcome message
+    await manager.send_message(websocket, {
+        "type": "connected",
+        "message": f"Connected to project {project_id}",
+        "user_id": user.id
+    })
+    Logger.info(f"Welcome message sent to user {user.id}")
+
+    await _message_loop(websocket, user, project_id)
+
+
+@websocket_router.websocket("/ws/users/me")
+async def user_websocket_endpoint(websocket: WebSocket):
+    """
+    WebSocket endpoint for events scoped to the current user (e.g. issues assigned to them)
+    Token should be in query params: ?token=xxx
+    """
+    user = await _authenticate(websocket)
+    if not user:
+        return
+
+    protocol = negotiate_protocol(websocket)
+    await _accept(websocket, protocol)
+    Logger.info(f"WebSocket accepted for user {user.id}, user channel, protocol {protocol}")
+
+    await manager.connect_user(websocket=websocket, user_id=user.id, user_name=user.name, protocol=protocol)
+
+    await manager.send_message(websocket, {
+        "type": "connected",
+        "message": f"Connected to user {user.id} updates",
+        "user_id": user.id
+    })
+
+    await _message_loop(websocket, user)
@@ -0,0 +1,236 @@
+"""
+Email rendering, done in the Celery worker.
+
+Requests only enqueue a template name and a small context dict; the HTML
+lives in app/templates/email and each file is compiled into a
+string.Template once per process. Renderers turn the context into the
+template's fields (colors, display names, optional rows) and return
+(subject, body).
+"""
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+from typing import Callable, Dict, List, Tuple
+
+from app.core.conf import APP_NAME
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+ISSUE_LINK = "https://zyro-2dox.vercel.app/manager/issues/{issue_code}"
+INVITE_LINK = "http://localhost:5173/verify-token/{token}"
+
+PRIORITY_COLORS = {
+    "critical": "#dc2626",
+    "high": "#ea580c",
+    "moderate": "#f59e0b",
+    "low": "#10b981"
+}
+
+STATUS_COLORS = {
+    "todo": "#6b7280",
+    "in_progress": "#3b82f6",
+    "completed": "#10b981",
+    "hold": "#f59e0b",
+    "qa": "#8b5cf6",
+    "cancelled": "#ef4444"
+}
+
+LOG_LEVEL_COLORS = {
+    "CRITICAL": "#dc2626",
+    "ERROR": "#ea580c",
+    "WARNING": "#f59e0b",
+    "INFO": "#3b82f6"
+}
+
+# Optional fragments, filled in only when the value is present
+DESCRIPTION_ROW = Template('<tr><td style="padding:20px; background-color:#ffffff; border-bottom:1px solid #e5e7eb;"><p style="margin:0; font-size:15px; line-height:1.6; color:#374151;">${description}</p></td></tr>')
+DETAIL_ROW = Template('<tr><td style="padding:8px 0; font-size:14px; color:#6b7280;">${label}:</td><td style="padding:8px 0; font-size:14px; color:#111827;">${value}</td></tr>')
+REQUEST_DATA_SECTION = Template('''
+                <div style="margin:24px 0;">
+                  <h3 style="margin:0 0 12px 0; font-size:16px; color:#111827; font-weight:600;">
+                    Request Data
+                  </h3>
+                  <div style="background-color:#f9fafb; border:1px solid #e5e7eb; padding:16px; border-radius:6px;
+                              font-family:'Courier New', monospace; font-size:12px; line-height:1.6;
+                              overflow-x:auto; max-height:200px; overflow-y:auto;">
+                    <pre style="margin:0; white-space:pre-wrap; word-wrap:break-word; color:#374151;">${request_data}</pre>
+                  </div>
+                </div>
+                ''')
+OCCURRENCES_SECTION = Template('''
+                <div style="background-color:#fffbeb; border-left:4px solid #f59e0b; padding:16px; border-radius:6px; margin-bottom:24px;">
+                  <p style="margin:0; font-size:14px; color:#92400e; line-height:1.6;">
+                    <strong>Repeated ${count} more time(s)</strong> between ${first_seen} and ${last_seen}
+                    after the first notification. Details below are from the first repeat.
+                  </p>
+                </div>
+                ''')
+DIGEST_ROW = Template('''
+                  <tr>
+                    <td style="padding:14px 16px; border-bottom:1px solid #e5e7eb; font-size:14px; color:#111827; line-height:1.5;">
+                      ${summary}
+                      <div style="font-size:12px; color:#9ca3af; margin-top:4px;">${at}</div>
+                    </td>
+                    <td style="padding:14px 16px; border-bottom:1px solid #e5e7eb; text-align:right; white-space:nowrap;">
+                      <a href="${link}" style="font-size:13px; color:#4f46e5; font-weight:600; text-decoration:none;">View →</a>
+                    </td>
+                  </tr>''')
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> Template:
+    """Read and compile a template file once per process"""
+    return Template((TEMPLATE_DIR / f"{name}.html").read_text(encoding="utf-8"))
+
+
+def project_code(project_name: str) -> str:
+    """Issue key prefix of a project, e.g. "Zyro App" -> "ZYROAPP" """
+    return "".join(word for word in project_name.split(" ") if word.isalpha()).upper()
+
+
+def issue_link(issue_code: str) -> str:
+    return ISSUE_LINK.format(issue_code=issue_code)
+
+
+def format_timestamp(value: str, pattern: str = "%B %d, %Y at %I:%M %p UTC") -> str:
+    """
+    Display form of an ISO 8601 UTC timestamp from a context.
+    Anything else (a task enqueued with a preformatted string) is shown as is.
+    """
+    try:
+        return datetime.fromisoformat(value).astimezone(timezone.utc).strftime(pattern)
+    except (TypeError, ValueError):
+        return value
+
+
+def _render_invite(context: dict) -> Tuple[str, str]:
+    body = load_template("invite").substitute(
+        new_user_name=context["new_user_name"],
+        invite_link=INVITE_LINK.format(token=context["token"]),
+    )
+    return "You're Invited – Activate Your Account", body
+
+
+def _render_issue_assigned(context: dict) -> Tuple[str, str]:
+    status = context["status"]
+    priority = context["priority"] or "Moderate"
+    description = context.get("description")
+    body = load_template("issue_assigned").substitute(
+        issue_name=context["issue_name"],
+        assigned_by_name=context["assigned_by_name"],
+        assigned_to_name=context["assigned_to_name"],
+        description_row=DESCRIPTION_ROW.substitute(description=description) if description else "",
+        status_color=STATUS_COLORS.get(status.lower(), "#6b7280"),
+        status_display=status.replace("_", " "),
+        priority_color=PRIORITY_COLORS.get(priority.lower(), "#6b7280"),
+        priority=priority,
+        type_display=context["type"].replace("_", " "),
+        story_point=context.get("story_point") or 0,
+        project_name=context["project_name"],
+        sprint_name=context["sprint_name"],
+        issue_link=issue_link(context["issue_code"]),
+    )
+    return f"New Issue Assigned: {context['issue_name']} by {context['assigned_by_name']}", body
+
+
+def _render_issue_status_update(context: dict) -> Tuple[str, str]:
+    old_status, new_status = context["old_status"], context["new_status"]
+    priority = context["priority"] or "Moderate"
+    story_point, time_estimate = context.get("story_point"), context.get("time_estimate")
+    body = load_template("issue_status_update").substitute(
+        issue_name=context["issue_name"],
+        old_status_color=STATUS_COLORS.get(old_status.lower().replace("_", ""), "#6b7280"),
+        old_status_display=old_status.replace("_", " ").title(),
+        new_status_color=STATUS_COLORS.get(new_status.lower().replace("_", ""), "#6b7280"),
+        new_status_display=new_status.replace("_", " ").title(),
+        issue_code=context["issue_code"],
+        description=context.get("description") or "No description provided",
+        priority_color=PRIORITY_COLORS.get(priority.lower(), "#6b7280"),
+        priority_display=priority.upper(),
+        type_display=context["type"].replace("_", " ").title(),
+        project_name=context["project_name"],
+        sprint_name=context["sprint_name"],
+        assignee_name=context["assignee_name"],
+        reporter_name=context["reporter_name"],
+        story_points_row=DETAIL_ROW.substitute(label="Story Points", value=story_point) if story_point else "",
+        time_estimate_row=DETAIL_ROW.substitute(label="Time Estimate", value=f"{time_estimate} hours") if time_estimate else "",
+        updated_by_name=context["updated_by_name"],
+        updated_by_email=context["updated_by_email"],
+        updated_at=format_timestamp(context["updated_at"]),
+        issue_link=issue_link(context["issue_code"]),
+        app_name=APP_NAME,
+        app_name_upper=APP_NAME.upper(),
+    )
+    return f"Issue Status Updated: {context['issue_name']}", body
+
+
+def _render_error_notification(context: dict) -> Tuple[str, str]:
+    log_level = context["log_level"]
+    environment = context["environment"].upper()
+    request_data = context.get("request_data")
+    occurrences = context.get("occurrences")
+    body = load_template("error_notification").substitute(
+        log_level=log_level,
+        app_name=APP_NAME,
+        error_type=context["error_type"],
+        error_message=context["error_message"],
+        priority_color=LOG_LEVEL_COLORS.get(log_level, "#6b7280"),
+        environment=environment,
+        request_id=context["request_id"],
+        method=context["method"].upper(),
+        uri=context["uri"],
+        traceback=context["traceback"],
+        request_data_section=REQUEST_DATA_SECTION.substitute(request_data=request_data) if request_data else "",
+        occurrences_section=OCCURRENCES_SECTION.substitute(
+            count=occurrences["count"],
+            first_seen=format_timestamp(occurrences["first_seen"], "%Y-%m-%d %H:%M:%S UTC"),
+            last_seen=format_timestamp(occurrences["last_seen"], "%Y-%m-%d %H:%M:%S UTC"),
+        ) if occurrences else "",
+        generated_at=format_timestamp(context["generated_at"], "%Y-%m-%d %H:%M:%S UTC"),
+    )
+    subject = f"[{APP_NAME}] {log_level} Error: {context['error_type']} - {environment}"
+    if occurrences:
+        subject += f" (repeated {occurrences['count']}x)"
+    return subject, body
+
+
+def _render_notification_digest(context: dict) -> Tuple[str, str]:
+    items = context["items"]
+    rows = "".join(
+        DIGEST_ROW.substitute(summary=item["summary"], at=item["at"], link=item["link"])
+        for item in items
+    )
+    greeting = f"Hello {items[0]['to_name']}," if items[0].get("to_name") else "Hello,"
+    body = load_template("notification_digest").substitute(
+        count=len(items),
+        greeting=greeting,
+        rows=rows,
+        app_name=APP_NAME,
+        app_name_upper=APP_NAME.upper(),
+    )
+    return f"{len(items)} updates on your issues", body
+
+
+RENDERERS: Dict[str, Callable[[dict], Tuple[str, str]]] = {
+    "invite": _render_invite,
+    "issue_assigned": _render_issue_assigned,
+    "issue_status_update": _render_issue_status_update,
+    "error_notification": _render_error_notification,
+    "notification_digest": _render_notification_digest,
+}
+
+
+def render_email(template: str, context: dict) -> Tuple[str, str]:
+    """(subject, body) of a templated email"""
+    return RENDERERS[template](context)
+
+
+def digest_email(items: List[dict]) -> Tuple[str, dict]:
+    """
+    Template name and context of one recipient's digest, rendered by send_template_email_task.
+    A single notification is sent as its own email, several are combined into a list.
+    """
+    if len(items) == 1:
+        return items[0]["template"], items[0]["context"]
+    return "notification_digest", {"items": items}
@@ -4,9 +4,12 @@ from uuid import uuid4
 from datetime import datetime
 
 from app.core.conf import ENVIRONMENT
-from app.common.logging import Logger
+from app.common.logging import get_logger
+from app.common.logging.request import get_current_request_id
 from app.common.email_template import send_error_notification_email
 
+Logger = get_logger(__name__)
+
 
 @dataclass
 class MailManager:
@@ -69,7 +72,8 @@ class ErrorMessageManager(MailManager):
         Prepare the error message as a structured dictionary.
         """
         return {
-            "id":str(uuid4()),
+            # The request id, so the email's "Request ID" finds the request's log lines
+            "id":get_current_request_id() or str(uuid4()),
             "product": self.product,
             "module": self.module,
             "log_level": self.log_level,
@@ -96,7 +100,7 @@ class ErrorMessageManager(MailManager):
         self._log_error(message)
         
         if self._should_send_email():
-            send_error_notification_email(message)
+            await send_error_notification_email(message)
     
     def _log_error(self, message: dict):
         """Log the error with appropriate log level."""
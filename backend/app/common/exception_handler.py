@@ -1,8 +1,6 @@
 import traceback
-from contextvars import ContextVar
-from uuid import uuid4
 from functools import wraps
-from typing import List, Callable, Literal, cast, Optional
+from typing import List, Callable, Literal, cast
 
 from fastapi import HTTPException, Request
 from fastapi.exceptions import RequestValidationError
@@ -12,21 +10,10 @@ from app.common.errors import UserErrors, ClientErrors, DatabaseErrors
 from app.utils.request_data_extractor import RequestDataExtractor
 from app.core.conf import APP_NAME, ENVIRONMENT
 from app.common.error_manager import ErrorMessageManager
-from app.common.logging import Logger
-
-# Context variable for request ID
-request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
-
-def get_current_request_id() -> Optional[str]:
-    """Get the current request ID from context."""
-    return request_id_var.get()
-
-def create_request_id() -> str:
-    """Create and set a new request ID."""
-    req_id = str(uuid4())
-    request_id_var.set(req_id)
-    return req_id
+from app.common.logging import get_logger
+from app.common.logging.request import get_current_request_id, create_request_id
 
+Logger = get_logger(__name__)
 
 
 class ExceptionHandler:
@@ -475,7 +462,9 @@ def after_request_exception_handler(
         @wraps(func)
         async def wrapper(*args, **kwargs):
             try:
-                create_request_id()
+                # Keep the id of the request (or task) this runs in, only fill one in outside any
+                if not get_current_request_id():
+                    create_request_id()
                 return await func(*args, **kwargs)
         
             except UserErrors as exc:
@@ -3,6 +3,7 @@ Logging module for Zyro API.
 Provides custom logging with request ID tracking.
 """
 from app.common.logging.logging_config import get_logger, Logger, CustomLogger
+from app.common.logging.pipeline import log_pipeline
 
-__all__ = ['get_logger', 'Logger', 'CustomLogger']
+__all__ = ['get_logger', 'Logger', 'CustomLogger', 'log_pipeline']
 
@@ -3,21 +3,33 @@ Custom Logging Configuration for Zyro API
 Provides structured logging with request ID tracking.
 """
 import logging
+import os
 import sys
 from pathlib import Path
 
 from app.common.logging.request import get_current_request_id
-from app.core.conf import IS_LOCAL, BASE_DIR
+from app.common.logging.pipeline import log_pipeline
+from app.common.logging.structured import JsonFormatter, SamplingFilter, log_file_handler, parse_mapping
+from app.core.conf import (
+    BASE_DIR,
+    LOG_LEVEL,
+    LOG_LEVELS,
+    LOG_SAMPLE_RATES,
+    LOG_FILE_ROTATION,
+    LOG_MAX_BYTES,
+    LOG_ROTATE_WHEN,
+    LOG_BACKUP_COUNT,
+    LOG_CONSOLE_FORMAT,
+)
 
 # Create logs directory if it doesn't exist
 LOGS_DIR = BASE_DIR / "logs"
 LOGS_DIR.mkdir(exist_ok=True)
 
-# Custom formatter with request ID
-formatter = logging.Formatter(
-    '%(request_id)s :: %(asctime)s :: %(filename)s :: %(pathname)s :: %(levelname)s :: %(funcName)s :: %(lineno)d :: %(message)s\n'
-    '==================================================================\n'
-)
+# JSON lines with request ID, for the log file (and the console outside local development)
+formatter = JsonFormatter()
+
+LOGGER_LEVELS = parse_mapping(LOG_LEVELS, str.upper)
 
 class CustomLogger(logging.Logger):
     """Custom logger that automatically includes request ID in all log messages."""
@@ -31,6 +43,8 @@ class CustomLogger(logging.Logger):
             if 'extra' not in kwargs:
                 kwargs['extra'] = {}
             kwargs['extra']['request_id'] = request_id
+            # Report the caller's file/function/line, not this wrapper's
+            kwargs.setdefault('stacklevel', 2)
             self._log(level=level, msg=msg, args=args, **kwargs)
 
     def error(self, msg, *args, **kwargs):
@@ -40,6 +54,7 @@ class CustomLogger(logging.Logger):
             if 'extra' not in kwargs:
                 kwargs['extra'] = {}
             kwargs['extra']['request_id'] = request_id
+            kwargs.setdefault('stacklevel', 2)
             self._log(level=logging.ERROR, msg=msg, args=args, **kwargs)
     
     def critical(self, msg, *args, **kwargs):
@@ -49,6 +64,7 @@ class CustomLogger(logging.Logger):
             if 'extra' not in kwargs:
                 kwargs['extra'] = {}
             kwargs['extra']['request_id'] = request_id
+            kwargs.setdefault('stacklevel', 2)
             self._log(level=logging.CRITICAL, msg=msg, args=args, **kwargs)
 
     def warning(self, msg, *args, **kwargs):
@@ -58,6 +74,7 @@ class CustomLogger(logging.Logger):
             if 'extra' not in kwargs:
                 kwargs['extra'] = {}
             kwargs['extra']['request_id'] = request_id
+            kwargs.setdefault('stacklevel', 2)
             self._log(level=logging.WARNING, msg=msg, args=args, **kwargs)
     
     def info(self, msg, *args, **kwargs):
@@ -67,6 +84,7 @@ class CustomLogger(logging.Logger):
             if 'extra' not in kwargs:
                 kwargs['extra'] = {}
             kwargs['extra']['request_id'] = request_id
+            kwargs.setdefault('stacklevel', 2)
             self._log(level=logging.INFO, msg=msg, args=args, **kwargs)
     
     def debug(self, msg, *args, **kwargs):
@@ -76,6 +94,7 @@ class CustomLogger(logging.Logger):
             if 'extra' not in kwargs:
                 kwargs['extra'] = {}
             kwargs['extra']['request_id'] = request_id
+            kwargs.setdefault('stacklevel', 2)
             self._log(level=logging.DEBUG, msg=msg, args=args, **kwargs)
 
 
@@ -83,6 +102,52 @@ class CustomLogger(logging.Logger):
 logging.setLoggerClass(CustomLogger)
 
 
+def _build_handlers() -> list:
+    """File and console handlers, shared by every logger through the log pipeline"""
+    # File handler, one file per process unless rotation is external, rotated and gzipped so logs/ stays bounded
+    file_handler = log_file_handler(str(LOGS_DIR), LOG_FILE_ROTATION, LOG_MAX_BYTES, LOG_ROTATE_WHEN, LOG_BACKUP_COUNT)
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(formatter)
+    
+    # Console handler (always add for terminal visibility)
+    console_handler = logging.StreamHandler(stream=sys.stdout)
+    console_handler.setLevel(logging.DEBUG)
+    if LOG_CONSOLE_FORMAT == "json":
+        console_handler.setFormatter(formatter)
+    else:
+        # Simpler formatter for local development
+        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    return [file_handler, console_handler]
+
+
+def level_for(name: str) -> str:
+    """Level of a logger: the most specific LOG_LEVELS prefix, else LOG_LEVEL"""
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        prefix = ".".join(parts[:i])
+        if prefix in LOGGER_LEVELS:
+            return LOGGER_LEVELS[prefix]
+    return LOG_LEVEL
+
+
+def _reopen_after_fork():
+    # Prefork Celery children get their own app.<pid>.log instead of rotating the parent's
+    inherited = log_pipeline.handlers
+    log_pipeline.configure(*_build_handlers())
+    for handler in inherited:
+        handler.close()
+
+
+# Disk and console I/O happens on the pipeline's thread, loggers only enqueue
+log_pipeline.configure(*_build_handlers())
+os.register_at_fork(after_in_child=_reopen_after_fork)
+# Sampled-out records are discarded before they are copied or queued
+log_pipeline.queue_handler.addFilter(SamplingFilter(parse_mapping(LOG_SAMPLE_RATES, float)))
+# Levels for loggers we don't create ourselves (sqlalchemy, uvicorn, ...)
+for _name, _level in LOGGER_LEVELS.items():
+    logging.getLogger(_name).setLevel(_level)
+
+
 def get_logger(name: str) -> CustomLogger:
     """
     Get a logger instance with the given name.
@@ -94,28 +159,15 @@ def get_logger(name: str) -> CustomLogger:
         CustomLogger instance
     """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)  # Set to DEBUG to see all logs
+    logger.setLevel(level_for(name))
     
     # Remove existing handlers to avoid duplicates
     if logger.handlers:
         for handler in logger.handlers[:]:
             logger.removeHandler(handler)
     
-    # Always add both file and console handlers for better visibility
-    # File handler
-    log_file = LOGS_DIR / "app.log"
-    file_handler = logging.FileHandler(filename=str(log_file), encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    # Console handler (always add for terminal visibility)
-    console_handler = logging.StreamHandler(stream=sys.stdout)
-    console_handler.setLevel(logging.DEBUG)
-    # Simpler formatter for console
-    console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    # Always log to both file and console for better visibility, through the non-blocking pipeline
+    logger.addHandler(log_pipeline.queue_handler)
     
     # Prevent propagation to root logger
     logger.propagate = False
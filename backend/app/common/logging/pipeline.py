@@ -0,0 +1,109 @@
+"""
+Non-blocking log pipeline.
+
+Loggers only get a QueueHandler: a log call formats the record and puts it on
+a bounded in-memory queue. A QueueListener thread owns the real handlers
+(file, console) and does the disk and terminal I/O off the event loop.
+When the queue is full, records below WARNING are dropped; WARNING and above
+evict the oldest queued record instead, so a flood of INFO lines can't push
+out the errors. Drops are counted per level and reported in /health.
+"""
+import atexit
+import copy
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+from app.core.conf import LOG_QUEUE_SIZE
+
+
+class BoundedQueueHandler(QueueHandler):
+    def __init__(self, pipeline: "LogPipeline"):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like QueueHandler.prepare, but the traceback stays in exc_text instead of
+        # being merged into the message, so structured output keeps it as a field
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if record.levelno < logging.WARNING:
+            self.pipeline.count_drop(record)
+            return
+        try:
+            self.pipeline.count_drop(self.queue.get_nowait())
+            self.queue.put_nowait(record)
+        except (queue.Empty, queue.Full):
+            # The listener raced us; losing this record is still better than blocking
+            self.pipeline.count_drop(record)
+
+
+class LogPipeline:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        # Shared by every logger, each record is written once by the listener's handlers
+        self.queue_handler = BoundedQueueHandler(self)
+        self.handlers: List[logging.Handler] = []
+        self.listener: Optional[QueueListener] = None
+        self.dropped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, *handlers: logging.Handler):
+        """Set the handlers that do the actual I/O, on the listener thread"""
+        self.handlers = list(handlers)
+        self.start()
+
+    def start(self):
+        self.stop()
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Flush what is queued and stop the thread"""
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_after_fork(self):
+        # Threads don't survive fork (prefork Celery workers): new queue, new listener
+        self.queue = queue.Queue(maxsize=self.maxsize)
+        self.queue_handler.queue = self.queue
+        self._lock = threading.Lock()
+        self.listener = None
+        if self.handlers:
+            self.start()
+
+    def count_drop(self, record: logging.LogRecord):
+        with self._lock:
+            self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.maxsize,
+            "dropped": dict(self.dropped),
+            "sampled_out": sum(getattr(f, "sampled_out", 0) for f in self.queue_handler.filters),
+        }
+
+
+log_pipeline = LogPipeline(LOG_QUEUE_SIZE)
+atexit.register(log_pipeline.stop)
+os.register_at_fork(after_in_child=log_pipeline.restart_after_fork)
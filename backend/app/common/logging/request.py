@@ -1,12 +1,26 @@
+import re
+import time
 import uuid
 import asyncio
-from typing import Coroutine
+from contextlib import contextmanager
+from typing import Coroutine, Dict, Optional, Tuple
 from contextvars import ContextVar, Token
 
 BackgroundTasks = set()
 
+# The one request id of the app: set by RequestContextMiddleware, restored from
+# Celery task headers in workers and from event envelopes in the realtime listener
 RequestId: ContextVar[str] = ContextVar('request_id', default = None) # type: ignore
 
+# Milliseconds spent per named stage of the current request
+RequestTimings: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_timings', default=None)
+
+# SQL statements sent by the current request, counted by the engine hook in app.db.connection
+RequestQueries: ContextVar[Optional["QueryStats"]] = ContextVar('request_queries', default=None)
+
+# Ids accepted from a caller's X-Request-ID header, anything else gets a fresh id
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
 DBConnectionType: ContextVar[str] = ContextVar('db_connection_type', default='write')
 
 def create_db_connection_type(connection_type: str) -> Token:
@@ -37,6 +51,85 @@ def remove_request_id_from_pool(token: Token) -> None:
     """
     RequestId.reset(token)
 
+def set_request_id(request_id: Optional[str]) -> Token:
+    """
+    Attaches an existing id (incoming header, task header, event envelope) against current coroutine stack.
+    """
+    if not request_id or not VALID_REQUEST_ID.match(str(request_id)):
+        request_id = str(uuid.uuid4())
+    return RequestId.set(request_id)
+
+
+def current_trace() -> Optional[dict]:
+    """
+    Request id and time, to carry with work done later on behalf of this request
+    (outbox rows, Celery tasks, Redis events). None outside a request.
+    """
+    request_id = get_current_request_id()
+    return {"request_id": request_id, "at": time.time()} if request_id else None
+
+
+def start_request_timings() -> Token:
+    return RequestTimings.set({})
+
+def get_request_timings() -> Dict[str, float]:
+    return RequestTimings.get() or {}
+
+def remove_request_timings(token: Token) -> None:
+    RequestTimings.reset(token)
+
+def record_stage(name: str, ms: float) -> None:
+    """Add time to a stage of the current request; a no-op outside one"""
+    timings = RequestTimings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + ms
+
+@contextmanager
+def request_stage(name: str):
+    """Time a block (awaits included) as a stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, (time.perf_counter() - started) * 1000)
+
+
+class QueryStats:
+    __slots__ = ("count", "ms", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.ms = 0.0
+        # Executions per SQL text; one statement run again and again is the N+1 pattern
+        self.statements: Dict[str, int] = {}
+
+    def most_repeated(self) -> Tuple[Optional[str], int]:
+        if not self.statements:
+            return None, 0
+        statement = max(self.statements, key=self.statements.get)
+        return statement, self.statements[statement]
+
+def start_request_queries() -> Token:
+    return RequestQueries.set(QueryStats())
+
+def get_request_queries() -> Optional[QueryStats]:
+    return RequestQueries.get()
+
+def remove_request_queries(token: Token) -> None:
+    RequestQueries.reset(token)
+
+def count_query(statement: str) -> None:
+    """Count a statement against the current request; a no-op outside one"""
+    stats = RequestQueries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+def record_query_time(ms: float) -> None:
+    stats = RequestQueries.get()
+    if stats is not None:
+        stats.ms += ms
+
 
 def create_background_task(task: Coroutine) -> None:
     """
@@ -0,0 +1,112 @@
+"""
+Structured log output: JSON records, rotating compressed files and sampling
+of high-frequency INFO/DEBUG loggers.
+"""
+import gzip
+import json
+import logging
+import os
+import random
+import shutil
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler, WatchedFileHandler
+from typing import Dict, Optional
+
+# Attributes every LogRecord has; anything else on a record came in through extra=
+RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields are included as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+            "file": record.filename,
+            "func": record.funcName,
+            "line": record.lineno,
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the INFO/DEBUG records of the configured loggers
+    (and their children); WARNING and above always pass.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+        self._cache: Dict[str, Optional[float]] = {}
+
+    def rate_for(self, name: str) -> Optional[float]:
+        if name not in self._cache:
+            parts = name.split(".")
+            prefixes = (".".join(parts[:i]) for i in range(len(parts), 0, -1))
+            self._cache[name] = next((self.rates[prefix] for prefix in prefixes if prefix in self.rates), None)
+        return self._cache[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate is None or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+def _gzip_namer(name: str) -> str:
+    return f"{name}.gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    # Runs on the log pipeline's thread, compression never blocks a request
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def rotating_file_handler(path: str, max_bytes: int, when: Optional[str], backup_count: int) -> logging.Handler:
+    """Size based rotation, or time based if `when` is set ("midnight", "H", ...); rotated files are gzipped"""
+    if when:
+        handler = TimedRotatingFileHandler(path, when=when, backupCount=backup_count, encoding="utf-8", utc=True)
+    else:
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def log_file_handler(directory: str, rotation: str, max_bytes: int, when: Optional[str], backup_count: int) -> logging.Handler:
+    """
+    The log file of this process. With "process" rotation every process gets its own
+    app.<pid>.log, as rotating handlers in several processes would rename the same
+    file under each other; "external" shares app.log and reopens it after logrotate moves it.
+    """
+    if rotation == "external":
+        return WatchedFileHandler(os.path.join(directory, "app.log"), encoding="utf-8")
+    return rotating_file_handler(os.path.join(directory, f"app.{os.getpid()}.log"), max_bytes, when, backup_count)
+
+
+def parse_mapping(raw: str, cast) -> dict:
+    """"a.b=WARNING,c=0.1" -> {"a.b": cast("WARNING"), "c": cast("0.1")}"""
+    mapping = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = cast(value.strip())
+    return mapping
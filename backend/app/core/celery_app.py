@@ -1,5 +1,21 @@
+import time
 from celery import Celery
-from app.core.conf import CELERY_BROKER_URL, CELERY_RESULT_BACKEND
+from celery.signals import before_task_publish, after_task_publish, celeryd_init, task_prerun, task_postrun
+from kombu import Queue
+from app.core.conf import (
+    CELERY_BROKER_URL,
+    CELERY_RESULT_BACKEND,
+    NOTIFICATION_DIGEST_FLUSH_SECONDS,
+    ERROR_EMAIL_FLUSH_SECONDS,
+    CELERY_QUEUE_CONCURRENCY,
+)
+from app.common.logging.logging_config import get_logger
+from app.common.logging.request import (
+    get_current_request_id,
+    set_request_id,
+    remove_request_id_from_pool,
+)
+from app.core.tracing import CurrentSpan, start_span, finish_span
 
 celery_app = Celery(
     "worker",
@@ -7,4 +23,156 @@ celery_app = Celery(
     backend=CELERY_RESULT_BACKEND
 )
 
-celery_app.autodiscover_tasks(["app.tasks"])
\ No newline at end of file
+# ================= QUEUES =================
+# One worker per queue, so a burst on one (error storm, digest flush) never delays another:
+#   celery -A app.core.celery_app worker -Q transactional
+#   celery -A app.core.celery_app worker -Q notifications
+#   celery -A app.core.celery_app worker -Q errors
+#   celery -A app.core.celery_app worker -Q default
+QUEUE_TRANSACTIONAL = "transactional"  # invites, anything a user is waiting for
+QUEUE_NOTIFICATIONS = "notifications"  # issue notifications and digests
+QUEUE_ERRORS = "errors"                # error notifications for administrators
+QUEUE_DEFAULT = "default"
+QUEUES = [QUEUE_TRANSACTIONAL, QUEUE_NOTIFICATIONS, QUEUE_ERRORS, QUEUE_DEFAULT]
+
+# Redis broker priorities: 0 is served first within a queue
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 3
+PRIORITY_LOW = 6
+
+# Templated emails are routed by template, other tasks by name: (queue, priority)
+TEMPLATE_ROUTES = {
+    "invite": (QUEUE_TRANSACTIONAL, PRIORITY_HIGH),
+    "issue_assigned": (QUEUE_NOTIFICATIONS, PRIORITY_NORMAL),
+    "issue_status_update": (QUEUE_NOTIFICATIONS, PRIORITY_NORMAL),
+    "error_notification": (QUEUE_ERRORS, PRIORITY_NORMAL),
+}
+TASK_ROUTES = {
+    "send_email_task": (QUEUE_NOTIFICATIONS, PRIORITY_NORMAL),
+    "flush_notification_digests_task": (QUEUE_NOTIFICATIONS, PRIORITY_HIGH),
+    "flush_error_summaries_task": (QUEUE_ERRORS, PRIORITY_LOW),
+}
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Celery router; an explicit queue= on apply_async still wins"""
+    if name == "send_template_email_task":
+        queue, priority = TEMPLATE_ROUTES.get((kwargs or {}).get("template"), (QUEUE_NOTIFICATIONS, PRIORITY_NORMAL))
+    else:
+        queue, priority = TASK_ROUTES.get(name, (QUEUE_DEFAULT, PRIORITY_NORMAL))
+    return {"queue": queue, "priority": priority}
+
+
+celery_app.conf.update(
+    task_queues=[Queue(name, routing_key=name) for name in QUEUES],
+    task_default_queue=QUEUE_DEFAULT,
+    task_default_priority=PRIORITY_NORMAL,
+    task_routes=(route_task,),
+    # Priority sub-queues are "<queue>", "<queue>:3", "<queue>:6" in Redis
+    broker_transport_options={
+        "priority_steps": [PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW],
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    # Don't let one process hoard messages that an idle sibling could run
+    worker_prefetch_multiplier=1,
+)
+
+
+# One line per task run with the request it was enqueued by, see RequestContextMiddleware
+TaskLogger = get_logger(f"{__name__}.tasks")
+
+# Publish spans between before_task_publish and after_task_publish, by task id
+_publish_spans = {}
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs):
+    # Read back by the queue lag metric (app.services.queue_metrics) and the task timing log
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+        # Senders outside the request's context (enqueue flusher, outbox relay) pass it explicitly
+        if get_current_request_id():
+            headers.setdefault("request_id", get_current_request_id())
+        # Every send (.delay, apply_async, send_task) is a span of the request's trace,
+        # and the parent of the task's run span in the worker
+        publish_span = start_span("celery.publish", request_id=headers.get("request_id"), task=headers.get("task"))
+        if publish_span is not None:
+            if len(_publish_spans) > 1000:
+                # Sends that raised never reach after_task_publish
+                _publish_spans.clear()
+            _publish_spans[headers.get("id")] = publish_span
+            headers["parent_span_id"] = publish_span.span_id
+
+
+@after_task_publish.connect
+def finish_publish_span(headers=None, routing_key=None, **kwargs):
+    publish_span = _publish_spans.pop((headers or {}).get("id"), None)
+    if publish_span is not None:
+        publish_span.set(queue=routing_key)
+        finish_span(publish_span)
+
+
+@task_prerun.connect
+def enter_request_context(task=None, **kwargs):
+    """Run the task under the id of the request that enqueued it, tasks it sends inherit it"""
+    task.request.request_token = set_request_id(getattr(task.request, "request_id", None))
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    task.request.queued_ms = (time.time() - enqueued_at) * 1000 if enqueued_at else None
+    task.request.started_at = time.perf_counter()
+    run_span = start_span(
+        f"celery.task.{task.name}", parent_id=getattr(task.request, "parent_span_id", None), retries=task.request.retries
+    )
+    task.request.run_span = run_span
+    task.request.span_token = CurrentSpan.set(run_span) if run_span is not None else None
+
+
+@task_postrun.connect
+def leave_request_context(task=None, state=None, **kwargs):
+    token = getattr(task.request, "request_token", None)
+    if token is None:
+        return
+    run_ms = (time.perf_counter() - task.request.started_at) * 1000
+    queued_ms = task.request.queued_ms
+    TaskLogger.info(
+        f"Task {task.name} {state} in {run_ms:.1f}ms"
+        + (f", {queued_ms:.1f}ms in queue" if queued_ms is not None else ""),
+        extra={"task": task.name, "state": state, "run_ms": round(run_ms, 1),
+               "queued_ms": round(queued_ms, 1) if queued_ms is not None else None},
+    )
+    if task.request.span_token is not None:
+        CurrentSpan.reset(task.request.span_token)
+        task.request.run_span.set(state=state)
+        if state == "FAILURE":
+            task.request.run_span.error = "task failed"
+        finish_span(task.request.run_span)
+    remove_request_id_from_pool(token)
+
+
+@celeryd_init.connect
+def configure_worker_concurrency(sender=None, conf=None, options=None, **kwargs):
+    """Concurrency from CELERY_QUEUE_CONCURRENCY for a worker started on a single queue with -Q"""
+    options = options or {}
+    queues = options.get("queues") or []
+    if isinstance(queues, str):
+        queues = queues.split(",")
+    if options.get("concurrency") or len(queues) != 1:
+        return
+    concurrency = CELERY_QUEUE_CONCURRENCY.get(queues[0].strip())
+    if concurrency:
+        conf.worker_concurrency = concurrency
+
+
+# Periodic tasks, run with: celery -A app.core.celery_app beat
+celery_app.conf.beat_schedule = {
+    "flush-notification-digests": {
+        "task": "flush_notification_digests_task",
+        "schedule": NOTIFICATION_DIGEST_FLUSH_SECONDS,
+    },
+    "flush-error-summaries": {
+        "task": "flush_error_summaries_task",
+        "schedule": ERROR_EMAIL_FLUSH_SECONDS,
+    },
+}
+
+celery_app.autodiscover_tasks(["app.tasks"])
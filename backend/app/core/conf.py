@@ -57,8 +57,31 @@ EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = os.getenv("EMAIL_PORT")
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
+# Pooled SMTP connections, per Celery worker process
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_IDLE_TIMEOUT_SECONDS = int(os.getenv("SMTP_IDLE_TIMEOUT_SECONDS", "60"))
+SMTP_HEALTHCHECK_SECONDS = int(os.getenv("SMTP_HEALTHCHECK_SECONDS", "10"))
+SMTP_TIMEOUT_SECONDS = int(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+# Issue notifications are batched per recipient into one digest email per window
+NOTIFICATION_DIGEST_ENABLED = os.getenv("NOTIFICATION_DIGEST_ENABLED", "True").lower() == "true"
+NOTIFICATION_DIGEST_WINDOW_SECONDS = int(os.getenv("NOTIFICATION_DIGEST_WINDOW_SECONDS", "300"))
+NOTIFICATION_DIGEST_FLUSH_SECONDS = int(os.getenv("NOTIFICATION_DIGEST_FLUSH_SECONDS", "60"))
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
+# Request handlers enqueue through a local buffer, flushed to the broker in the background
+CELERY_ENQUEUE_BUFFER_SIZE = int(os.getenv("CELERY_ENQUEUE_BUFFER_SIZE", "1000"))
+CELERY_ENQUEUE_BATCH_SIZE = int(os.getenv("CELERY_ENQUEUE_BATCH_SIZE", "50"))
+CELERY_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("CELERY_ENQUEUE_TIMEOUT_SECONDS", "2"))
+# Every API process spools to its own file, the pid inserted before the extension (celery_spool.<pid>.jsonl)
+CELERY_SPOOL_PATH = os.getenv("CELERY_SPOOL_PATH", str(BASE_DIR / "logs" / "celery_spool.jsonl"))
+CELERY_SPOOL_RETRY_SECONDS = float(os.getenv("CELERY_SPOOL_RETRY_SECONDS", "30"))
+# Worker processes for a worker started on one queue (celery worker -Q <queue>)
+CELERY_QUEUE_CONCURRENCY = {
+    "transactional": int(os.getenv("CELERY_TRANSACTIONAL_CONCURRENCY", "2")),
+    "notifications": int(os.getenv("CELERY_NOTIFICATIONS_CONCURRENCY", "4")),
+    "errors": int(os.getenv("CELERY_ERRORS_CONCURRENCY", "1")),
+    "default": int(os.getenv("CELERY_DEFAULT_CONCURRENCY", "2")),
+}
 
 # Cloudinary Settings
 CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
@@ -68,17 +91,123 @@ CLOUDINARY_SECURE = os.getenv("CLOUDINARY_SECURE")
 
 # Logging Settings
 IS_LOCAL = os.getenv("IS_LOCAL", "False").lower() == "true"
+# Log records wait here for the background writer thread, past this they are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper()
+# Per-logger levels, most specific prefix wins: "app.core.websocket_manager=WARNING,sqlalchemy.engine=INFO".
+# App loggers are named after their module (get_logger(__name__)), so any module or package prefix works
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Fraction of INFO/DEBUG records kept for high-frequency loggers (per message broadcast/publish lines)
+LOG_SAMPLE_RATES = os.getenv(
+    "LOG_SAMPLE_RATES",
+    "app.core.websocket_manager.broadcast=0.1,app.services.redis_publisher.publish=0.1",
+)
+# JSON lines log file. "process": logs/app.<pid>.log per process (uvicorn/Celery worker), each
+# rotated by size, or by time if LOG_ROTATE_WHEN is set ("midnight", "H"), and gzipped in-process.
+# "external": every process appends to logs/app.log and rotation is left to logrotate or similar
+# (the file is reopened when it is moved away). Several processes must never rotate one file.
+LOG_FILE_ROTATION = os.getenv("LOG_FILE_ROTATION", "process").lower()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN") or None
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))
+# Requests slower than this are logged as warnings with their stage timings
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+LOG_CONSOLE_FORMAT = os.getenv("LOG_CONSOLE_FORMAT", "text" if IS_LOCAL else "json").lower()
+
+# Tracing Settings
+# "memory" (last spans in-process), "file" (JSON lines), "otlp" (OTLP/HTTP JSON collector) or "none"
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "memory" if IS_LOCAL else "none").lower()
+# Fraction of requests traced, decided per trace
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", str(BASE_DIR / "logs" / "spans.jsonl"))
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_MEMORY_SPANS = int(os.getenv("TRACING_MEMORY_SPANS", "5000"))
+# Finished spans waiting for the exporter thread, past this they are dropped
+TRACING_QUEUE_SIZE = int(os.getenv("TRACING_QUEUE_SIZE", "10000"))
+
+# Query Diagnostics Settings
+# Requests running more SQL statements than this are logged as warnings with their most repeated statement
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "25"))
+# Per-route budgets, by route template: "/api/v1/dashboard/manager=60,/api/v1/project/{project_id}=10"
+DB_QUERY_BUDGETS = os.getenv("DB_QUERY_BUDGETS", "")
+# X-DB-Query-Count / X-DB-Time headers on every response
+DB_DEBUG_HEADERS = os.getenv("DB_DEBUG_HEADERS", str(DEBUG)).lower() == "true"
+# Statements slower than this are kept in the slow-query log (GET /api/v1/admin/slow-queries)
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_SLOW_QUERY_BUFFER = int(os.getenv("DB_SLOW_QUERY_BUFFER", "200"))
+# Keep bound parameter values in the slow-query log; they hold password hashes,
+# tokens and emails, so by default only their types are kept
+DB_SLOW_QUERY_PARAMETERS = os.getenv("DB_SLOW_QUERY_PARAMETERS", "False").lower() == "true"
+# Slow SELECTs are re-run as EXPLAIN (ANALYZE, BUFFERS) in the background, once per statement per interval
+DB_SLOW_QUERY_EXPLAIN = os.getenv("DB_SLOW_QUERY_EXPLAIN", "True").lower() == "true"
+DB_SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("DB_SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+DB_SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("DB_SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+
+# Request Profiler Settings (admins send X-Profile: 1, see app.core.profiler)
+# Fraction of all requests profiled without being asked, 0 disables
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+# Share of wall time the sampler may spend taking samples
+PROFILE_MAX_OVERHEAD = float(os.getenv("PROFILE_MAX_OVERHEAD", "0.05"))
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "logs" / "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
 
 # Redis Settings
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
 
+# Presence Settings
+PRESENCE_HEARTBEAT_SECONDS = int(os.getenv("PRESENCE_HEARTBEAT_SECONDS", "15"))
+PRESENCE_TTL_SECONDS = int(os.getenv("PRESENCE_TTL_SECONDS", "45"))
+
+# WebSocket Settings
+WS_HEARTBEAT_SECONDS = int(os.getenv("WS_HEARTBEAT_SECONDS", "20"))
+WS_IDLE_TIMEOUT_SECONDS = int(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "90"))
+
+# Server-Sent Events Settings
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+SSE_REPLAY_EVENTS = int(os.getenv("SSE_REPLAY_EVENTS", "100"))
+SSE_REPLAY_PROJECTS = int(os.getenv("SSE_REPLAY_PROJECTS", "200"))
+
+# Principal Cache Settings (connection-free auth lookups for WebSockets)
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+PRINCIPAL_LOCAL_TTL_SECONDS = int(os.getenv("PRINCIPAL_LOCAL_TTL_SECONDS", "30"))
+PRINCIPAL_LOCAL_MAX_ENTRIES = int(os.getenv("PRINCIPAL_LOCAL_MAX_ENTRIES", "10000"))
+# Keep below the engine pool_size so HTTP requests always have connections left
+PRINCIPAL_DB_CONCURRENCY = int(os.getenv("PRINCIPAL_DB_CONCURRENCY", "3"))
+
+# Project Membership Cache Settings (authorization for cheap reads like presence)
+PROJECT_MEMBER_CACHE_TTL_SECONDS = int(os.getenv("PROJECT_MEMBER_CACHE_TTL_SECONDS", "300"))
+PROJECT_MEMBER_LOCAL_TTL_SECONDS = int(os.getenv("PROJECT_MEMBER_LOCAL_TTL_SECONDS", "30"))
+PROJECT_MEMBER_LOCAL_MAX_ENTRIES = int(os.getenv("PROJECT_MEMBER_LOCAL_MAX_ENTRIES", "10000"))
+
+# Realtime Event Bus Settings
+# "redis" (multi-process) or "memory" (single process, no Redis needed for realtime)
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "redis").lower()
+EVENT_BUS_QUEUE_SIZE = int(os.getenv("EVENT_BUS_QUEUE_SIZE", "10000"))
+
+# Transactional Outbox Settings (Redis events and emails written with the DB change)
+OUTBOX_RELAY_ENABLED = os.getenv("OUTBOX_RELAY_ENABLED", "True").lower() == "true"
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+# Claimed rows are delivered outside any transaction; a relay that dies mid-batch
+# leaves them to another one once the lease runs out
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+# Upper bound for each delivery (Redis pipeline, Celery sends, digest pipeline) of a batch
+OUTBOX_SEND_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_SEND_TIMEOUT_SECONDS", "10"))
+
 
 # Error Notification Settings
 ERROR_NOTIFICATION_EMAILS = os.getenv("ERROR_NOTIFICATION_EMAILS", "").split(",") if os.getenv("ERROR_NOTIFICATION_EMAILS") else []
 ERROR_NOTIFICATION_EMAILS = [email.strip() for email in ERROR_NOTIFICATION_EMAILS if email.strip()]
 ENABLE_ERROR_EMAILS = os.getenv("ENABLE_ERROR_EMAILS", "True").lower() == "true"
+# Repeats of an error are counted and mailed as one summary per window
+ERROR_EMAIL_WINDOW_SECONDS = int(os.getenv("ERROR_EMAIL_WINDOW_SECONDS", "600"))
+ERROR_EMAIL_FLUSH_SECONDS = int(os.getenv("ERROR_EMAIL_FLUSH_SECONDS", "60"))
 
 # GitHub Settings
 GITHUB_SECRET_KEY = os.getenv("GITHUB_SECRET_KEY")
@@ -0,0 +1,143 @@
+"""
+Compact registry of the WebSocket connections held by this process.
+
+One slotted record per socket, indexed by socket, by project and by user, so
+that register/remove and room lookups are all O(1) and an idle connection
+costs a few hundred bytes rather than a dict per socket.
+"""
+from typing import Dict, Iterator, Optional, Set
+from fastapi import WebSocket
+
+
+class SubscriptionFilter:
+    """
+    Server-side filter declared by a socket on connect.
+    An empty field means "no restriction" for that attribute.
+    """
+
+    __slots__ = ("sprint_ids", "assignee_ids", "issue_types")
+
+    def __init__(
+        self,
+        sprint_ids: Optional[Set[int]] = None,
+        assignee_ids: Optional[Set[int]] = None,
+        issue_types: Optional[Set[str]] = None,
+    ):
+        self.sprint_ids = frozenset(sprint_ids or ())
+        self.assignee_ids = frozenset(assignee_ids or ())
+        self.issue_types = frozenset(issue_types or ())
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.sprint_ids or self.assignee_ids or self.issue_types)
+
+    def matches(self, message: dict) -> bool:
+        """
+        Check an issue event against the filter.
+        Both the current and the previous values of the issue are checked so a
+        client still hears about an issue moving out of its view.
+        Events that don't carry a filtered field (e.g. deletions) always pass.
+        """
+        if self.is_empty:
+            return True
+
+        data = message.get("data") or {}
+        previous = message.get("previous") or {}
+        return (
+            self._field_matches(self.sprint_ids, "sprint_id", data, previous)
+            and self._field_matches(self.assignee_ids, "assigned_to", data, previous)
+            and self._field_matches(self.issue_types, "type", data, previous)
+        )
+
+    @staticmethod
+    def _field_matches(allowed: frozenset, key: str, data: dict, previous: dict) -> bool:
+        if not allowed or key not in data:
+            return True
+        return data.get(key) in allowed or previous.get(key) in allowed
+
+
+# Shared by every socket that declared no filter, which is the common case
+NO_FILTER = SubscriptionFilter()
+
+
+class ConnectionRecord:
+    """One registered socket. project_id is None for user-channel sockets."""
+
+    __slots__ = ("websocket", "project_id", "user_id", "user_name", "filters", "last_seen", "protocol")
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        project_id: Optional[int],
+        user_id: int,
+        user_name: str,
+        filters: SubscriptionFilter,
+        last_seen: float,
+        protocol: str = "json",
+    ):
+        self.websocket = websocket
+        self.project_id = project_id
+        self.user_id = user_id
+        self.user_name = user_name
+        self.filters = filters
+        self.last_seen = last_seen
+        self.protocol = protocol
+
+
+class ConnectionRegistry:
+    def __init__(self):
+        self._by_socket: Dict[WebSocket, ConnectionRecord] = {}
+        self._by_project: Dict[int, Set[ConnectionRecord]] = {}
+        self._by_user: Dict[int, Set[ConnectionRecord]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_socket)
+
+    def __iter__(self) -> Iterator[ConnectionRecord]:
+        return iter(list(self._by_socket.values()))
+
+    def get(self, websocket: WebSocket) -> Optional[ConnectionRecord]:
+        return self._by_socket.get(websocket)
+
+    def add(self, record: ConnectionRecord):
+        self._by_socket[record.websocket] = record
+        if record.project_id is not None:
+            self._by_project.setdefault(record.project_id, set()).add(record)
+        self._by_user.setdefault(record.user_id, set()).add(record)
+
+    def remove(self, websocket: WebSocket) -> Optional[ConnectionRecord]:
+        """Unregister a socket, returns its record or None if it was not registered"""
+        record = self._by_socket.pop(websocket, None)
+        if record is None:
+            return None
+
+        if record.project_id is not None:
+            self._discard(self._by_project, record.project_id, record)
+        self._discard(self._by_user, record.user_id, record)
+        return record
+
+    @staticmethod
+    def _discard(index: Dict[int, Set[ConnectionRecord]], key: int, record: ConnectionRecord):
+        records = index.get(key)
+        if records is not None:
+            records.discard(record)
+            if not records:
+                del index[key]
+
+    def project(self, project_id: int) -> Set[ConnectionRecord]:
+        return self._by_project.get(project_id, set())
+
+    def user(self, user_id: int) -> Set[ConnectionRecord]:
+        return self._by_user.get(user_id, set())
+
+    def has_project(self, project_id: int) -> bool:
+        return project_id in self._by_project
+
+    def user_in_project(self, user_id: int, project_id: int) -> bool:
+        return any(record.project_id == project_id for record in self._by_user.get(user_id, ()))
+
+    def project_count(self, project_id: int) -> int:
+        return len(self._by_project.get(project_id, ()))
+
+    def project_ids(self):
+        return self._by_project.keys()
@@ -6,6 +6,7 @@ from typing import Optional
 from app.db.connection import get_db
 from app.db.crud.user import get_user_by_id
 from app.core.security import decode_token
+from app.core.principal import Principal, get_principal
 from app.models.model import User
 from app.common.errors import CredentialError,PermissionDeniedError,DatabaseErrors
 from app.core.enums import Role
@@ -73,6 +74,43 @@ async def get_current_user(
             )
         
         raise CredentialError(message="Invalid authentication credentials")
+
+async def get_current_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+) -> int:
+    """
+    Dependency returning the user id from the JWT token without touching the database.
+    Use for cheap, high-frequency reads that only need to know the caller is authenticated.
+    """
+    return user_id_from_token(credentials.credentials if credentials else None)
+
+def user_id_from_token(token: Optional[str]) -> int:
+    """User id of a JWT access token, raises CredentialError when it's missing or invalid"""
+    if not token:
+        raise CredentialError(message="Authentication required. Please provide a valid token.")
+
+    try:
+        payload = decode_token(token)
+    except ValueError as e:
+        raise CredentialError(message=f"Invalid token: {str(e)}")
+
+    user_id = payload.get("user_id")
+    if not user_id:
+        raise CredentialError(message="Invalid token: user_id not found")
+
+    return user_id
+
+async def get_principal_from_token(token: Optional[str]) -> Principal:
+    """
+    Cached principal of a JWT access token, for long-lived connections
+    (WebSocket, SSE) that must not hold a DB session.
+    Raises CredentialError like the dependencies above.
+    """
+    user = await get_principal(user_id_from_token(token))
+    if not user:
+        raise CredentialError(message="User not found")
+    return user
+
 # ----------------------------------------------------------------------------------------------
 # ROLE CHECKER
 # ----------------------------------------------------------------------------------------------
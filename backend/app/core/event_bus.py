@@ -0,0 +1,153 @@
+"""
+Pluggable transport for realtime events.
+
+The WebSocket/SSE listener and the publishers only talk to `event_bus`:
+- "redis": Redis Pub/Sub, required as soon as more than one process serves sockets
+- "memory": an in-process asyncio bus for single-process and dev deployments,
+  realtime then works without Redis (and benchmarks measure fan-out alone)
+
+Selected with EVENT_BUS_BACKEND. Payloads are the binary event envelopes
+from app.core.event_codec on both backends.
+"""
+import asyncio
+from fnmatch import fnmatchcase
+from typing import List, Optional, Sequence, Set, Tuple
+
+from app.core.conf import EVENT_BUS_BACKEND, EVENT_BUS_QUEUE_SIZE
+from app.core.redis_config import async_redis_client, async_redis_binary_client
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
+
+# (channel, payload) as delivered to a subscription
+BusMessage = Tuple[str, bytes]
+
+
+class Subscription:
+    """A pattern subscription, read with get_message() until close()"""
+
+    async def get_message(self, timeout: float) -> Optional[BusMessage]:
+        """Next message, or None if nothing arrived within timeout seconds"""
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+
+class EventBus:
+    name = "abstract"
+
+    async def publish(self, channel: str, payload: bytes) -> int:
+        """Publish one payload, returns the number of subscribers that received it"""
+        return (await self.publish_many([(channel, payload)]))[0]
+
+    async def publish_many(self, messages: Sequence[BusMessage]) -> List[int]:
+        """Publish in order, in as few round trips as the backend allows; subscriber count per message"""
+        raise NotImplementedError
+
+    async def subscribe(self, *patterns: str) -> Subscription:
+        """Subscribe to glob channel patterns such as "project:*:updates" """
+        raise NotImplementedError
+
+
+# ================= REDIS =================
+
+class RedisSubscription(Subscription):
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get_message(self, timeout: float) -> Optional[BusMessage]:
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message and message['type'] == 'pmessage':
+            return message['channel'].decode(), message['data']
+        return None
+
+    async def close(self):
+        await self.pubsub.punsubscribe()
+        await self.pubsub.close()
+
+
+class RedisEventBus(EventBus):
+    name = "redis"
+
+    async def publish_many(self, messages: Sequence[BusMessage]) -> List[int]:
+        pipe = async_redis_client.pipeline(transaction=False)
+        for channel, payload in messages:
+            pipe.publish(channel, payload)
+        return await pipe.execute()
+
+    async def subscribe(self, *patterns: str) -> Subscription:
+        await async_redis_client.ping()
+        # Binary client: envelopes are relayed as raw frames, never decoded to text
+        pubsub = async_redis_binary_client.pubsub()
+        await pubsub.psubscribe(*patterns)
+        return RedisSubscription(pubsub)
+
+
+# ================= IN-PROCESS =================
+
+class MemorySubscription(Subscription):
+    def __init__(self, bus: "MemoryEventBus", patterns: Tuple[str, ...]):
+        self.bus = bus
+        self.patterns = patterns
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_BUS_QUEUE_SIZE)
+        self.dropped = 0
+
+    def matches(self, channel: str) -> bool:
+        return any(fnmatchcase(channel, pattern) for pattern in self.patterns)
+
+    def deliver(self, message: BusMessage) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            # Same contract as Redis Pub/Sub: a subscriber that can't keep up loses messages
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                Logger.warning(f"In-process event bus subscriber is full, {self.dropped} message(s) dropped")
+            return False
+
+    async def get_message(self, timeout: float) -> Optional[BusMessage]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.bus.subscriptions.discard(self)
+
+
+class MemoryEventBus(EventBus):
+    """Delivers to subscriptions of this process only - never use with several workers"""
+
+    name = "memory"
+
+    def __init__(self):
+        self.subscriptions: Set[MemorySubscription] = set()
+
+    async def publish_many(self, messages: Sequence[BusMessage]) -> List[int]:
+        results = []
+        for message in messages:
+            results.append(sum(
+                subscription.deliver(message)
+                for subscription in list(self.subscriptions)
+                if subscription.matches(message[0])
+            ))
+        return results
+
+    async def subscribe(self, *patterns: str) -> Subscription:
+        subscription = MemorySubscription(self, patterns)
+        self.subscriptions.add(subscription)
+        return subscription
+
+
+def _create_event_bus() -> EventBus:
+    if EVENT_BUS_BACKEND == "memory":
+        Logger.info("Using the in-process event bus, realtime events stay inside this process")
+        return MemoryEventBus()
+    if EVENT_BUS_BACKEND != "redis":
+        Logger.warning(f"Unknown EVENT_BUS_BACKEND '{EVENT_BUS_BACKEND}', falling back to redis")
+    return RedisEventBus()
+
+
+event_bus = _create_event_bus()
@@ -0,0 +1,109 @@
+"""
+Wire format for realtime events.
+
+Events are encoded once, at publish time, into an envelope holding both the
+JSON and the MessagePack frame plus a small routing section. Listeners only
+unpack the envelope and relay the ready-made frame bytes to each socket in
+the protocol it negotiated, so nothing is re-serialized per subscriber.
+"""
+import json
+import time
+import secrets
+from typing import Optional
+import msgpack
+
+# WebSocket subprotocol a client offers to receive binary MessagePack frames
+MSGPACK_SUBPROTOCOL = "zyro.msgpack.v1"
+
+PROTOCOL_JSON = "json"
+PROTOCOL_MSGPACK = "msgpack"
+
+# Issue fields the server-side subscription filters look at
+_ROUTE_KEYS = ("sprint_id", "assigned_to", "type")
+
+
+def new_event_id() -> str:
+    """Roughly time-ordered, unique across workers; used as the SSE event id"""
+    return f"{time.time_ns()}-{secrets.token_hex(3)}"
+
+
+def _route_of(message: dict) -> dict:
+    """The subset of an event needed to route it, shaped like the event itself"""
+    data = message.get("data") or {}
+    return {
+        "type": message.get("type"),
+        "data": {key: data[key] for key in _ROUTE_KEYS if key in data},
+        "previous": message.get("previous") or {},
+    }
+
+
+class EncodedEvent:
+    """
+    An event with its JSON and MessagePack frames already rendered.
+    `trace` ({"request_id", "at"}) ties it to the request that caused it; it
+    travels in the envelope only, clients never see it.
+    """
+
+    __slots__ = ("id", "route", "json_frame", "msgpack_frame", "trace")
+
+    def __init__(self, id: str, route: dict, json_frame: str, msgpack_frame: bytes, trace: Optional[dict] = None):
+        self.id = id
+        self.route = route
+        self.json_frame = json_frame
+        self.msgpack_frame = msgpack_frame
+        self.trace = trace
+
+    @property
+    def type(self) -> Optional[str]:
+        return self.route.get("type")
+
+    @property
+    def request_id(self) -> Optional[str]:
+        return self.trace.get("request_id") if self.trace else None
+
+    @classmethod
+    def from_message(cls, message: dict, trace: Optional[dict] = None) -> "EncodedEvent":
+        return cls(
+            id=new_event_id(),
+            route=_route_of(message),
+            json_frame=json.dumps(message),
+            msgpack_frame=msgpack.packb(message, use_bin_type=True),
+            trace=trace,
+        )
+
+    def to_envelope(self) -> bytes:
+        """Serialize for Redis"""
+        envelope = {"i": self.id, "r": self.route, "j": self.json_frame, "m": self.msgpack_frame}
+        if self.trace:
+            envelope["x"] = self.trace
+        return msgpack.packb(envelope, use_bin_type=True)
+
+    @classmethod
+    def from_envelope(cls, raw: bytes) -> "EncodedEvent":
+        """Unpack a Redis payload without decoding the frames themselves"""
+        envelope = msgpack.unpackb(raw, raw=False)
+        return cls(
+            id=envelope["i"], route=envelope["r"], json_frame=envelope["j"], msgpack_frame=envelope["m"],
+            trace=envelope.get("x"),
+        )
+
+
+def encode_event(message: dict, trace: Optional[dict] = None) -> bytes:
+    """Encode an event for publishing on a Redis channel"""
+    return EncodedEvent.from_message(message, trace).to_envelope()
+
+
+def decode_client_frame(frame: dict) -> Optional[dict]:
+    """
+    Decode a raw ASGI websocket.receive message from a client.
+    JSON arrives as text frames, MessagePack as binary frames.
+    Returns None for frames that can't be decoded.
+    """
+    try:
+        if frame.get("text") is not None:
+            return json.loads(frame["text"])
+        if frame.get("bytes") is not None:
+            return msgpack.unpackb(frame["bytes"], raw=False)
+    except (ValueError, msgpack.UnpackException):
+        return None
+    return None
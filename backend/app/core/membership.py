@@ -0,0 +1,88 @@
+"""
+Cached project membership checks.
+
+Endpoints that read from Redis only (presence) still have to authorize the
+caller. Membership is resolved from a process-local cache, then a Redis hash
+per project, and only then the database, like principals (app.core.principal).
+Negative answers are cached too, so the project endpoints that add or remove
+members must call invalidate_project_members().
+"""
+import asyncio
+import time
+from typing import Dict, Tuple
+
+from app.core.conf import (
+    PROJECT_MEMBER_CACHE_TTL_SECONDS,
+    PROJECT_MEMBER_LOCAL_TTL_SECONDS,
+    PROJECT_MEMBER_LOCAL_MAX_ENTRIES,
+    PRINCIPAL_DB_CONCURRENCY,
+)
+from app.core.redis_config import async_redis_client
+from app.db.connection import AsyncSessionLocal
+from app.db.crud.project_crud import is_project_member
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
+
+
+def project_members_key(project_id: int) -> str:
+    """Redis hash {user_id: "1" | "0"}"""
+    return f"project_members:{project_id}"
+
+
+# {(project_id, user_id): (expires_at, is_member)}
+_local_cache: Dict[Tuple[int, int], Tuple[float, bool]] = {}
+# Caps how many pool connections membership misses can take at once, like principal misses
+_db_semaphore = asyncio.Semaphore(PRINCIPAL_DB_CONCURRENCY)
+
+
+async def _load_from_db(project_id: int, user_id: int) -> bool:
+    async with _db_semaphore:
+        async with AsyncSessionLocal() as session:
+            return await is_project_member(project_id=project_id, user_id=user_id, session=session)
+
+
+async def _load(project_id: int, user_id: int) -> bool:
+    key = project_members_key(project_id)
+    try:
+        raw = await async_redis_client.hget(key, str(user_id))
+        if raw is not None:
+            return raw == "1"
+    except Exception as e:
+        Logger.warning(f"Membership cache read failed for project {project_id}: {e}")
+
+    is_member = await _load_from_db(project_id, user_id)
+    try:
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, str(user_id), "1" if is_member else "0")
+            pipe.expire(key, PROJECT_MEMBER_CACHE_TTL_SECONDS)
+            await pipe.execute()
+    except Exception as e:
+        Logger.warning(f"Membership cache write failed for project {project_id}: {e}")
+    return is_member
+
+
+async def is_member_of_project(project_id: int, user_id: int) -> bool:
+    """
+    Whether the user is a member of the project.
+    Order: process-local cache -> Redis -> database (short session, released before returning).
+    """
+    cached = _local_cache.get((project_id, user_id))
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    is_member = await _load(project_id, user_id)
+    if len(_local_cache) >= PROJECT_MEMBER_LOCAL_MAX_ENTRIES:
+        _local_cache.clear()
+    _local_cache[(project_id, user_id)] = (time.monotonic() + PROJECT_MEMBER_LOCAL_TTL_SECONDS, is_member)
+    return is_member
+
+
+async def invalidate_project_members(project_id: int):
+    """Drop cached memberships of a project after its members change (or it is created or deleted)"""
+    for key in [key for key in _local_cache if key[0] == project_id]:
+        _local_cache.pop(key, None)
+    try:
+        await async_redis_client.delete(project_members_key(project_id))
+    except Exception as e:
+        Logger.warning(f"Membership cache invalidation failed for project {project_id}: {e}")
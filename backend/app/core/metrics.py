@@ -0,0 +1,264 @@
+"""
+Prometheus metrics, served in the text exposition format on /metrics.
+
+Counters, gauges and histograms are plain in-process objects: recording is a
+dict lookup and an addition on the event loop thread, rendering happens only
+when Prometheus scrapes. Label values are kept low-cardinality (route
+templates, not paths). Values that already live elsewhere (pool counters,
+WebSocket registry) are read at scrape time through callback gauges instead
+of being kept in sync. Celery queue depth and lag come from the broker, a
+blocking read done off the event loop before each scrape.
+
+Every API process has its own registry: with several uvicorn workers, scrape
+each worker, or sum the series in Prometheus by instance.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Prometheus client defaults, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Starlette appends "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        registry.register(self)
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for key, child in self._children.items():
+            yield f"{self.name}_total{_labels(self.labelnames, key)} {_number(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def samples(self):
+        for key, child in self._children.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(child.value)}"
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose values are read at scrape time: the callback returns {label values: value}"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set_function(self, callback: Callable[[], Dict[LabelValues, float]]):
+        self._callback = callback
+
+    def samples(self):
+        if self._callback is None:
+            return
+        for key, value in self._callback().items():
+            yield f"{self.name}{_labels(self.labelnames, tuple(str(v) for v in key))} {_number(value)}"
+
+
+class CallbackCounter(CallbackGauge):
+    """CallbackGauge over a value that only goes up (a counter kept by another object)"""
+    kind = "counter"
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Per bucket, not cumulative; the last slot is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self):
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(child.sum)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = Registry()
+
+
+# ================= ROUTE LABEL =================
+
+_route_paths: Dict[object, str] = {}
+
+
+def route_label(scope) -> str:
+    """Path template of the route that handled a request ("/api/v1/issues/{issue_id}")"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Starlette 0.27 leaves only the endpoint in the scope, map it back to its route once
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "<unmatched>"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        app = scope.get("app")
+        for candidate in getattr(app, "routes", ()):
+            if getattr(candidate, "endpoint", None) is endpoint:
+                path = candidate.path
+                break
+        path = _route_paths[endpoint] = path or "<unknown>"
+    return path
+
+
+# ================= METRICS =================
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", ("method",)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a connection from the pool, waiting and connecting included",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_CONNECTIONS = CallbackGauge(
+    "db_pool_connections", "Database pool connections by state", ("state",)
+)
+REDIS_PUBLISH_DURATION = Histogram(
+    "redis_publish_duration_seconds", "Event bus publish latency per batch", ("bus",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0),
+)
+WEBSOCKET_CONNECTIONS = CallbackGauge(
+    "websocket_connections", "Open WebSocket connections per project", ("project_id",)
+)
+WEBSOCKET_BROADCAST_RECIPIENTS = Histogram(
+    "websocket_broadcast_recipients", "Connections a realtime event was sent to", ("room",),
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+CELERY_ENQUEUE_LATENCY = Histogram(
+    "celery_enqueue_latency_seconds", "Time from enqueue in a request to the broker accepting the task",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+CELERY_ENQUEUE_PENDING = CallbackGauge(
+    "celery_enqueue_pending", "Tasks not yet handed to the broker: in the memory buffer or in the spool file", ("where",)
+)
+CELERY_ENQUEUE_TASKS = CallbackCounter(
+    "celery_enqueue_tasks_total", "Tasks through the API enqueuer by outcome", ("outcome",)
+)
+CELERY_QUEUE_DEPTH = CallbackGauge(
+    "celery_queue_depth", "Messages waiting in each Celery queue of the broker", ("queue",)
+)
+CELERY_QUEUE_LAG = CallbackGauge(
+    "celery_queue_lag_seconds", "Age of the oldest waiting message in each Celery queue", ("queue",)
+)
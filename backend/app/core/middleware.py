@@ -0,0 +1,139 @@
+"""
+Request context middleware.
+
+Pure ASGI (no BaseHTTPMiddleware), so the context it sets is the one the
+endpoint, its dependencies and the exception handlers run in. For every HTTP
+request and WebSocket connection it sets the request id (the caller's
+X-Request-ID if valid, else a new one) and starts the stage timings. HTTP
+responses carry X-Request-ID and a Server-Timing header, and one access line
+with the timings is logged per request. HTTP requests are also the root
+span of their trace (app.core.tracing) and are recorded in the /metrics
+latency, in-flight and queries-per-request series; Server-Sent Events streams
+stay open for minutes like WebSockets, so they are left out of both and are
+logged by the connection manager instead. Requests running more SQL
+statements than their budget are logged with their most repeated statement,
+usually a lazy load or a per-row query inside a loop (N+1).
+"""
+import time
+from contextlib import nullcontext
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.conf import API_V1_PREFIX, SLOW_REQUEST_MS, DB_QUERY_BUDGET, DB_QUERY_BUDGETS, DB_DEBUG_HEADERS
+from app.common.logging.logging_config import get_logger
+from app.common.logging.structured import parse_mapping
+from app.common.logging.request import (
+    get_current_request_id,
+    set_request_id,
+    remove_request_id_from_pool,
+    start_request_timings,
+    get_request_timings,
+    remove_request_timings,
+    start_request_queries,
+    get_request_queries,
+    remove_request_queries,
+)
+from app.core.tracing import span
+from app.core.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    DB_QUERIES_PER_REQUEST,
+    route_label,
+)
+
+REQUEST_ID_HEADER = "x-request-id"
+# Long-lived event streams (app.api.v1.sse), not requests
+STREAM_PATH_PREFIX = f"{API_V1_PREFIX}/sse/"
+
+# One line per request: level and sampling set through LOG_LEVELS / LOG_SAMPLE_RATES
+AccessLogger = get_logger(f"{__name__}.access")
+QueryLogger = get_logger(f"{__name__}.queries")
+
+QUERY_BUDGETS = parse_mapping(DB_QUERY_BUDGETS, int)
+
+
+def server_timing(timings: dict, total_ms: float) -> str:
+    """Server-Timing header value, shown per stage in the browser's network panel"""
+    parts = [f"{name};dur={ms:.1f}" for name, ms in timings.items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+class RequestContextMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_token = set_request_id(Headers(scope=scope).get(REQUEST_ID_HEADER))
+        timings_token = start_request_timings()
+        queries_token = start_request_queries()
+        request_id = get_current_request_id()
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_context(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["Server-Timing"] = server_timing(get_request_timings(), (time.perf_counter() - started) * 1000)
+                if DB_DEBUG_HEADERS:
+                    queries = get_request_queries()
+                    headers["X-DB-Query-Count"] = str(queries.count)
+                    headers["X-DB-Time"] = f"{queries.ms:.1f}ms"
+            await send(message)
+
+        # WebSocket connections and SSE streams live for minutes, only HTTP requests
+        # get a root span and the request metrics
+        measured = scope["type"] == "http" and not scope["path"].startswith(STREAM_PATH_PREFIX)
+        if measured:
+            HTTP_REQUESTS_IN_FLIGHT.labels(scope["method"]).inc()
+        root = span("http.request", method=scope["method"], path=scope["path"]) if measured else nullcontext()
+        try:
+            with root as request_span:
+                await self.app(scope, receive, send_with_context)
+                if request_span is not None:
+                    request_span.set(status=status_code)
+        except Exception:
+            if measured:
+                self._end_request(scope, 500, (time.perf_counter() - started) * 1000)
+            # Context left set on purpose: the catch-all Exception handler runs in
+            # ServerErrorMiddleware, outside this one, and still logs under this id.
+            # It ends with the request's task anyway.
+            raise
+
+        if measured:
+            self._end_request(scope, status_code, (time.perf_counter() - started) * 1000)
+        remove_request_queries(queries_token)
+        remove_request_timings(timings_token)
+        remove_request_id_from_pool(request_token)
+
+    @staticmethod
+    def _end_request(scope, status_code: int, total_ms: float):
+        method, route = scope["method"], route_label(scope)
+        HTTP_REQUESTS_IN_FLIGHT.labels(method).dec()
+        HTTP_REQUEST_DURATION.labels(method, route, status_code).observe(total_ms / 1000)
+        queries = get_request_queries()
+        DB_QUERIES_PER_REQUEST.labels(method, route).observe(queries.count)
+        budget = QUERY_BUDGETS.get(route, DB_QUERY_BUDGET)
+        if queries.count > budget:
+            statement, repeats = queries.most_repeated()
+            QueryLogger.warning(
+                f"{method} {route} ran {queries.count} SQL statements (budget {budget}) in {queries.ms:.1f}ms, "
+                f"most repeated ({repeats}x): {' '.join(statement.split())[:500]}",
+                extra={"route": route, "queries": queries.count, "db_ms": round(queries.ms, 1), "budget": budget, "repeats": repeats},
+            )
+
+        timings = {name: round(ms, 1) for name, ms in get_request_timings().items()}
+        message = f"{scope['method']} {scope['path']} {status_code} in {total_ms:.1f}ms"
+        extra = {"method": scope["method"], "path": scope["path"], "status": status_code, "duration_ms": round(total_ms, 1), "stages": timings,
+                 "queries": queries.count, "db_ms": round(queries.ms, 1)}
+        if total_ms >= SLOW_REQUEST_MS:
+            # WARNING is never sampled out, slow requests are always traceable
+            AccessLogger.warning(f"Slow request: {message}, stages: {timings}", extra=extra)
+        else:
+            AccessLogger.info(message, extra=extra)
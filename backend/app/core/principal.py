@@ -0,0 +1,137 @@
+"""
+Cached, connection-free principal lookup.
+
+Long-lived connections (WebSockets) only need a handful of user fields to
+authenticate. Resolving them from a process-local cache, then Redis, and only
+then the database keeps connection storms from holding pool connections
+during the handshake.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+
+from app.core.conf import (
+    PRINCIPAL_CACHE_TTL_SECONDS,
+    PRINCIPAL_LOCAL_TTL_SECONDS,
+    PRINCIPAL_LOCAL_MAX_ENTRIES,
+    PRINCIPAL_DB_CONCURRENCY,
+)
+from app.core.enums import Role, UserStatus
+from app.core.redis_config import async_redis_client
+from app.db.connection import AsyncSessionLocal
+from app.db.crud.user import get_user_by_id
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    name: str
+    email: str
+    role: Role
+    status: UserStatus
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["role"] = self.role.value
+        data["status"] = self.status.value
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Principal":
+        data = json.loads(raw)
+        data["role"] = Role(data["role"])
+        data["status"] = UserStatus(data["status"])
+        return cls(**data)
+
+
+def principal_key(user_id: int) -> str:
+    return f"principal:{user_id}"
+
+
+# {user_id: (expires_at, principal)}
+_local_cache: Dict[int, Tuple[float, Principal]] = {}
+# Concurrent misses for the same user share a single DB lookup
+_inflight: Dict[int, asyncio.Future] = {}
+# Caps how many pool connections principal misses can take at once
+_db_semaphore = asyncio.Semaphore(PRINCIPAL_DB_CONCURRENCY)
+
+
+async def _load_from_db(user_id: int) -> Optional[Principal]:
+    async with _db_semaphore:
+        async with AsyncSessionLocal() as session:
+            user = await get_user_by_id(user_id=user_id, session=session)
+            if not user:
+                return None
+            return Principal(id=user.id, name=user.name, email=user.email, role=user.role, status=user.status)
+
+
+async def _load(user_id: int) -> Optional[Principal]:
+    try:
+        raw = await async_redis_client.get(principal_key(user_id))
+        if raw:
+            return Principal.from_json(raw)
+    except Exception as e:
+        Logger.warning(f"Principal cache read failed for user {user_id}: {e}")
+
+    principal = await _load_from_db(user_id)
+    if principal:
+        try:
+            await async_redis_client.set(principal_key(user_id), principal.to_json(), ex=PRINCIPAL_CACHE_TTL_SECONDS)
+        except Exception as e:
+            Logger.warning(f"Principal cache write failed for user {user_id}: {e}")
+    return principal
+
+
+async def get_principal(user_id: int) -> Optional[Principal]:
+    """
+    Resolve a user id to a Principal.
+    Order: process-local cache -> Redis -> database (short session, released before returning).
+    """
+    cached = _local_cache.get(user_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    future = _inflight.get(user_id)
+    if future:
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                # This caller itself was cancelled
+                raise
+            return await get_principal(user_id)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[user_id] = future
+    try:
+        principal = await _load(user_id)
+        if principal:
+            if len(_local_cache) >= PRINCIPAL_LOCAL_MAX_ENTRIES:
+                _local_cache.clear()
+            _local_cache[user_id] = (time.monotonic() + PRINCIPAL_LOCAL_TTL_SECONDS, principal)
+        future.set_result(principal)
+        return principal
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception retrieved when nobody else was waiting on it
+        future.exception()
+        raise
+    finally:
+        del _inflight[user_id]
+        if not future.done():
+            # The leader was cancelled (client gone): release the followers, they retry
+            future.cancel()
+
+
+async def invalidate_principal(user_id: int):
+    """Drop a cached principal after the user row changes"""
+    _local_cache.pop(user_id, None)
+    try:
+        await async_redis_client.delete(principal_key(user_id))
+    except Exception as e:
+        Logger.warning(f"Principal cache invalidation failed for user {user_id}: {e}")
@@ -0,0 +1,317 @@
+"""
+On-demand sampling profiler for single requests.
+
+A request is profiled when an active admin sends `X-Profile: 1`, or when it
+is picked by PROFILE_SAMPLE_RATE. A sampler thread then records, every
+PROFILE_INTERVAL_MS, where the request's task is: the chain of coroutines it
+is awaiting (following asyncio.gather children), plus the synchronous frames
+below it when it is the one running on the event loop. Stacks are rooted at
+"running" or "waiting", so one flame graph shows both CPU time and time spent
+waiting on the database, Redis or other tasks.
+
+Overhead is capped by construction: at most PROFILE_MAX_CONCURRENT requests
+per process are profiled, sampling stops after PROFILE_MAX_SECONDS, and the
+sampler sleeps long enough between samples that its own time stays under
+PROFILE_MAX_OVERHEAD of wall time. Samples are taken from another thread
+without stopping the loop, so a stack can occasionally be torn; it is a
+statistical profile.
+
+Each profile is written to PROFILE_DIR as <request id>.json with the stacks in
+collapsed format ("frame;frame;frame count"), which flamegraph.pl and
+speedscope read directly; GET /api/v1/admin/profiles lists them.
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.conf import (
+    PROFILE_SAMPLE_RATE,
+    PROFILE_INTERVAL_MS,
+    PROFILE_MAX_SECONDS,
+    PROFILE_MAX_OVERHEAD,
+    PROFILE_MAX_CONCURRENT,
+    PROFILE_DIR,
+    PROFILE_KEEP,
+)
+from app.core.enums import Role, UserStatus
+from app.core.security import decode_token
+from app.core.principal import get_principal
+from app.common.logging.logging_config import get_logger
+from app.common.logging.request import get_current_request_id, VALID_REQUEST_ID
+
+PROFILE_HEADER = "x-profile"
+
+ProfileLogger = get_logger(__name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if "site-packages/" in path:
+        path = path[path.rfind("site-packages/") + len("site-packages/"):]
+    elif "/app/" in path:
+        path = path[path.rfind("/app/") + 1:]
+    # Definition line, not the current one, so samples of one function merge
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _awaited(coro):
+    return getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+
+
+def _coro_frame(coro):
+    return getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+
+
+class RequestSampler:
+    def __init__(self, task: asyncio.Task, loop_thread_id: int):
+        self.task = task
+        self.loop_thread_id = loop_thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampler_seconds = 0.0
+        self.truncated = False
+        self._started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self):
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        delay = interval
+        while not self._stop.wait(delay):
+            started = time.perf_counter()
+            try:
+                self._sample()
+            except Exception:
+                # A torn read of a coroutine chain that changed under us; skip the sample
+                pass
+            cost = time.perf_counter() - started
+            self.sampler_seconds += cost
+            # Sleep so that cost / (cost + delay) stays under PROFILE_MAX_OVERHEAD
+            delay = max(interval, cost * (1 - PROFILE_MAX_OVERHEAD) / PROFILE_MAX_OVERHEAD)
+            if started - self._started > PROFILE_MAX_SECONDS:
+                self.truncated = True
+                return
+
+    def _sample(self):
+        thread_frame = sys._current_frames().get(self.loop_thread_id)
+        for stack in self._task_stacks(self.task, thread_frame, depth=0):
+            self.stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def _task_stacks(self, task, thread_frame, depth: int) -> List[List[str]]:
+        """Stacks of a task, outermost frame first; one per gathered child task"""
+        frames = []
+        coro = task.get_coro()
+        awaited = None
+        while coro is not None:
+            frame = _coro_frame(coro)
+            if frame is None:
+                break
+            frames.append(frame)
+            awaited = _awaited(coro)
+            coro = awaited if _coro_frame(awaited) is not None else None
+
+        labels = [_frame_label(frame) for frame in frames]
+        if frames and thread_frame is not None:
+            # Running on the loop right now: add the sync frames under the innermost coroutine
+            below = []
+            current = thread_frame
+            while current is not None and current is not frames[-1]:
+                below.append(current)
+                current = current.f_back
+            if current is not None:
+                return [["running"] + labels + [_frame_label(frame) for frame in reversed(below)]]
+
+        # Waiting: the future the task is blocked on (the coroutine side only shows its
+        # iterator); follow gathered children and awaited tasks, else name the future
+        waiter = getattr(task, "_fut_waiter", None)
+        children = getattr(waiter, "_children", None)
+        if isinstance(waiter, asyncio.Task):
+            children = [waiter]
+        if children and depth < 5:
+            stacks = []
+            for child in children:
+                if isinstance(child, asyncio.Task) and not child.done():
+                    for stack in self._task_stacks(child, thread_frame, depth + 1):
+                        stacks.append([stack[0]] + labels + stack[1:])
+            if stacks:
+                return stacks
+        waiting_on = waiter if waiter is not None else awaited
+        return [["waiting"] + labels + [f"<{type(waiting_on).__name__ if waiting_on is not None else 'idle'}>"]]
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+# ================= STORE =================
+
+def _profile_path(request_id: str) -> Optional[str]:
+    if not VALID_REQUEST_ID.match(request_id) or request_id.strip(".") != request_id:
+        return None
+    return os.path.join(PROFILE_DIR, f"{request_id}.json")
+
+
+def _profiles_by_age() -> List[Tuple[float, str]]:
+    """(mtime, path) of the stored profiles, oldest first"""
+    entries = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.name.endswith(".json"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                # Profiles are pruned by every worker, one can vanish between listing and stat
+                continue
+    return sorted(entries)
+
+
+def save_profile(profile: dict):
+    """Write a profile and drop the oldest past PROFILE_KEEP; runs in a worker thread"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = _profile_path(profile["request_id"])
+    with open(path, "w", encoding="utf-8") as out:
+        json.dump(profile, out)
+    for _, old_path in _profiles_by_age()[:-PROFILE_KEEP]:
+        try:
+            os.remove(old_path)
+        except FileNotFoundError:
+            # Pruned by another worker meanwhile
+            pass
+
+
+def list_profiles(limit: int = 50) -> List[dict]:
+    """Newest first, without the stacks"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    summaries = []
+    for _, path in _profiles_by_age()[::-1][:limit]:
+        try:
+            with open(path, encoding="utf-8") as profile:
+                data = json.load(profile)
+        except FileNotFoundError:
+            # Pruned since it was listed
+            continue
+        data.pop("collapsed", None)
+        summaries.append(data)
+    return summaries
+
+
+def load_profile(request_id: str) -> Optional[dict]:
+    path = _profile_path(request_id)
+    if path is None:
+        return None
+    try:
+        with open(path, encoding="utf-8") as profile:
+            return json.load(profile)
+    except FileNotFoundError:
+        return None
+
+
+# ================= MIDDLEWARE =================
+
+async def _is_admin(headers: Headers) -> bool:
+    """Signed token of a user who is still an active admin (cached principal, no session)"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        principal = await get_principal(decode_token(token).get("user_id"))
+    except Exception:
+        return False
+    return principal is not None and principal.role == Role.ADMIN and principal.status == UserStatus.ACTIVE
+
+
+class ProfilingMiddleware:
+    """Must run inside RequestContextMiddleware, profiles are keyed by its request id"""
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trigger = await self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_marker(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profiled"] = "1"
+            await send(message)
+
+        sampler = RequestSampler(asyncio.current_task(), threading.get_ident())
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_marker)
+        finally:
+            sampler.stop()
+            await asyncio.to_thread(sampler.join)
+            self.active -= 1
+            duration = time.perf_counter() - started
+            profile = {
+                "request_id": get_current_request_id(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "trigger": trigger,
+                "started_at": started_at.isoformat(timespec="milliseconds"),
+                "duration_ms": round(duration * 1000, 1),
+                "samples": sampler.samples,
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "sampler_overhead": round(sampler.sampler_seconds / duration, 4) if duration else 0,
+                "truncated": sampler.truncated,
+                "collapsed": sampler.collapsed(),
+            }
+            try:
+                await asyncio.to_thread(save_profile, profile)
+                ProfileLogger.info(
+                    f"Profiled {scope['method']} {scope['path']} ({trigger}): {sampler.samples} samples "
+                    f"in {profile['duration_ms']}ms, overhead {profile['sampler_overhead']:.1%}"
+                )
+            except Exception as e:
+                ProfileLogger.warning(f"Could not save profile of request {profile['request_id']}: {e}")
+
+    async def _trigger(self, scope) -> Optional[str]:
+        """
+        Why the request should be profiled, or None.
+        A trigger comes with a reserved slot in self.active, released by the caller;
+        the slot is taken before the admin check awaits so concurrent requests
+        can't all pass the PROFILE_MAX_CONCURRENT check together.
+        """
+        if self.active >= PROFILE_MAX_CONCURRENT:
+            return None
+        self.active += 1
+        trigger = None
+        try:
+            headers = Headers(scope=scope)
+            if headers.get(PROFILE_HEADER) == "1" and await _is_admin(headers):
+                trigger = "header"
+            elif PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+                trigger = "sampled"
+            return trigger
+        finally:
+            if trigger is None:
+                self.active -= 1
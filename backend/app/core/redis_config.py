@@ -18,3 +18,11 @@ async_redis_client = redis.Redis(
     password=REDIS_PASSWORD,
     decode_responses=True
 )
+
+# Async redis client without response decoding, for binary event envelopes (Pub/Sub listener)
+async_redis_binary_client = redis.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    decode_responses=False
+)
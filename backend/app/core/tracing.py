@@ -0,0 +1,394 @@
+"""
+Lightweight tracing spans.
+
+    with span("redis.publish", events=3):
+        ...
+
+    @traced("auth.current_user")
+    async def get_current_user(...): ...
+
+Spans nest through a ContextVar and belong to the trace of the current
+request id (see app.common.logging.request), so every span of one request, of
+the Celery tasks it enqueued and of the events it published shares a trace.
+Finished spans are queued and exported in batches from a background thread
+by the exporter chosen with TRACING_EXPORTER:
+- "memory": the last TRACING_MEMORY_SPANS spans, readable in-process
+- "file":   JSON lines in TRACING_FILE_PATH
+- "otlp":   OTLP/HTTP JSON to TRACING_OTLP_ENDPOINT (collector, Tempo, Jaeger, ...)
+- "none":   tracing off, span() costs one attribute lookup
+"""
+import atexit
+import functools
+import hashlib
+import inspect
+import json
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.core.conf import (
+    TRACING_EXPORTER,
+    TRACING_SAMPLE_RATE,
+    TRACING_FILE_PATH,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_MEMORY_SPANS,
+    TRACING_QUEUE_SIZE,
+    APP_NAME,
+    ENVIRONMENT,
+)
+from app.common.logging.request import get_current_request_id
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
+
+# Spans waiting for export, and how many the exporter thread sends at once
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 2.0
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "request_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], request_id: Optional[str], attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.request_id = request_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.request_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Handed out when tracing is off or the trace is not sampled"""
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+CurrentSpan: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# Per-trace sampling decision, so a trace is kept or dropped as a whole
+_sampled: Dict[str, bool] = {}
+
+
+def trace_id_for(request_id: Optional[str]) -> str:
+    """32 hex chars as OTLP wants: the request uuid itself, or a hash of any other id"""
+    if not request_id:
+        return secrets.token_hex(16)
+    compact = request_id.replace("-", "")
+    if len(compact) == 32 and all(c in "0123456789abcdef" for c in compact):
+        return compact
+    return hashlib.sha1(request_id.encode()).hexdigest()[:32]
+
+
+def _is_sampled(trace_id: str) -> bool:
+    if TRACING_SAMPLE_RATE >= 1.0:
+        return True
+    decision = _sampled.get(trace_id)
+    if decision is None:
+        if len(_sampled) > 10000:
+            _sampled.clear()
+        decision = _sampled[trace_id] = random.random() < TRACING_SAMPLE_RATE
+    return decision
+
+
+def start_span(name: str, request_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes) -> Optional[Span]:
+    """
+    Open a span without making it current, for work that starts and ends in
+    different callbacks (Celery publish/run signals). Close it with finish_span.
+    request_id and parent_id link it to a trace started elsewhere.
+    """
+    if tracer.exporter is None:
+        return None
+    parent = CurrentSpan.get()
+    request_id = request_id or get_current_request_id()
+    trace_id = parent.trace_id if parent and not parent_id else trace_id_for(request_id)
+    if not _is_sampled(trace_id):
+        return None
+    return Span(name, trace_id, parent_id or (parent.span_id if parent else None), request_id, attributes)
+
+
+def finish_span(finished: Optional[Span], error: Optional[BaseException] = None):
+    if finished is None:
+        return
+    finished.end_ns = time.time_ns()
+    if error is not None:
+        finished.error = f"{type(error).__name__}: {error}"
+    tracer.submit(finished)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block (awaits included) as a child of the current span, in the current request's trace"""
+    current = start_span(name, **attributes)
+    if current is None:
+        yield NOOP_SPAN
+        return
+
+    token = CurrentSpan.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        CurrentSpan.reset(token)
+        finish_span(current)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of span() for sync and async functions; defaults to module.function"""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_module(module_name: str, prefix: str):
+    """
+    Wrap every public function defined in a module in a span named prefix.function.
+    Called at the bottom of the module, before anything imports its functions.
+    """
+    module = sys.modules[module_name]
+    for attr, value in list(vars(module).items()):
+        if inspect.isfunction(value) and value.__module__ == module_name and not attr.startswith("_"):
+            setattr(module, attr, traced(f"{prefix}.{attr}")(value))
+
+
+class TracedJSONResponse(JSONResponse):
+    """The app's default_response_class: response serialization is a span of its own"""
+
+    def render(self, content: Any) -> bytes:
+        with span("json.render") as render_span:
+            body = super().render(content)
+            render_span.set(bytes=len(body))
+        return body
+
+
+# ================= EXPORTERS =================
+
+class SpanExporter:
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class MemorySpanExporter(SpanExporter):
+    """Keeps the most recent spans, for local debugging and tests"""
+
+    def __init__(self, maxlen: int):
+        self.spans: Deque[dict] = deque(maxlen=maxlen)
+
+    def export(self, spans: List[Span]):
+        self.spans.extend(s.to_dict() for s in spans)
+
+    def trace(self, request_id: str) -> List[dict]:
+        return [s for s in self.spans if s["request_id"] == request_id]
+
+
+class FileSpanExporter(SpanExporter):
+    """One JSON span per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as out:
+            for s in spans:
+                out.write(json.dumps(s.to_dict(), default=str) + "\n")
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """OTLP/HTTP with the JSON encoding, accepted by the OpenTelemetry collector and most backends"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.resource = {"attributes": [
+            {"key": "service.name", "value": {"stringValue": APP_NAME}},
+            {"key": "deployment.environment", "value": {"stringValue": ENVIRONMENT}},
+            {"key": "process.pid", "value": {"intValue": os.getpid()}},
+        ]}
+
+    @staticmethod
+    def _value(value) -> dict:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": value}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def _span(self, s: Span) -> dict:
+        attributes = dict(s.attributes, **({"request.id": s.request_id} if s.request_id else {}))
+        encoded = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": key, "value": self._value(value)} for key, value in attributes.items()],
+            # STATUS_CODE_ERROR = 2
+            "status": {"code": 2, "message": s.error} if s.error else {},
+        }
+        if s.parent_id:
+            encoded["parentSpanId"] = s.parent_id
+        return encoded
+
+    def export(self, spans: List[Span]):
+        body = json.dumps({"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": [self._span(s) for s in spans]}],
+        }]}).encode()
+        request = urllib.request.Request(
+            self.endpoint, data=body, method="POST", headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+# ================= TRACER =================
+
+class Tracer:
+    """Queues finished spans and exports them in batches from a background thread"""
+
+    def __init__(self, exporter: Optional[SpanExporter]):
+        self.exporter = exporter
+        self.queue: "queue.Queue[Span]" = queue.Queue(maxsize=TRACING_QUEUE_SIZE)
+        self.dropped = 0
+        self.export_failures = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        if exporter is not None:
+            self._start_thread()
+
+    def _start_thread(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, finished: Span):
+        try:
+            self.queue.put_nowait(finished)
+        except queue.Full:
+            # Never block a request on tracing
+            self.dropped += 1
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < EXPORT_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[Span]):
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            self.export_failures += 1
+            if self.export_failures == 1 or self.export_failures % 100 == 0:
+                Logger.warning(f"Span export failed ({self.export_failures} time(s)), {len(batch)} span(s) lost: {e}")
+
+    def _run(self):
+        while not self._stop.wait(EXPORT_INTERVAL_SECONDS):
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                self._export(batch)
+
+    def flush(self):
+        """Export whatever is queued, called at exit"""
+        if self.exporter is None:
+            return
+        self._stop.set()
+        while True:
+            batch = self._drain()
+            if not batch:
+                break
+            self._export(batch)
+        self.exporter.shutdown()
+
+    def restart_after_fork(self):
+        # The exporter thread doesn't survive fork (prefork Celery workers)
+        self.queue = queue.Queue(maxsize=TRACING_QUEUE_SIZE)
+        if self.exporter is not None:
+            self._start_thread()
+
+    def stats(self) -> dict:
+        return {
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "queued": self.queue.qsize(),
+            "dropped": self.dropped,
+            "export_failures": self.export_failures,
+        }
+
+
+def _create_exporter() -> Optional[SpanExporter]:
+    if TRACING_EXPORTER == "memory":
+        return MemorySpanExporter(TRACING_MEMORY_SPANS)
+    if TRACING_EXPORTER == "file":
+        return FileSpanExporter(TRACING_FILE_PATH)
+    if TRACING_EXPORTER == "otlp":
+        return OtlpHttpSpanExporter(TRACING_OTLP_ENDPOINT)
+    if TRACING_EXPORTER != "none":
+        Logger.warning(f"Unknown TRACING_EXPORTER '{TRACING_EXPORTER}', tracing disabled")
+    return None
+
+
+tracer = Tracer(_create_exporter())
+atexit.register(tracer.flush)
+os.register_at_fork(after_in_child=tracer.restart_after_fork)
@@ -1,131 +1,451 @@
-from typing import Dict, Set
+from typing import Dict, List, Set, Optional
+from collections import OrderedDict, deque
 from fastapi import WebSocket
-import json
+import time
 import asyncio
-from app.common.logging.logging_config import Logger
-from app.core.redis_config import async_redis_client
+from app.common.logging.logging_config import get_logger
+from app.core.event_bus import event_bus, Subscription
+from app.core.conf import (
+    PRESENCE_HEARTBEAT_SECONDS,
+    WS_HEARTBEAT_SECONDS,
+    WS_IDLE_TIMEOUT_SECONDS,
+    SSE_QUEUE_SIZE,
+    SSE_REPLAY_EVENTS,
+    SSE_REPLAY_PROJECTS,
+)
+from app.common.logging.request import create_background_task, BackgroundTasks, RequestId
+from app.services.presence_service import presence_service
+from app.core.connection_registry import ConnectionRegistry, ConnectionRecord, SubscriptionFilter, NO_FILTER
+from app.core.event_codec import EncodedEvent, PROTOCOL_JSON, PROTOCOL_MSGPACK
+from app.core.metrics import WEBSOCKET_CONNECTIONS, WEBSOCKET_BROADCAST_RECIPIENTS
+
+Logger = get_logger(__name__)
+
+# Channel patterns, one bus subscription per process covers every room
+PROJECT_CHANNEL_PATTERN = "project:*:updates"
+USER_CHANNEL_PATTERN = "user:*:updates"
+
+# One line per broadcast, sampled through LOG_SAMPLE_RATES
+BroadcastLogger = get_logger(f"{__name__}.broadcast")
+
+
+class SseStream:
+    """
+    A read-only Server-Sent Events subscriber: just a bounded queue the shared
+    listener feeds. A consumer too slow to keep up is marked overflowed and
+    dropped instead of buffering without bound. Closing is a separate event,
+    so it reaches the consumer even when the queue is full.
+    """
+
+    __slots__ = ("project_id", "user_id", "filters", "queue", "overflowed", "closed")
+
+    def __init__(self, project_id: int, user_id: int, filters: SubscriptionFilter):
+        self.project_id = project_id
+        self.user_id = user_id
+        self.filters = filters
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.overflowed = False
+        self.closed = asyncio.Event()
+
+    def offer(self, event: EncodedEvent):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def next_event(self, timeout: float) -> Optional[EncodedEvent]:
+        """
+        The next queued event, or None once the stream is closed.
+        Raises asyncio.TimeoutError when nothing arrives within timeout.
+        """
+        if self.closed.is_set():
+            return None
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        get = asyncio.ensure_future(self.queue.get())
+        closed = asyncio.ensure_future(self.closed.wait())
+        try:
+            done, _ = await asyncio.wait((get, closed), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            get.cancel()
+            closed.cancel()
+        if closed in done:
+            return None
+        if get in done:
+            return get.result()
+        raise asyncio.TimeoutError
+
 
 class ConnectionManager:
     def __init__(self):
-        # Store active connections: {project_id: {websocket1, websocket2, ...}}
-        self.active_connections: Dict[int, Set[WebSocket]] = {}
-        # Store user info for each connection
-        self.connection_info: Dict[WebSocket, dict] = {}
-        # Store Redis pubsub for each project
-        self.pubsubs: Dict[int, any] = {}
-        # Store background tasks for Redis listeners
-        self.listener_tasks: Dict[int, asyncio.Task] = {}
-    
-    async def connect(self, websocket: WebSocket, project_id: int, user_id: int, user_name: str):
+        # Every socket held by this process, indexed by socket, project and user
+        self.registry = ConnectionRegistry()
+        # Server-Sent Events subscribers: {project_id: {stream, ...}}
+        self.sse_streams: Dict[int, Set[SseStream]] = {}
+        # Recent project events kept for SSE Last-Event-ID resume: {project_id: deque}
+        self.replay: "OrderedDict[int, deque]" = OrderedDict()
+        # Single pattern subscription on the event bus shared by every room in this process
+        self.subscription: Optional[Subscription] = None
+        self.listener_task: Optional[asyncio.Task] = None
+        self._listener_lock = asyncio.Lock()
+        # Background task refreshing this node's presence entries in Redis
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        # Background task sending server heartbeats and reaping idle sockets
+        self.reaper_task: Optional[asyncio.Task] = None
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        project_id: int,
+        user_id: int,
+        user_name: str,
+        filters: Optional[SubscriptionFilter] = None,
+        protocol: str = PROTOCOL_JSON,
+    ):
         # Note: websocket.accept() should be called in the endpoint before calling this method
-        
-        if project_id not in self.active_connections:
-            self.active_connections[project_id] = set()
-        
-        self.active_connections[project_id].add(websocket)
-        self.connection_info[websocket] = {
-            "project_id": project_id,
-            "user_id": user_id,
-            "user_name": user_name
-        }
-        
-        # Start Redis listener for this project if not already started
-        # Don't raise if Redis fails - allow WebSocket to continue without Redis
-        if project_id not in self.pubsubs:
-            await self._start_redis_listener(project_id)
-        
+
+        if filters is None or filters.is_empty:
+            filters = NO_FILTER
+        self.registry.add(ConnectionRecord(websocket, project_id, user_id, user_name, filters, time.monotonic(), protocol))
+
+        await self._ensure_listener()
+        self._ensure_heartbeat()
+        self._ensure_reaper()
+        await self._presence_join(project_id, user_id, user_name)
+
         Logger.info(f"WebSocket connected: User {user_id} to project {project_id}")
-    
-    async def _start_redis_listener(self, project_id: int):
-        """Start listening to Redis Pub/Sub for a project"""
-        await async_redis_client.ping()
-        Logger.info(f"Redis connection OK for project {project_id}")
-        
-        pubsub = async_redis_client.pubsub()
-        channel_name = f"project:{project_id}:updates"
-        Logger.info(f"Subscribing to Redis channel: {channel_name}")
-        await pubsub.subscribe(channel_name)
-        
-        self.pubsubs[project_id] = pubsub
-        
-        # Start background task to listen for messages
-        task = asyncio.create_task(self._redis_listener(project_id, pubsub))
-        self.listener_tasks[project_id] = task
-        
-        Logger.info(f"Started Redis listener task for project {project_id}")
-    
-    async def _redis_listener(self, project_id: int, pubsub):
-        """Listen to Redis messages and broadcast to WebSocket connections"""
-        Logger.info(f"Redis listener started and waiting for messages for project {project_id}")
+
+    async def connect_user(self, websocket: WebSocket, user_id: int, user_name: str, protocol: str = PROTOCOL_JSON):
+        """Register a socket on the user's own channel (e.g. "my assigned issues changed")"""
+        # Note: websocket.accept() should be called in the endpoint before calling this method
+
+        self.registry.add(ConnectionRecord(websocket, None, user_id, user_name, NO_FILTER, time.monotonic(), protocol))
+
+        await self._ensure_listener()
+        self._ensure_reaper()
+
+        Logger.info(f"WebSocket connected: User {user_id} to user channel")
+
+    async def _ensure_listener(self):
+        """Start the shared event bus listener if this is the first connection in the process"""
+        async with self._listener_lock:
+            if self.listener_task and not self.listener_task.done():
+                return
+
+            Logger.info(f"Subscribing to {event_bus.name} channel patterns: {PROJECT_CHANNEL_PATTERN}, {USER_CHANNEL_PATTERN}")
+            subscription = await event_bus.subscribe(PROJECT_CHANNEL_PATTERN, USER_CHANNEL_PATTERN)
+
+            self.subscription = subscription
+            self.listener_task = asyncio.create_task(self._listener(subscription))
+
+            Logger.info("Started shared event bus listener task")
+
+    async def _listener(self, subscription: Subscription):
+        """Listen to bus messages and route them to the matching project or user room"""
+        Logger.info("Event bus listener started and waiting for messages")
         try:
             while True:
+                message = None
                 try:
-                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-                    if message and message['type'] == 'message':
-                        data = json.loads(message['data'])
-                        Logger.info(f"Received Redis message for project {project_id}: {data.get('type', 'unknown')}")
-                        await self.broadcast_to_project(project_id, data)
-                        connection_count = len(self.active_connections.get(project_id, set()))
-                        Logger.info(f"Broadcasted message to {connection_count} WebSocket connections")
+                    message = await subscription.get_message(timeout=1.0)
+                    if message:
+                        channel, data = message
+                        event = EncodedEvent.from_envelope(data)
+                        # Log the fan-out under the id of the request that caused the event
+                        token = RequestId.set(event.request_id)
+                        try:
+                            await self._dispatch(channel, event)
+                        finally:
+                            RequestId.reset(token)
                 except asyncio.TimeoutError:
                     # Timeout is normal, continue waiting
                     continue
-                except json.JSONDecodeError as e:
-                    Logger.error(f"Error decoding Redis message: {e}, raw data: {message.get('data', '') if message else 'N/A'}")
+                except (ValueError, KeyError, TypeError) as e:
+                    Logger.error(f"Error decoding event bus message: {e}, raw data: {message[1] if message else 'N/A'}")
                 except asyncio.CancelledError:
                     raise
         except asyncio.CancelledError:
-            Logger.info(f"Redis listener for project {project_id} cancelled")
+            Logger.info("Event bus listener cancelled")
         finally:
-            await pubsub.unsubscribe()
-            await pubsub.close()
-            Logger.info(f"Redis listener closed for project {project_id}")
-    
+            await subscription.close()
+            Logger.info("Event bus listener closed")
+
+    async def _dispatch(self, channel: str, event: EncodedEvent):
+        """Route a message by its channel name: project:{id}:updates or user:{id}:updates"""
+        scope, _, rest = channel.partition(":")
+        room_id = rest.partition(":")[0]
+        if not room_id.isdigit():
+            return
+
+        if scope == "project":
+            project_id = int(room_id)
+            if project_id in self.replay:
+                self.replay[project_id].append(event)
+            if project_id in self.sse_streams:
+                self._feed_streams(project_id, event)
+            if self.registry.has_project(project_id):
+                await self.broadcast_to_project(project_id, event)
+        elif scope == "user":
+            await self.broadcast_to_user(int(room_id), event)
+
+    def _ensure_heartbeat(self):
+        if self.heartbeat_task and not self.heartbeat_task.done():
+            return
+        self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def _heartbeat_loop(self):
+        """Periodically refresh presence for every (project, user) held by this node"""
+        try:
+            while True:
+                await asyncio.sleep(PRESENCE_HEARTBEAT_SECONDS)
+                try:
+                    await presence_service.heartbeat(self.local_presence())
+                except Exception as e:
+                    Logger.error(f"Error refreshing presence heartbeat: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    def touch(self, websocket: WebSocket):
+        """Record activity from the client, called for every frame it sends"""
+        record = self.registry.get(websocket)
+        if record:
+            record.last_seen = time.monotonic()
+
+    def _ensure_reaper(self):
+        if self.reaper_task and not self.reaper_task.done():
+            return
+        self.reaper_task = asyncio.create_task(self._reaper_loop())
+
+    async def _reaper_loop(self):
+        """
+        Send a server heartbeat to every socket and close the ones that have been
+        silent for longer than WS_IDLE_TIMEOUT_SECONDS (half-open TCP connections
+        never raise on receive, so they would otherwise stay registered forever).
+        """
+        heartbeat = EncodedEvent.from_message({"type": "heartbeat"})
+        try:
+            while True:
+                await asyncio.sleep(WS_HEARTBEAT_SECONDS)
+                now = time.monotonic()
+                idle, alive = [], []
+                for record in self.registry:
+                    if now - record.last_seen > WS_IDLE_TIMEOUT_SECONDS:
+                        idle.append(record.websocket)
+                    else:
+                        alive.append(record)
+
+                if idle:
+                    Logger.info(f"Reaping {len(idle)} idle WebSocket connections")
+                    await asyncio.gather(*(self._close(ws, 1001, "Idle timeout") for ws in idle))
+                    for websocket in idle:
+                        self.disconnect(websocket)
+
+                dead = await asyncio.gather(*(self._send_heartbeat(record, heartbeat) for record in alive))
+                for record, failed in zip(alive, dead):
+                    if failed:
+                        self.disconnect(record.websocket)
+        except asyncio.CancelledError:
+            pass
+
+    @staticmethod
+    async def _send_heartbeat(record: ConnectionRecord, heartbeat: EncodedEvent) -> bool:
+        """Send a heartbeat frame, returns True if the socket is dead"""
+        try:
+            await asyncio.wait_for(_send_frame(record, heartbeat), timeout=WS_HEARTBEAT_SECONDS)
+            return False
+        except Exception:
+            return True
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int, reason: str):
+        try:
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), timeout=5)
+        except Exception:
+            # Socket is already gone or the peer never answers - nothing left to do
+            pass
+
+    async def shutdown(self):
+        """
+        Drain every socket and background task, called from the app lifespan on shutdown.
+        Sockets are closed with 1001 (going away) so clients reconnect to another worker.
+        """
+        tasks = [task for task in (self.listener_task, self.heartbeat_task, self.reaper_task) if task]
+
+        # End every SSE generator
+        for streams in list(self.sse_streams.values()):
+            for stream in list(streams):
+                self.close_stream(stream)
+
+        websockets = [record.websocket for record in self.registry]
+        Logger.info(f"Draining {len(websockets)} WebSocket connections")
+        await asyncio.gather(*(self._close(ws, 1001, "Server shutting down") for ws in websockets))
+        for websocket in websockets:
+            self.disconnect(websocket)
+
+        for task in tasks:
+            task.cancel()
+        self.listener_task = self.heartbeat_task = self.reaper_task = None
+
+        # Let the listener close its subscription and the presence leaves reach Redis
+        pending = tasks + list(BackgroundTasks)
+        if pending:
+            await asyncio.wait(pending, timeout=5)
+
+    def local_presence(self) -> Set[tuple]:
+        """Distinct (project_id, user_id) pairs with an open socket on this node"""
+        return {
+            (record.project_id, record.user_id)
+            for record in self.registry
+            if record.project_id is not None
+        }
+
+    async def _presence_join(self, project_id: int, user_id: int, user_name: str):
+        try:
+            if await presence_service.join(project_id, user_id, user_name):
+                await presence_service.publish_presence_event(project_id, "presence_joined", user_id, user_name)
+        except Exception as e:
+            # Presence is best effort - never fail the connection because of it
+            Logger.error(f"Error joining presence for user {user_id} in project {project_id}: {e}")
+
+    async def _presence_leave(self, project_id: int, user_id: int, user_name: str):
+        try:
+            if await presence_service.leave(project_id, user_id):
+                await presence_service.publish_presence_event(project_id, "presence_left", user_id, user_name)
+        except Exception as e:
+            Logger.error(f"Error leaving presence for user {user_id} in project {project_id}: {e}")
+
+    async def open_stream(self, project_id: int, user_id: int, filters: Optional[SubscriptionFilter] = None) -> SseStream:
+        """Register an SSE subscriber on a project feed"""
+        if filters is None or filters.is_empty:
+            filters = NO_FILTER
+        stream = SseStream(project_id, user_id, filters)
+        self.sse_streams.setdefault(project_id, set()).add(stream)
+
+        # Start keeping history for resume as soon as a project has SSE viewers
+        if project_id in self.replay:
+            self.replay.move_to_end(project_id)
+        else:
+            self.replay[project_id] = deque(maxlen=SSE_REPLAY_EVENTS)
+            if len(self.replay) > SSE_REPLAY_PROJECTS:
+                self.replay.popitem(last=False)
+
+        await self._ensure_listener()
+        Logger.info(f"SSE stream opened: User {user_id} on project {project_id}")
+        return stream
+
+    def close_stream(self, stream: SseStream):
+        """Unregister a stream and wake its generator, which then ends"""
+        stream.closed.set()
+        streams = self.sse_streams.get(stream.project_id)
+        if streams is not None:
+            streams.discard(stream)
+            if not streams:
+                del self.sse_streams[stream.project_id]
+        self._stop_listener_if_idle()
+        Logger.debug(f"SSE stream closed: User {stream.user_id} on project {stream.project_id}")
+
+    def replay_since(self, project_id: int, last_event_id: str) -> Optional[List[EncodedEvent]]:
+        """
+        Events published after last_event_id, or None when the id is no longer
+        (or never was) in this worker's buffer and the client has to resync.
+        """
+        events = list(self.replay.get(project_id, ()))
+        for index, event in enumerate(events):
+            if event.id == last_event_id:
+                return events[index + 1:]
+        return None
+
+    def _feed_streams(self, project_id: int, event: EncodedEvent):
+        for stream in list(self.sse_streams[project_id]):
+            if stream.filters is NO_FILTER or stream.filters.matches(event.route):
+                stream.offer(event)
+
+    def _stop_listener_if_idle(self):
+        if len(self.registry) or self.sse_streams:
+            return
+        if self.listener_task:
+            self.listener_task.cancel()
+            self.listener_task = None
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+        if self.reaper_task:
+            self.reaper_task.cancel()
+            self.reaper_task = None
+        self.subscription = None
+
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.connection_info:
-            info = self.connection_info[websocket]
-            project_id = info["project_id"]
-            
-            if project_id in self.active_connections:
-                self.active_connections[project_id].discard(websocket)
-                # If no more connections, stop Redis listener
-                if not self.active_connections[project_id]:
-                    del self.active_connections[project_id]
-                    # Cancel Redis listener task
-                    if project_id in self.listener_tasks:
-                        self.listener_tasks[project_id].cancel()
-                        del self.listener_tasks[project_id]
-                    if project_id in self.pubsubs:
-                        del self.pubsubs[project_id]
-            
-            del self.connection_info[websocket]
-            Logger.info(f"WebSocket disconnected: User {info['user_id']} from project {project_id}")
-    
-    async def broadcast_to_project(self, project_id: int, message: dict, exclude_websocket: WebSocket = None):
-        """Broadcast a message to all connections in a project"""
-        if project_id not in self.active_connections:
+        record = self.registry.remove(websocket)
+        if record is None:
+            return
+
+        # Leave presence only when the user's last socket on this node for the project closes
+        if record.project_id is not None and not self.registry.user_in_project(record.user_id, record.project_id):
+            create_background_task(self._presence_leave(record.project_id, record.user_id, record.user_name))
+
+        # If no more connections anywhere, stop the shared event bus listener
+        self._stop_listener_if_idle()
+        Logger.debug(f"WebSocket disconnected: User {record.user_id} from project {record.project_id}")
+
+    async def broadcast_to_project(self, project_id: int, event: EncodedEvent, exclude_websocket: WebSocket = None):
+        """Broadcast an event to all connections in a project whose filters match it"""
+        records = self.registry.project(project_id)
+        if not records:
             Logger.warning(f"No active connections for project {project_id}")
             return
-        
+
+        recipients = [
+            record for record in records
+            if record.websocket is not exclude_websocket
+            and (record.filters is NO_FILTER or record.filters.matches(event.route))
+        ]
+
+        lag = f", {(time.time() - event.trace['at']) * 1000:.1f}ms after the request" if event.trace else ""
+        WEBSOCKET_BROADCAST_RECIPIENTS.labels("project").observe(len(recipients))
+        BroadcastLogger.info(f"Broadcasting message to {len(recipients)} connections for project {project_id}, message type: {event.type or 'unknown'}{lag}")
+        await self._send_to(recipients, event)
+
+    async def broadcast_to_user(self, user_id: int, event: EncodedEvent):
+        """Broadcast an event to all user-channel connections of a user"""
+        recipients = [record for record in self.registry.user(user_id) if record.project_id is None]
+        WEBSOCKET_BROADCAST_RECIPIENTS.labels("user").observe(len(recipients))
+        await self._send_to(recipients, event)
+
+    async def send_message(self, websocket: WebSocket, message: dict):
+        """Send a server-originated message (welcome, pong, ack) in the socket's protocol"""
+        record = self.registry.get(websocket)
+        if record:
+            await _send_frame(record, EncodedEvent.from_message(message))
+
+    async def _send_to(self, records: list, event: EncodedEvent):
+        if not records:
+            return
+
         disconnected = set()
-        message_json = json.dumps(message)
-        connection_count = len(self.active_connections[project_id])
-        
-        Logger.info(f"Broadcasting message to {connection_count} connections for project {project_id}, message type: {message.get('type', 'unknown')}")
-        
-        for connection in self.active_connections[project_id]:
-            if connection == exclude_websocket:
-                continue
-            
+
+        for record in records:
             try:
-                await connection.send_text(message_json)
+                await _send_frame(record, event)
             except Exception:
                 # Connection is closed, mark for cleanup
-                disconnected.add(connection)
-        
+                disconnected.add(record.websocket)
+
         # Clean up disconnected connections
         for conn in disconnected:
             self.disconnect(conn)
 
+
+async def _send_frame(record: ConnectionRecord, event: EncodedEvent):
+    """Relay the pre-rendered frame matching the socket's negotiated protocol"""
+    if record.protocol == PROTOCOL_MSGPACK:
+        await record.websocket.send_bytes(event.msgpack_frame)
+    else:
+        await record.websocket.send_text(event.json_frame)
+
 # Global instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
+
+WEBSOCKET_CONNECTIONS.set_function(lambda: {
+    (project_id,): manager.registry.project_count(project_id)
+    for project_id in list(manager.registry.project_ids())
+})
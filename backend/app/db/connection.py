@@ -1,6 +1,24 @@
+import time
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from app.core.conf import DATABASE_URL, DEBUG 
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.conf import DATABASE_URL, DEBUG, DB_SLOW_QUERY_MS
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_CONNECTIONS
+from app.common.logging.request import count_query, record_query_time
+from app.services.slow_query_log import slow_query_log
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The default async pool, timing how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
 
 # Create async engine
 engine = create_async_engine(
@@ -12,8 +30,39 @@ engine = create_async_engine(
     pool_timeout=30,       # fail fast instead of hanging
     pool_recycle=1800,     # recycle connections after 30 minutes
     pool_pre_ping=True,    # verify connections before using (prevents stale connections)
+    poolclass=TimedQueuePool,
 )
 
+
+# Statement count and DB time of the current request (RequestContextMiddleware)
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    count_query(statement)
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _time_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    record_query_time(elapsed_ms)
+    if elapsed_ms >= DB_SLOW_QUERY_MS:
+        slow_query_log.record(statement, parameters, elapsed_ms, executemany)
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _drop_statement_timer(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        record_query_time((time.perf_counter() - started.pop()) * 1000)
+
+
+DB_POOL_CONNECTIONS.set_function(lambda: {
+    ("checked_out",): engine.pool.checkedout(),
+    ("checked_in",): engine.pool.checkedin(),
+    # overflow() counts up from -pool_size until the pool is full
+    ("overflow",): max(engine.pool.overflow(), 0),
+})
+
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
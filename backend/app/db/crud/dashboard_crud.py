@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 from app.db.crud.project_crud import get_recent_projects
 from app.models.model import Project, Issue, Sprint, ProjectMember, User
 from app.core.enums import IssueStatus, ProjectStatus, SprintStatus, Priority
+from app.core.tracing import trace_module
 
 
 
@@ -275,4 +276,7 @@ async def get_employee_dashboard_data(user_id: int, session: AsyncSession) -> Di
         "pending_issue": stats.pending or 0,
         "total_project": len(project_names) if project_names else 0,
         "urgent_issue": len(urgent_issues) if urgent_issues else 0,
-    }
\ No newline at end of file
+    }
+
+
+trace_module(__name__, "crud.dashboard")
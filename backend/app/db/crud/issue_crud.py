@@ -1,12 +1,14 @@
 from app.models.model import Issue, Sprint, Project, ProjectMember
 from app.core.enums import IssueStatus
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, delete
+from sqlalchemy import select, or_, delete, update
 from sqlalchemy.orm import selectinload
 
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from app.db.crud.project_crud import get_project_by_id
 from app.common.errors import NotFoundError,ClientErrors
+from app.core.tracing import trace_module
 async def get_all_active_issues(user_id: int, session: AsyncSession) -> List[Issue]:
     """
     Get all active issues from projects where manager is involved.
@@ -75,9 +77,10 @@ async def get_issue_by_id(issue_id:int,session:AsyncSession) -> Issue:
 
     return issue
 
-async def create_issue(session:AsyncSession,user_id:int,payload:dict) -> Issue:
+async def create_issue(session:AsyncSession,user_id:int,payload:dict,commit:bool=True) -> Issue:
     """
     Function to create a new issue in the database
+    With commit=False the issue is only flushed, so the caller can add outbox rows to the same transaction
     """
 
     project_id = payload['project_id']
@@ -93,7 +96,10 @@ async def create_issue(session:AsyncSession,user_id:int,payload:dict) -> Issue:
    
 
     session.add(issue)
-    await session.commit()
+    if commit:
+        await session.commit()
+    else:
+        await session.flush()
     await session.refresh(issue)
     return issue 
 
@@ -101,9 +107,11 @@ async def update_issue(
     session:AsyncSession,
     issue_id:int,
     payload:dict,
+    commit:bool=True,
 ) -> Issue:
     """
     Update an issue by id
+    With commit=False the change is only flushed, so the caller can add outbox rows to the same transaction
     """
     issue = await get_issue_by_id(issue_id=issue_id,session=session)
     if not issue:
@@ -113,20 +121,56 @@ async def update_issue(
         setattr(issue, key, value)
     
     session.add(issue)
-    await session.commit()
+    if commit:
+        await session.commit()
+    else:
+        await session.flush()
     await session.refresh(issue)
     return issue
 
-async def delete_issue(session:AsyncSession,issue_id:int)->bool:
+async def update_issue_versioned(
+    session:AsyncSession,
+    issue_id:int,
+    payload:dict,
+    expected_updated_at:datetime,
+    commit:bool=True,
+) -> Optional[Issue]:
+    """
+    Update an issue only if it hasn't changed since expected_updated_at.
+    A single conditional UPDATE, so two concurrent writers can't both win.
+    Returns the reloaded issue, or None when the version is stale or the issue is gone.
+    With commit=False the transaction is left open for the caller's outbox rows.
+    """
+    stmt = update(Issue).where(
+        Issue.id == issue_id,
+        Issue.updated_at == expected_updated_at
+    ).values(**payload).returning(Issue.id)
+
+    result = await session.execute(stmt)
+    if result.scalar_one_or_none() is None:
+        await session.rollback()
+        return None
+
+    if commit:
+        await session.commit()
+    # Instances already in the session still hold the pre-update values
+    session.expire_all()
+    return await get_issue_by_id(issue_id=issue_id,session=session)
+
+async def delete_issue(session:AsyncSession,issue_id:int,commit:bool=True)->bool:
     """
     Function to Delete an issue by id
+    With commit=False the delete is only flushed, so the caller can add outbox rows to the same transaction
     """
     issue = await get_issue_by_id(issue_id=issue_id,session=session)
     if not issue:
         raise NotFoundError(message="Issue not found")
 
     await session.delete(issue)
-    await session.commit()
+    if commit:
+        await session.commit()
+    else:
+        await session.flush()
     return True
 
 async def get_user_issues(user_id:int,session:AsyncSession) -> List[Issue]:
@@ -156,3 +200,6 @@ async def get_all_sub_issues(issue_id:int,session:AsyncSession) -> List[Issue]:
     result = await session.execute(stmt)
     sub_issues = result.scalars().all()
     return list(sub_issues)
+
+
+trace_module(__name__, "crud.issue")
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List,Optional
 from app.common.errors import NotFoundError
+from app.core.tracing import trace_module
 
 async def get_user_logs(user_id:int,session:AsyncSession) -> List[Logs]:
     """
@@ -76,3 +77,4 @@ async def get_logs_by_issue_id(issue_id:int,session:AsyncSession) -> List[Logs]:
     return logs
 
 
+trace_module(__name__, "crud.logs")
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
 from typing import List
 from app.core.enums import OrganizationStatus
+from app.core.tracing import trace_module
 
 async def get_all_organizations_by_user(user_id: int, session: AsyncSession) -> List[Organization]:
     """
@@ -64,4 +65,7 @@ async def create_organization(
     await session.refresh(organization)
     await session.refresh(org_member)
     
-    return organization
\ No newline at end of file
+    return organization
+
+
+trace_module(__name__, "crud.organization")
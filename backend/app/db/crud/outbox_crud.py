@@ -0,0 +1,64 @@
+from app.models.model import OutboxEvent
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, func, or_
+from datetime import timedelta
+from typing import List
+from app.core.tracing import trace_module
+
+
+def add_outbox_event(session:AsyncSession,topic:str,payload:dict) -> OutboxEvent:
+    """
+    Add an outbox row to the caller's transaction, it is committed together with the caller's change
+    """
+    event = OutboxEvent(topic=topic, payload=payload, attempts=0)
+    session.add(event)
+    return event
+
+async def claim_outbox_events(session:AsyncSession,limit:int,max_attempts:int,lease_seconds:int) -> List[OutboxEvent]:
+    """
+    Lease the oldest pending outbox rows to the caller for lease_seconds.
+    SKIP LOCKED lets several relays (one per API process) claim at the same time
+    without picking the same row, and the lease keeps other relays off the rows
+    once the claiming transaction has committed. Rows whose lease ran out (the
+    relay died mid-batch) are claimable again.
+    """
+    pending = select(OutboxEvent.id).where(
+        OutboxEvent.attempts < max_attempts,
+        or_(OutboxEvent.locked_until.is_(None), OutboxEvent.locked_until < func.now()),
+    ).order_by(
+        OutboxEvent.id
+    ).limit(limit).with_for_update(skip_locked=True)
+
+    stmt = update(OutboxEvent).where(
+        OutboxEvent.id.in_(pending)
+    ).values(
+        locked_until=func.now() + timedelta(seconds=lease_seconds)
+    ).returning(OutboxEvent)
+
+    result = await session.execute(stmt)
+    return sorted(result.scalars().all(), key=lambda event: event.id)
+
+async def delete_outbox_events(session:AsyncSession,event_ids:List[int]) -> None:
+    """
+    Remove delivered outbox rows
+    """
+    if event_ids:
+        await session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(event_ids)))
+
+async def record_outbox_failure(session:AsyncSession,event_ids:List[int],error:str) -> None:
+    """
+    Count a failed delivery attempt and release the lease, rows are retried until OUTBOX_MAX_ATTEMPTS
+    """
+    if event_ids:
+        await session.execute(
+            update(OutboxEvent).where(
+                OutboxEvent.id.in_(event_ids)
+            ).values(
+                attempts=OutboxEvent.attempts + 1,
+                last_error=error[:1000],
+                locked_until=None
+            )
+        )
+
+
+trace_module(__name__, "crud.outbox")
@@ -5,6 +5,7 @@ from sqlalchemy.orm import joinedload
 
 from app.models.model import Project, ProjectMember, User
 from app.common.errors import NotFoundError
+from app.core.tracing import trace_module
 
 
 
@@ -89,6 +90,20 @@ async def get_project_by_id(project_id:int,user_id:int,session:AsyncSession) ->
     project = result.scalar_one_or_none()
     return project
 
+async def is_project_member(project_id:int,user_id:int,session:AsyncSession) -> bool:
+    """
+    Whether the user is a member of the project, without loading it
+    """
+    stmt = select(
+        select(ProjectMember.id).where(
+            ProjectMember.project_id == project_id,
+            ProjectMember.user_id == user_id
+        ).exists()
+    )
+
+    result = await session.execute(stmt)
+    return bool(result.scalar())
+
 async def create_project(session:AsyncSession,user_id:int,project_data:dict) -> Project:
     """
     Create a new project
@@ -165,3 +180,5 @@ async def delete_project(session:AsyncSession,project_id:int,user_id:int)->bool:
     await session.commit()
     return True
 
+
+trace_module(__name__, "crud.project")
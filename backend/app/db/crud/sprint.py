@@ -6,6 +6,7 @@ from typing import List,Dict
 from app.core.enums import SprintStatus
 from app.models.model import ProjectMember
 from app.common.errors import NotFoundError
+from app.core.tracing import trace_module
 
 
 
@@ -128,4 +129,4 @@ async def get_sprint_dashboard(user_id:int,session:AsyncSession) -> Dict:
     return dashboard
 
 
- 
\ No newline at end of file
+trace_module(__name__, "crud.sprint")
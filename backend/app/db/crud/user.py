@@ -5,6 +5,7 @@ from app.core.security import hash_password,verify_password
 from app.core.enums import Role,UserStatus
 from app.common.errors import NotFoundError
 from typing import Optional,List
+from app.core.tracing import trace_module
 
 
 
@@ -94,4 +95,7 @@ async def get_all_managers(session:AsyncSession) -> List[User]:
     managers = select(User).where(User.role == Role.MANAGER)
     result = await session.execute(managers)
     managers = result.scalars().all()
-    return list(managers)
\ No newline at end of file
+    return list(managers)
+
+
+trace_module(__name__, "crud.user")
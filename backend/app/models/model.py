@@ -1,6 +1,6 @@
 from app.db.connection import Base
 from sqlalchemy import (
-    Column, Integer, String, Boolean,
+    Column, Integer, BigInteger, String, Boolean,
     DateTime, ForeignKey, func, Enum,
     Date, Numeric, UniqueConstraint, Index
 )
@@ -263,4 +263,23 @@ class Invite_Tokens(Base, TimestampMixin):
     user_id = Column(Integer, ForeignKey(User.id), nullable=False)
     token_hash = Column(String, nullable=False)
     expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# ================= OUTBOX =================
+
+class OutboxEvent(Base):
+    """
+    Side effect (Redis event, Celery task) written in the same transaction as the
+    change that caused it; the outbox relay delivers it and deletes the row.
+    """
+    __tablename__ = "outbox_event"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    topic = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String, nullable=True)
+    # Set when a relay claims the row, other relays skip it until then
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,10 +1,10 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Literal
 from decimal import Decimal
 from app.core.enums import IssueStatus,IssueType,Priority
 
 class CreateIssueRequest(BaseModel):
-    # name:str
+    name:str
     description:Optional[str] = None
     story_point:int
     status:IssueStatus
@@ -31,4 +31,23 @@ class WebsocketIssueUpdate(BaseModel):
     issue_id:int
     status:IssueStatus
     version:int
-    board_id:int
\ No newline at end of file
+    board_id:int
+
+
+class MoveIssueCommand(BaseModel):
+    """Board command: move a card to another column and/or sprint"""
+    type:Literal["move_issue"]
+    command_id:Optional[str] = None
+    issue_id:int
+    status:Optional[IssueStatus] = None
+    sprint_id:Optional[int] = None
+    version:int
+
+
+class ChangeAssigneeCommand(BaseModel):
+    """Board command: reassign a card, assigned_to=None unassigns it"""
+    type:Literal["change_assignee"]
+    command_id:Optional[str] = None
+    issue_id:int
+    assigned_to:Optional[int] = None
+    version:int
@@ -0,0 +1,121 @@
+"""
+Board commands sent by clients over an open project WebSocket.
+
+Card moves are the most frequent write on the board, so they skip the HTTP
+round trip and re-authentication: the socket's principal is already known.
+Each command is applied with a versioned (compare-and-set) update in a short
+DB session and answered with an ack frame on the same socket; the resulting
+issue_updated event goes through the outbox and fans out to every subscriber
+as usual.
+"""
+from typing import Optional
+from pydantic import ValidationError
+
+from app.core.enums import IssueStatus, Role
+from app.core.principal import Principal
+from app.db.connection import AsyncSessionLocal
+from app.db.crud.issue_crud import get_issue_by_id, update_issue_versioned
+from app.schemas.issue import MoveIssueCommand, ChangeAssigneeCommand
+from app.services.redis_publisher import (
+    issue_updated_event,
+    issue_event_data,
+    issue_filter_fields,
+    issue_version,
+    version_to_datetime,
+)
+from app.services.outbox import stage_redis_event, outbox_relay
+from app.common.email_template import notify_issue_status_change
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
+
+COMMAND_SCHEMAS = {
+    "move_issue": MoveIssueCommand,
+    "change_assignee": ChangeAssigneeCommand,
+}
+
+# Accepted so clients get an explicit answer, but issues have no position column yet
+UNSUPPORTED_COMMANDS = {"reorder_issue"}
+
+BOARD_COMMANDS = set(COMMAND_SCHEMAS) | UNSUPPORTED_COMMANDS
+
+
+def _ack(command_id: Optional[str], ok: bool, error: Optional[str] = None, data: Optional[dict] = None) -> dict:
+    ack = {"type": "ack", "command_id": command_id, "ok": ok}
+    if error:
+        ack["error"] = error
+    if data is not None:
+        ack["data"] = data
+    return ack
+
+
+async def handle_board_command(user: Principal, project_id: int, message: dict) -> dict:
+    """
+    Validate and apply one board command for the socket's principal.
+    Always returns an ack frame; failures are reported in it rather than raised.
+    error is one of: invalid_command, unsupported_command, not_found,
+    permission_denied, version_conflict, internal_error.
+    On version_conflict the ack carries the current issue so the client can rebase.
+    """
+    command_type = message.get("type")
+    command_id = message.get("command_id")
+
+    if command_type in UNSUPPORTED_COMMANDS:
+        return _ack(command_id, False, "unsupported_command")
+
+    try:
+        command = COMMAND_SCHEMAS[command_type].model_validate(message)
+    except ValidationError as e:
+        Logger.info(f"Invalid board command from user {user.id}: {e.errors()}")
+        return _ack(command_id, False, "invalid_command")
+
+    payload = command.model_dump(exclude_unset=True, exclude={"type", "command_id", "issue_id", "version"})
+    # A card can leave its sprint (sprint_id=None) but always has a status
+    if "status" in payload and payload["status"] is None:
+        del payload["status"]
+    if not payload:
+        return _ack(command_id, False, "invalid_command")
+
+    if payload.get("status") == IssueStatus.COMPLETED and user.role == Role.EMPLOYEE:
+        return _ack(command_id, False, "permission_denied")
+
+    try:
+        async with AsyncSessionLocal() as session:
+            issue = await get_issue_by_id(issue_id=command.issue_id, session=session)
+            # Commands only apply to cards on the board this socket is subscribed to
+            if not issue or issue.project_id != project_id:
+                return _ack(command_id, False, "not_found")
+
+            old_status = issue.status.value
+            previous_data = issue_filter_fields(issue)
+
+            updated_issue = await update_issue_versioned(
+                session=session,
+                issue_id=command.issue_id,
+                payload=payload,
+                expected_updated_at=version_to_datetime(command.version),
+                commit=False,
+            )
+            if not updated_issue:
+                current = await get_issue_by_id(issue_id=command.issue_id, session=session)
+                if not current:
+                    return _ack(command_id, False, "not_found")
+                Logger.info(
+                    f"Board command {command_type} on issue {command.issue_id} rejected: "
+                    f"version {command.version} != {issue_version(current)}"
+                )
+                return _ack(command_id, False, "version_conflict", issue_event_data(current, include_people=True))
+
+            issue_data = issue_event_data(updated_issue, include_people=True)
+
+            # Event and emails go through the outbox, committed with the update
+            stage_redis_event(session, *issue_updated_event(project_id, issue_data, previous_data))
+            if "status" in payload and old_status != updated_issue.status.value:
+                await notify_issue_status_change(issue=updated_issue, old_status=old_status, updated_by=user, session=session)
+            await session.commit()
+    except Exception as e:
+        Logger.error(f"Board command {command_type} from user {user.id} failed: {e}")
+        return _ack(command_id, False, "internal_error")
+
+    outbox_relay.notify()
+    return _ack(command_id, True, data=issue_data)
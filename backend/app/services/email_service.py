@@ -1,6 +1,17 @@
+import os
+import time
 import smtplib
+import threading
+from contextlib import contextmanager
 from email.message import EmailMessage
-from app.core.conf import EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD
+from typing import List, Tuple
+from app.core.conf import (
+    EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD,
+    SMTP_POOL_SIZE, SMTP_IDLE_TIMEOUT_SECONDS, SMTP_HEALTHCHECK_SECONDS, SMTP_TIMEOUT_SECONDS,
+)
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
 
 # class EmailService:
 #     def __init__(self, email_host: str, email_port: int, email_host_user: str, email_host_password: str):
@@ -11,6 +22,140 @@ from app.core.conf import EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PA
 
 #     def send_email(self, subject:str,body:str)
 
+class SmtpConnectionPool:
+    """
+    Per-process pool of logged-in SMTP connections.
+
+    Opening a connection, STARTTLS and login cost several round trips, far more
+    than sending one message, so connections are kept and reused across tasks.
+    A connection idle for longer than SMTP_HEALTHCHECK_SECONDS is checked with
+    NOOP before reuse, one idle for longer than SMTP_IDLE_TIMEOUT_SECONDS is closed
+    (servers drop idle sessions anyway). Thread-safe for threaded Celery pools;
+    prefork children start with an empty pool.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # [(server, last_used), ...] most recently used last
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            server.starttls()
+            server.login(EMAIL_HOST_USER, EMAIL_HOST_PASSWORD)
+        except Exception:
+            self._close(server)
+            raise
+        Logger.info(f"Opened SMTP connection to {EMAIL_HOST}:{EMAIL_PORT}")
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            idle_for = time.monotonic() - last_used
+            if idle_for > SMTP_IDLE_TIMEOUT_SECONDS:
+                self._close(server)
+            elif idle_for <= SMTP_HEALTHCHECK_SECONDS or self._is_alive(server):
+                return server
+            else:
+                server.close()
+        return self._open()
+
+    def _checkin(self, server: smtplib.SMTP):
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((server, time.monotonic()))
+                return
+        self._close(server)
+
+    @contextmanager
+    def connection(self, fresh: bool = False):
+        """
+        Borrow a logged-in connection, a newly opened one when fresh. It goes back
+        to the pool unless the block raised, a connection in an unknown state is
+        never reused.
+        """
+        server = self._open() if fresh else self._checkout()
+        try:
+            yield server
+        except Exception:
+            server.close()
+            raise
+        self._checkin(server)
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+    def reset_after_fork(self):
+        # Sockets inherited from the parent must not be shared with it
+        self._idle = []
+        self._lock = threading.Lock()
+
+
+smtp_pool = SmtpConnectionPool(max_size=SMTP_POOL_SIZE)
+os.register_at_fork(after_in_child=smtp_pool.reset_after_fork)
+
+
+# The connection went away, as opposed to the server refusing the message
+_CONNECTION_LOST = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError)
+
+
+class SmtpDeliveryUnknown(smtplib.SMTPException):
+    """The connection dropped during DATA: the server may or may not have queued the message"""
+
+
+def _deliver(server: smtplib.SMTP, sender: str, recipients: List[str], payload: bytes):
+    """
+    Send one message as its separate SMTP steps, so a caller can tell a
+    connection lost before DATA (nothing delivered, safe to resend) from one
+    lost during it (possibly delivered, resending could duplicate the email).
+    """
+    server.ehlo_or_helo_if_needed()
+    code, response = server.mail(sender)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, response, sender)
+
+    refused = {}
+    for recipient in recipients:
+        code, response = server.rcpt(recipient)
+        if code not in (250, 251):
+            refused[recipient] = (code, response)
+    if len(refused) == len(recipients):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    try:
+        code, response = server.data(payload)
+    except _CONNECTION_LOST as e:
+        raise SmtpDeliveryUnknown(f"SMTP connection lost during DATA: {e}") from e
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPDataError(code, response)
+
+
 def send_email(subject:str,body:str,to_email:list[str]):
     # Filter out empty strings and validate email addresses
     valid_emails = [email.strip() for email in to_email if email and email.strip() and '@' in email.strip()]
@@ -24,9 +169,18 @@ def send_email(subject:str,body:str,to_email:list[str]):
     msg["From"] = EMAIL_HOST_USER
     msg["To"] = ", ".join(valid_emails)
     msg.add_alternative(body, subtype="html")
+    payload = msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
 
-    with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-        server.starttls()
-        server.login(EMAIL_HOST_USER, EMAIL_HOST_PASSWORD)
-        server.send_message(msg)
-    return "Email sent successfully"
\ No newline at end of file
+    try:
+        with smtp_pool.connection() as server:
+            _deliver(server, EMAIL_HOST_USER, valid_emails, payload)
+    except _CONNECTION_LOST as e:
+        # A pooled connection went away before DATA, nothing was sent - retry once on a fresh one.
+        # A drop during DATA raises SmtpDeliveryUnknown instead and is not retried.
+        # The other idle connections most likely died with it (server restart), so they
+        # are dropped too; a recently used one would be handed out without a NOOP.
+        Logger.warning(f"SMTP connection lost ({e}), retrying on a new connection")
+        smtp_pool.clear()
+        with smtp_pool.connection(fresh=True) as server:
+            _deliver(server, EMAIL_HOST_USER, valid_emails, payload)
+    return "Email sent successfully"
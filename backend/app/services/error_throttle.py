@@ -0,0 +1,141 @@
+"""
+Deduplication of error notification emails.
+
+Errors are fingerprinted by type plus the innermost application frame of the
+traceback. The first occurrence of a fingerprint is mailed right away and
+opens a window of ERROR_EMAIL_WINDOW_SECONDS; repeats inside the window are
+only counted in Redis. A Celery beat task closes due windows: if there were
+repeats it mails one summary with the count and keeps the fingerprint muted
+for another window, otherwise the next occurrence is mailed right away again.
+A failure storm therefore costs a couple of Redis commands per request and
+one email per fingerprint per window.
+"""
+import hashlib
+import json
+import re
+import time
+from typing import Dict, List, Optional
+
+from app.core.conf import ERROR_EMAIL_WINDOW_SECONDS, ERROR_EMAIL_FLUSH_SECONDS
+from app.core.redis_config import redis_client, async_redis_client
+from app.common.logging import get_logger
+
+Logger = get_logger(__name__)
+
+PENDING_KEY = "error_email:pending"
+# Windows are closed by the flush task; the TTLs only clean up if beat is not running
+WINDOW_TTL = ERROR_EMAIL_WINDOW_SECONDS + 2 * ERROR_EMAIL_FLUSH_SECONDS
+# Windows closed per task run, the next run picks up the rest
+FLUSH_LIMIT = 500
+
+TRACEBACK_FRAME = re.compile(r'File "([^"]+)", line (\d+), in (\S+)')
+
+
+def _muted_key(fingerprint: str) -> str:
+    return f"error_email:muted:{fingerprint}"
+
+
+def _repeats_key(fingerprint: str) -> str:
+    return f"error_email:repeats:{fingerprint}"
+
+
+def error_fingerprint(error_type: str, traceback_text: str, uri: str) -> str:
+    """
+    Stable id of an error: its type plus where it was raised.
+    The location is the innermost frame of our own code, so the same bug hit
+    through library code (asyncpg, httpx, ...) groups together; without a
+    traceback the URI is used.
+    """
+    frames = TRACEBACK_FRAME.findall(traceback_text or "")
+    app_frames = [frame for frame in frames if "/app/" in frame[0] and "site-packages" not in frame[0]]
+    frame = (app_frames or frames or [None])[-1]
+    if frame:
+        path = frame[0]
+        # Relative to the package, the same error fingerprints alike on every host
+        location = f"{path[path.rfind('/app/') + 1:] if '/app/' in path else path}:{frame[1]}"
+    else:
+        location = uri
+    return hashlib.sha1(f"{error_type}|{location}".encode()).hexdigest()[:16]
+
+
+class ErrorEmailThrottle:
+    def __init__(self):
+        # Fallback when Redis is unreachable: per-process mute, fingerprint -> window end
+        self._local_muted: Dict[str, float] = {}
+
+    async def should_send(self, fingerprint: str, context: dict, recipients: List[str]) -> bool:
+        """
+        True for the first occurrence in a window, which the caller mails right away.
+        Repeats are counted for the window's summary and return False.
+        """
+        try:
+            now = time.time()
+            # One MULTI round trip: the window end is only recorded (NX) by the occurrence that opens it
+            async with async_redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(_muted_key(fingerprint), 1, nx=True, ex=WINDOW_TTL)
+                pipe.zadd(PENDING_KEY, {fingerprint: now + ERROR_EMAIL_WINDOW_SECONDS}, nx=True)
+                opened, _ = await pipe.execute()
+            if opened:
+                return True
+
+            async with async_redis_client.pipeline(transaction=False) as pipe:
+                pipe.hincrby(_repeats_key(fingerprint), "count", 1)
+                # The first repeat of the window is the sample shown in the summary
+                pipe.hsetnx(_repeats_key(fingerprint), "context", json.dumps(context))
+                pipe.hsetnx(_repeats_key(fingerprint), "recipients", json.dumps(recipients))
+                pipe.hsetnx(_repeats_key(fingerprint), "first_seen", now)
+                pipe.hset(_repeats_key(fingerprint), "last_seen", now)
+                pipe.expire(_repeats_key(fingerprint), WINDOW_TTL)
+                await pipe.execute()
+            return False
+        except Exception as e:
+            now = time.time()
+            if self._local_muted.get(fingerprint, 0) > now:
+                return False
+            # Logged once per window as well, the log must not turn into the storm
+            Logger.warning(f"Error email throttle unavailable, using the in-process window: {e}")
+            self._local_muted[fingerprint] = now + ERROR_EMAIL_WINDOW_SECONDS
+            return True
+
+    @staticmethod
+    def take_due(now: Optional[float] = None) -> List[dict]:
+        """
+        Close every window that has ended, called from the Celery worker (sync client).
+        Returns the summaries to mail: {"fingerprint", "count", "context", "recipients",
+        "first_seen", "last_seen"}; those fingerprints stay muted for another window.
+        """
+        now = now or time.time()
+        fingerprints = redis_client.zrangebyscore(PENDING_KEY, "-inf", now, start=0, num=FLUSH_LIMIT)
+
+        summaries = []
+        for fingerprint in fingerprints:
+            # HGETALL+DEL in one transaction: a repeat counted meanwhile goes to the next window
+            with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hgetall(_repeats_key(fingerprint))
+                pipe.delete(_repeats_key(fingerprint))
+                repeats, _ = pipe.execute()
+
+            if not repeats or not repeats.get("context"):
+                # Quiet window: unmute, the next occurrence is mailed immediately
+                with redis_client.pipeline(transaction=True) as pipe:
+                    pipe.delete(_muted_key(fingerprint))
+                    pipe.zrem(PENDING_KEY, fingerprint)
+                    pipe.execute()
+                continue
+
+            with redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(_muted_key(fingerprint), 1, ex=WINDOW_TTL)
+                pipe.zadd(PENDING_KEY, {fingerprint: now + ERROR_EMAIL_WINDOW_SECONDS})
+                pipe.execute()
+            summaries.append({
+                "fingerprint": fingerprint,
+                "count": int(repeats["count"]),
+                "context": json.loads(repeats["context"]),
+                "recipients": json.loads(repeats["recipients"]),
+                "first_seen": float(repeats["first_seen"]),
+                "last_seen": float(repeats["last_seen"]),
+            })
+        return summaries
+
+
+error_email_throttle = ErrorEmailThrottle()
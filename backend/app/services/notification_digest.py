@@ -0,0 +1,118 @@
+"""
+Per-recipient notification digests.
+
+Issue notifications are not mailed one by one: each one is appended to the
+recipient's Redis list and the recipient is added to a pending set scored by
+the time of their oldest waiting item. A Celery beat task takes every
+recipient whose oldest item is older than NOTIFICATION_DIGEST_WINDOW_SECONDS
+and sends them a single email covering everything in the window.
+
+Taking a digest renames its list to a processing key instead of deleting it;
+the key is only deleted (ack) once the email task is on the broker. A worker
+that dies in between leaves the key behind and a later run sends it again
+after CLAIM_SECONDS: at-least-once, like the outbox.
+"""
+import json
+import time
+import uuid
+from typing import Iterable, List, Tuple
+
+from app.core.conf import NOTIFICATION_DIGEST_WINDOW_SECONDS
+from app.core.redis_config import redis_client, async_redis_client
+
+PENDING_KEY = "digest:pending"
+# Digests taken but not acknowledged yet: {processing key: time taken}
+PROCESSING_KEY = "digest:processing"
+# Recipients flushed per task run, the next run picks up the rest
+FLUSH_LIMIT = 500
+# A taken digest not acknowledged within this long is sent again
+CLAIM_SECONDS = 300
+
+# (processing key to ack once sent, recipient email, items)
+TakenDigest = Tuple[str, str, List[dict]]
+
+
+def digest_key(email: str) -> str:
+    return f"digest:{email.lower()}"
+
+
+def _claim_key(processing_key: str) -> str:
+    return f"{processing_key}:claim"
+
+
+class NotificationDigest:
+    @staticmethod
+    async def add_many(entries: Iterable[dict]):
+        """
+        Record notifications, one Redis pipeline for the whole batch.
+        Each entry is {"recipients": [[email, name], ...], "item": {...}}.
+        """
+        now = time.time()
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for entry in entries:
+                for email, name in entry["recipients"]:
+                    pipe.rpush(digest_key(email), json.dumps({**entry["item"], "to_name": name}))
+                    # NX keeps the time of the oldest waiting item, which starts the window
+                    pipe.zadd(PENDING_KEY, {email.lower(): now}, nx=True)
+            await pipe.execute()
+
+    @staticmethod
+    def take_due(now: float = None) -> List[TakenDigest]:
+        """
+        Take the items of every recipient whose window has closed, ack() each one once its email is enqueued.
+        Called from the Celery worker, hence the sync client.
+        """
+        now = now or time.time()
+        emails = redis_client.zrangebyscore(
+            PENDING_KEY, "-inf", now - NOTIFICATION_DIGEST_WINDOW_SECONDS, start=0, num=FLUSH_LIMIT
+        )
+
+        taken: List[TakenDigest] = []
+        for email in emails:
+            # RENAME+ZREM in one transaction: an item added meanwhile lands in a new list/window.
+            # The processing key is unique, so it never overwrites one left by an earlier run.
+            processing_key = f"digest:processing:{uuid.uuid4().hex}:{email}"
+            with redis_client.pipeline(transaction=True) as pipe:
+                pipe.rename(digest_key(email), processing_key)
+                pipe.zrem(PENDING_KEY, email)
+                pipe.zadd(PROCESSING_KEY, {processing_key: now})
+                pipe.set(_claim_key(processing_key), 1, ex=CLAIM_SECONDS)
+                renamed, *_ = pipe.execute(raise_on_error=False)
+            if isinstance(renamed, Exception):
+                # The list was already gone (taken by a concurrent run)
+                NotificationDigest.ack(processing_key)
+                continue
+            taken.append((processing_key, email, NotificationDigest._items(processing_key)))
+        return taken
+
+    @staticmethod
+    def take_abandoned() -> List[TakenDigest]:
+        """Digests taken by a run that never acknowledged them, once their claim has expired"""
+        taken: List[TakenDigest] = []
+        for processing_key in redis_client.zrange(PROCESSING_KEY, 0, FLUSH_LIMIT - 1):
+            # The claim is the lease: whoever sets it after it expired owns the digest now
+            if not redis_client.set(_claim_key(processing_key), 1, ex=CLAIM_SECONDS, nx=True):
+                continue
+            email = processing_key.split(":", 3)[3]
+            taken.append((processing_key, email, NotificationDigest._items(processing_key)))
+        return taken
+
+    @staticmethod
+    def _items(processing_key: str) -> List[dict]:
+        return [json.loads(raw) for raw in redis_client.lrange(processing_key, 0, -1)]
+
+    @staticmethod
+    def ack(processing_key: str):
+        """Drop a taken digest once its email has been enqueued"""
+        with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(processing_key, _claim_key(processing_key))
+            pipe.zrem(PROCESSING_KEY, processing_key)
+            pipe.execute()
+
+
+notification_digest = NotificationDigest()
+
+
+def digest_recipients(users) -> List[Tuple[str, str]]:
+    """[(email, name), ...] for the users that have an email"""
+    return [(user.email, user.name) for user in users if user and user.email]
@@ -0,0 +1,205 @@
+"""
+Transactional outbox for Redis events and Celery tasks.
+
+Request handlers stage their side effects as outbox rows in the same
+transaction as the data change, so a crash after the commit can no longer
+lose them and the request returns as soon as the commit lands. A relay task
+in every API process leases pending rows (SELECT ... FOR UPDATE SKIP LOCKED
+plus a locked_until timestamp) in a short transaction, delivers the batch
+with no transaction open (Redis publishes in one pipeline, Celery tasks via
+send_task, notification digest items in one pipeline, each bounded by
+OUTBOX_SEND_TIMEOUT_SECONDS) and then deletes the delivered rows. Delivery
+is at-least-once.
+"""
+import asyncio
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.conf import (
+    OUTBOX_POLL_SECONDS,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_SEND_TIMEOUT_SECONDS,
+)
+from app.core.celery_app import celery_app
+from app.db.connection import AsyncSessionLocal
+from app.db.crud.outbox_crud import (
+    add_outbox_event,
+    claim_outbox_events,
+    delete_outbox_events,
+    record_outbox_failure,
+)
+from app.models.model import OutboxEvent
+from app.services.redis_publisher import redis_publisher
+from app.services.notification_digest import notification_digest
+from app.common.logging.logging_config import get_logger
+from app.common.logging.request import current_trace, get_current_request_id
+
+Logger = get_logger(__name__)
+
+OUTBOX_REDIS = "redis"
+OUTBOX_CELERY = "celery"
+OUTBOX_DIGEST = "digest"
+
+
+def stage_redis_event(session: AsyncSession, channels: List[str], message: dict):
+    """Publish message to channels once the caller's transaction commits"""
+    add_outbox_event(session, OUTBOX_REDIS, {"channels": channels, "message": message, "trace": current_trace()})
+
+
+def stage_celery_task(session: AsyncSession, task_name: str, kwargs: dict):
+    """Enqueue a Celery task once the caller's transaction commits"""
+    add_outbox_event(session, OUTBOX_CELERY, {"task": task_name, "kwargs": kwargs, "request_id": get_current_request_id()})
+
+
+def stage_digest_item(session: AsyncSession, recipients: List[List[str]], item: dict):
+    """Add a notification to the recipients' digests once the caller's transaction commits"""
+    add_outbox_event(session, OUTBOX_DIGEST, {"recipients": recipients, "item": item})
+
+
+class OutboxRelay:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        if self.task and not self.task.done():
+            return
+        self.task = asyncio.create_task(self._run())
+        Logger.info("Started outbox relay")
+
+    def notify(self):
+        """Deliver right away instead of at the next poll, called after an outbox commit"""
+        self._wakeup.set()
+
+    async def stop(self):
+        """Stop polling and deliver whatever is still pending, called on shutdown"""
+        if not self.task:
+            return
+        self.task.cancel()
+        await asyncio.wait([self.task], timeout=5)
+        self.task = None
+        try:
+            await asyncio.wait_for(self.relay_batch(), timeout=5)
+        except Exception as e:
+            Logger.warning(f"Final outbox flush failed, rows stay pending: {e}")
+
+    async def _run(self):
+        try:
+            while True:
+                try:
+                    delivered = await self.relay_batch()
+                except Exception as e:
+                    Logger.error(f"Outbox relay batch failed: {e}")
+                    delivered = 0
+
+                # A full batch means there is probably more waiting
+                if delivered >= OUTBOX_BATCH_SIZE:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        except asyncio.CancelledError:
+            pass
+
+    async def relay_batch(self) -> int:
+        """Lease, deliver and delete one batch of outbox rows, returns how many were claimed"""
+        # No transaction (and no pool connection) is held while Redis or the broker is slow
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                events = await claim_outbox_events(session, OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_LEASE_SECONDS)
+        if not events:
+            return 0
+
+        redis_events = [event for event in events if event.topic == OUTBOX_REDIS]
+        celery_events = [event for event in events if event.topic == OUTBOX_CELERY]
+        digest_events = [event for event in events if event.topic == OUTBOX_DIGEST]
+        unknown = [event.id for event in events if event.topic not in (OUTBOX_REDIS, OUTBOX_CELERY, OUTBOX_DIGEST)]
+
+        delivered, failed = [], {}
+        for topic, deliver, topic_events in (
+            (OUTBOX_REDIS, self._deliver_redis, redis_events),
+            (OUTBOX_CELERY, self._deliver_celery, celery_events),
+            (OUTBOX_DIGEST, self._deliver_digest, digest_events),
+        ):
+            event_ids, error = await self._bounded(topic, deliver, topic_events)
+            if error:
+                failed[error] = failed.get(error, []) + event_ids
+            else:
+                delivered.extend(event_ids)
+        if unknown:
+            failed["unknown outbox topic"] = unknown
+
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await delete_outbox_events(session, delivered)
+                for error, event_ids in failed.items():
+                    Logger.error(f"Outbox delivery failed for {len(event_ids)} event(s): {error}")
+                    await record_outbox_failure(session, event_ids, error)
+
+        return len(events)
+
+    @staticmethod
+    async def _bounded(topic: str, deliver, events: List[OutboxEvent]):
+        """
+        Run one delivery with OUTBOX_SEND_TIMEOUT_SECONDS, so a batch always finishes well
+        within its lease; a timed-out send counts as failed and the rows are retried
+        """
+        try:
+            return await asyncio.wait_for(deliver(events), timeout=OUTBOX_SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return [event.id for event in events], f"{topic}: timed out after {OUTBOX_SEND_TIMEOUT_SECONDS}s"
+
+    @staticmethod
+    async def _deliver_redis(events: List[OutboxEvent]):
+        """Publish every Redis event of the batch in one pipeline round trip"""
+        event_ids = [event.id for event in events]
+        if not events:
+            return event_ids, None
+        try:
+            await redis_publisher.publish_many(
+                (event.payload["channels"], event.payload["message"], event.payload.get("trace")) for event in events
+            )
+            return event_ids, None
+        except Exception as e:
+            return event_ids, f"redis: {e}"
+
+    @staticmethod
+    async def _deliver_digest(events: List[OutboxEvent]):
+        """Append the batch's notifications to the recipients' digests in one pipeline"""
+        event_ids = [event.id for event in events]
+        if not events:
+            return event_ids, None
+        try:
+            await notification_digest.add_many(event.payload for event in events)
+            return event_ids, None
+        except Exception as e:
+            return event_ids, f"digest: {e}"
+
+    @staticmethod
+    async def _deliver_celery(events: List[OutboxEvent]):
+        """Send the Celery tasks of the batch; the broker client blocks, so it runs in a thread"""
+        event_ids = [event.id for event in events]
+        if not events:
+            return event_ids, None
+
+        def send_all():
+            for event in events:
+                request_id = event.payload.get("request_id")
+                celery_app.send_task(
+                    event.payload["task"],
+                    kwargs=event.payload["kwargs"],
+                    headers={"request_id": request_id} if request_id else None,
+                )
+
+        try:
+            await asyncio.to_thread(send_all)
+            return event_ids, None
+        except Exception as e:
+            return event_ids, f"celery: {e}"
+
+
+outbox_relay = OutboxRelay()
@@ -0,0 +1,173 @@
+import time
+import uuid
+from typing import Dict, Iterable, List, Tuple
+from app.core.redis_config import async_redis_client
+from app.core.event_codec import encode_event
+from app.core.event_bus import event_bus
+from app.core.conf import PRESENCE_TTL_SECONDS, EVENT_BUS_BACKEND
+from app.common.logging.logging_config import get_logger
+from app.services.redis_publisher import project_channel
+
+Logger = get_logger(__name__)
+
+# Identifies this process in presence entries, so several uvicorn workers can
+# hold the same user in the same project without clobbering each other
+NODE_ID = uuid.uuid4().hex[:12]
+
+
+def presence_key(project_id: int) -> str:
+    return f"project:{project_id}:presence"
+
+
+def presence_names_key(project_id: int) -> str:
+    return f"project:{project_id}:presence:names"
+
+
+def _member(user_id: int) -> str:
+    return f"{user_id}:{NODE_ID}"
+
+
+def _user_id_of(member: str) -> int:
+    return int(member.split(":", 1)[0])
+
+
+class PresenceService:
+    """
+    Cluster-wide presence for project rooms.
+    Each project has a Redis sorted set of "{user_id}:{node_id}" members scored by
+    the last server heartbeat; entries older than PRESENCE_TTL_SECONDS are stale.
+    """
+
+    @staticmethod
+    async def _online_user_ids(project_id: int, now: float) -> set:
+        members = await async_redis_client.zrangebyscore(presence_key(project_id), now - PRESENCE_TTL_SECONDS, "+inf")
+        return {_user_id_of(member) for member in members}
+
+    @staticmethod
+    async def join(project_id: int, user_id: int, user_name: str) -> bool:
+        """Mark the user present, returns True if they were not present anywhere in the cluster"""
+        now = time.time()
+        # One MULTI: the members read are those just before this node's ZADD, so of
+        # two nodes joining the same user at once exactly one reports the join
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.zrangebyscore(presence_key(project_id), now - PRESENCE_TTL_SECONDS, "+inf")
+            pipe.zadd(presence_key(project_id), {_member(user_id): now})
+            pipe.hset(presence_names_key(project_id), str(user_id), user_name)
+            pipe.expire(presence_key(project_id), PRESENCE_TTL_SECONDS * 2)
+            pipe.expire(presence_names_key(project_id), PRESENCE_TTL_SECONDS * 2)
+            online, *_ = await pipe.execute()
+
+        return user_id not in {_user_id_of(member) for member in online}
+
+    @staticmethod
+    async def leave(project_id: int, user_id: int) -> bool:
+        """Drop this node's entry, returns True if the user is no longer present anywhere"""
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.zrem(presence_key(project_id), _member(user_id))
+            pipe.zrangebyscore(presence_key(project_id), time.time() - PRESENCE_TTL_SECONDS, "+inf")
+            _, online = await pipe.execute()
+        return user_id not in {_user_id_of(member) for member in online}
+
+    @staticmethod
+    async def heartbeat(entries: Iterable[Tuple[int, int]]):
+        """
+        Refresh every (project_id, user_id) held by this node in one transaction and
+        prune entries left behind by dead nodes, announcing presence_left for users
+        who were only present through them.
+        """
+        entries = list(entries)
+        if not entries:
+            return
+
+        now = time.time()
+        cutoff = now - PRESENCE_TTL_SECONDS
+        by_project: Dict[int, Dict[str, float]] = {}
+        for project_id, user_id in entries:
+            by_project.setdefault(project_id, {})[_member(user_id)] = now
+
+        # Reading the expired and the remaining members in the same MULTI as the
+        # prune means only the node that removed an entry announces it
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            for project_id, members in by_project.items():
+                pipe.zadd(presence_key(project_id), members)
+                pipe.zrangebyscore(presence_key(project_id), "-inf", cutoff)
+                pipe.zremrangebyscore(presence_key(project_id), "-inf", cutoff)
+                pipe.zrange(presence_key(project_id), 0, -1)
+                pipe.expire(presence_key(project_id), PRESENCE_TTL_SECONDS * 2)
+                pipe.expire(presence_names_key(project_id), PRESENCE_TTL_SECONDS * 2)
+            results = await pipe.execute()
+
+        for index, project_id in enumerate(by_project):
+            expired, remaining = results[index * 6 + 1], results[index * 6 + 3]
+            gone = {_user_id_of(member) for member in expired} - {_user_id_of(member) for member in remaining}
+            if gone:
+                await PresenceService._announce_left(project_id, sorted(gone))
+
+    @staticmethod
+    async def _announce_left(project_id: int, user_ids: List[int]):
+        names = await async_redis_client.hmget(presence_names_key(project_id), [str(user_id) for user_id in user_ids])
+        for user_id, name in zip(user_ids, names):
+            Logger.info(f"Presence of user {user_id} in project {project_id} expired")
+            await PresenceService.publish_presence_event(project_id, "presence_left", user_id, name)
+
+    @staticmethod
+    async def get_presence(project_id: int) -> List[dict]:
+        """Users currently present in the project, read straight from Redis"""
+        user_ids = sorted(await PresenceService._online_user_ids(project_id, time.time()))
+        if not user_ids:
+            return []
+
+        names = await async_redis_client.hmget(presence_names_key(project_id), [str(user_id) for user_id in user_ids])
+        return [
+            {"user_id": user_id, "user_name": name}
+            for user_id, name in zip(user_ids, names)
+        ]
+
+    @staticmethod
+    async def publish_presence_event(project_id: int, event_type: str, user_id: int, user_name: str):
+        """Announce a join/leave on the project channel"""
+        try:
+            message = {
+                "type": event_type,
+                "data": {"user_id": user_id, "user_name": user_name}
+            }
+            await event_bus.publish(project_channel(project_id), encode_event(message))
+        except Exception as e:
+            Logger.error(f"Error publishing {event_type} for user {user_id} in project {project_id}: {e}")
+
+class LocalPresenceService(PresenceService):
+    """
+    Presence kept in this process, used with the in-process event bus so a
+    single-node deployment needs no Redis for realtime.
+    """
+
+    def __init__(self):
+        # {project_id: {user_id: user_name}}
+        self.present: Dict[int, Dict[int, str]] = {}
+
+    async def join(self, project_id: int, user_id: int, user_name: str) -> bool:
+        users = self.present.setdefault(project_id, {})
+        was_online = user_id in users
+        users[user_id] = user_name
+        return not was_online
+
+    async def leave(self, project_id: int, user_id: int) -> bool:
+        users = self.present.get(project_id, {})
+        users.pop(user_id, None)
+        if not users:
+            self.present.pop(project_id, None)
+        return True
+
+    async def heartbeat(self, entries: Iterable[Tuple[int, int]]):
+        # Nothing expires locally, the manager calls leave() when the last socket goes
+        return
+
+    async def get_presence(self, project_id: int) -> List[dict]:
+        users = self.present.get(project_id, {})
+        return [
+            {"user_id": user_id, "user_name": users[user_id]}
+            for user_id in sorted(users)
+        ]
+
+
+presence_service = LocalPresenceService() if EVENT_BUS_BACKEND == "memory" else PresenceService()
@@ -0,0 +1,70 @@
+"""
+Celery queue depth and lag, read straight from the Redis broker.
+
+Lag is the age of the oldest waiting message, from the enqueued_at header
+stamped by app.core.celery_app at publish time. Blocking (broker client),
+call it from a thread. The last reading is what the celery_queue_* gauges on
+/metrics export, so the endpoint refreshes it before rendering.
+"""
+import json
+import time
+from typing import Dict
+
+from app.core.celery_app import celery_app, QUEUES
+from app.core.metrics import CELERY_QUEUE_DEPTH, CELERY_QUEUE_LAG
+from app.common.logging.logging_config import get_logger
+
+Logger = get_logger(__name__)
+
+# Last result of celery_queue_stats(), replaced as a whole so scrapes never see half of one
+_latest: Dict[str, dict] = {}
+
+
+def celery_queue_stats() -> Dict[str, dict]:
+    """{queue: {"depth": waiting messages, "lag_seconds": age of the oldest}} per queue"""
+    global _latest
+    _latest = _read_queue_stats()
+    return _latest
+
+
+def _read_queue_stats() -> Dict[str, dict]:
+    if not str(celery_app.conf.broker_url or "").startswith(("redis://", "rediss://")):
+        return {}
+
+    options = celery_app.conf.broker_transport_options
+    steps, sep = options["priority_steps"], options["sep"]
+    try:
+        with celery_app.connection_for_read() as connection:
+            client = connection.default_channel.client
+            keys = {
+                queue: [queue if step == 0 else f"{queue}{sep}{step}" for step in steps]
+                for queue in QUEUES
+            }
+            pipe = client.pipeline(transaction=False)
+            for queue_keys in keys.values():
+                for key in queue_keys:
+                    pipe.llen(key)
+                    # Messages are LPUSHed and BRPOPed: the oldest is at the tail
+                    pipe.lindex(key, -1)
+            results = iter(pipe.execute())
+    except Exception as e:
+        Logger.warning(f"Could not read Celery queue stats: {e}")
+        return {}
+
+    now = time.time()
+    stats = {}
+    for queue, queue_keys in keys.items():
+        depth, lag = 0, 0.0
+        for _ in queue_keys:
+            length, oldest = next(results), next(results)
+            depth += length
+            if oldest:
+                enqueued_at = json.loads(oldest).get("headers", {}).get("enqueued_at")
+                if enqueued_at:
+                    lag = max(lag, now - float(enqueued_at))
+        stats[queue] = {"depth": depth, "lag_seconds": round(lag, 3)}
+    return stats
+
+
+CELERY_QUEUE_DEPTH.set_function(lambda: {(queue,): stats["depth"] for queue, stats in _latest.items()})
+CELERY_QUEUE_LAG.set_function(lambda: {(queue,): stats["lag_seconds"] for queue, stats in _latest.items()})
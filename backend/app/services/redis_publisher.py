@@ -1,61 +1,215 @@
-import json
-from app.core.redis_config import async_redis_client
-from app.common.logging.logging_config import Logger
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Iterable, List, Tuple, Dict
+from app.core.event_bus import event_bus
+from app.core.event_codec import encode_event
+from app.common.logging.logging_config import get_logger
+from app.common.logging.request import current_trace
+from app.core.tracing import span
+from app.core.metrics import REDIS_PUBLISH_DURATION
 from app.common.errors import ClientErrors
 from fastapi import status
 
+Logger = get_logger(__name__)
+
+# One line per publish, sampled through LOG_SAMPLE_RATES
+PublishLogger = get_logger(f"{__name__}.publish")
+
+
+def project_channel(project_id: int) -> str:
+    return f"project:{project_id}:updates"
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}:updates"
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def issue_version(issue) -> Optional[int]:
+    """
+    Optimistic-concurrency version of an issue: updated_at in epoch microseconds.
+    Clients echo it back on writes so stale board moves are rejected.
+    """
+    if not issue.updated_at:
+        return None
+    return (issue.updated_at - _EPOCH) // timedelta(microseconds=1)
+
+
+def version_to_datetime(version: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=version)
+
+
+def _enum_value(value):
+    return value.value if hasattr(value, 'value') else str(value)
+
+
+def issue_event_data(issue, include_people: bool = False) -> dict:
+    """Convert an Issue model to the dict published in realtime events"""
+    data = {
+        "id": issue.id,
+        "name": issue.name,
+        "description": issue.description,
+        "status": _enum_value(issue.status),
+        "priority": _enum_value(issue.priority),
+        "type": _enum_value(issue.type),
+        "assigned_to": issue.assigned_to,
+        "assigned_by": issue.assigned_by,
+        "project_id": issue.project_id,
+        "sprint_id": issue.sprint_id,
+        "story_point": issue.story_point,
+        "time_estimate": float(issue.time_estimate) if issue.time_estimate else None,
+        "created_at": issue.created_at.isoformat() if issue.created_at else None,
+        "updated_at": issue.updated_at.isoformat() if issue.updated_at else None,
+        "version": issue_version(issue),
+    }
+    if include_people:
+        data["assignee"] = {
+            "id": issue.assignee.id,
+            "name": issue.assignee.name
+        } if issue.assignee else None
+        data["reporter"] = {
+            "id": issue.reporter.id,
+            "name": issue.reporter.name
+        } if issue.reporter else None
+    return data
+
+
+def issue_filter_fields(issue) -> dict:
+    """The filterable fields of an issue, sent as "previous" on updates"""
+    return {
+        "sprint_id": issue.sprint_id,
+        "assigned_to": issue.assigned_to,
+        "type": _enum_value(issue.type),
+    }
+
+
+def _event_channels(project_id: int, user_ids: Iterable[Optional[int]]) -> List[str]:
+    """The project channel plus the user-scoped channel of every distinct user id given"""
+    channels = [project_channel(project_id)]
+    for user_id in sorted({user_id for user_id in user_ids if user_id}):
+        channels.append(user_channel(user_id))
+    return channels
+
+
+def issue_updated_event(project_id: int, issue_data: dict, previous_data: Optional[dict] = None) -> Tuple[List[str], dict]:
+    """
+    Channels and message for an issue update.
+    previous_data carries the pre-update values of the filterable fields
+    (sprint_id, assigned_to, type) so filtered subscribers see issues leaving their view.
+    """
+    message = {
+        "type": "issue_updated",
+        "data": issue_data,
+        "previous": previous_data or {}
+    }
+    channels = _event_channels(project_id, [issue_data.get("assigned_to"), (previous_data or {}).get("assigned_to")])
+    return channels, message
+
+
+def issue_created_event(project_id: int, issue_data: dict) -> Tuple[List[str], dict]:
+    """Channels and message for an issue creation"""
+    message = {
+        "type": "issue_created",
+        "data": issue_data
+    }
+    return _event_channels(project_id, [issue_data.get("assigned_to")]), message
+
+
+def issue_deleted_event(project_id: int, issue_id: int, assigned_to: Optional[int] = None) -> Tuple[List[str], dict]:
+    """Channels and message for an issue deletion"""
+    message = {
+        "type": "issue_deleted",
+        "data": {"issue_id": issue_id}
+    }
+    return _event_channels(project_id, [assigned_to]), message
+
+
+# One event to publish: (channels, message), or (channels, message, trace) when
+# published on behalf of an earlier request (outbox relay)
+Event = Tuple[List[str], dict]
+
+
+class PublishReport:
+    """Outcome of one publish_many batch"""
+
+    __slots__ = ("events", "channels", "publishes", "subscribers", "latency_ms")
+
+    def __init__(self, events: int, channels: int, publishes: int, subscribers: int, latency_ms: float):
+        self.events = events
+        self.channels = channels
+        self.publishes = publishes
+        self.subscribers = subscribers
+        self.latency_ms = latency_ms
+
+
 class RedisPublisher:
     @staticmethod
-    async def publish_issue_update(project_id: int, issue_data: dict):
-        """Publish issue update event to Redis"""
+    async def publish_many(events: Iterable[Event]) -> PublishReport:
+        """
+        Publish a batch of events on the event bus, a single pipeline round trip with Redis.
+        Each message is encoded once, however many channels it goes to, and
+        publishes are grouped per channel in submission order so every channel
+        still sees its events in order.
+        Raises on bus (Redis) errors; callers that must not fail catch it.
+        Envelopes carry the originating request id, from the event's trace or the current request.
+        """
+        started = time.perf_counter()
+
+        by_channel: Dict[str, List[bytes]] = {}
+        count = 0
+        for channels, message, *trace in events:
+            payload = encode_event(message, trace[0] if trace else current_trace())
+            count += 1
+            for channel in channels:
+                by_channel.setdefault(channel, []).append(payload)
+
+        if not by_channel:
+            return PublishReport(0, 0, 0, 0, 0.0)
+
+        with span("redis.publish", events=count, channels=len(by_channel), bus=event_bus.name):
+            results = await event_bus.publish_many([
+                (channel, payload)
+                for channel, payloads in by_channel.items()
+                for payload in payloads
+            ])
+
+        report = PublishReport(
+            events=count,
+            channels=len(by_channel),
+            publishes=len(results),
+            subscribers=sum(results),
+            latency_ms=(time.perf_counter() - started) * 1000,
+        )
+        REDIS_PUBLISH_DURATION.labels(event_bus.name).observe(report.latency_ms / 1000)
+        PublishLogger.info(
+            f"Published {report.events} event(s) to {report.channels} {event_bus.name} channel(s) "
+            f"in {report.latency_ms:.1f}ms, subscribers: {report.subscribers}"
+        )
+        return report
+
+    @staticmethod
+    async def _publish_one(event: Event, description: str):
         try:
-            channel = f"project:{project_id}:updates"
-            message = {
-                "type": "issue_updated",
-                "data": issue_data
-            }
-            result = await async_redis_client.publish(channel, json.dumps(message))
-            Logger.info(f"Published issue update to Redis channel: {channel}, subscribers: {result}")
-            
+            await RedisPublisher.publish_many([event])
         except Exception as e:
-            import traceback
-            Logger.error(f"Error publishing issue update to Redis: {e}")
-            Logger.error(f"Redis publish traceback: {traceback.format_exc()}")
             # Don't raise - allow the API to succeed even if Redis fails
-            # This prevents Redis issues from breaking the update API
-    
+            Logger.error(f"Error publishing {description} to Redis channel {event[0][0]}: {e!r}")
+
+    @staticmethod
+    async def publish_issue_update(project_id: int, issue_data: dict, previous_data: Optional[dict] = None):
+        """Publish issue update event to Redis"""
+        await RedisPublisher._publish_one(issue_updated_event(project_id, issue_data, previous_data), "issue update")
+
     @staticmethod
     async def publish_issue_created(project_id: int, issue_data: dict):
         """Publish issue creation event to Redis"""
-        try:
-            channel = f"project:{project_id}:updates"
-            message = {
-                "type": "issue_created",
-                "data": issue_data
-            }
-            result = await async_redis_client.publish(channel, json.dumps(message))
-            Logger.info(f"Published issue creation to Redis channel: {channel}, subscribers: {result}")
-        except Exception as e:
-            import traceback
-            Logger.error(f"Error publishing create issue to Redis: {e}")
-            Logger.error(f"Redis publish traceback: {traceback.format_exc()}")
-            # Don't raise - allow the API to succeed even if Redis fails
-    
+        await RedisPublisher._publish_one(issue_created_event(project_id, issue_data), "issue creation")
+
     @staticmethod
-    async def publish_issue_deleted(project_id: int, issue_id: int):
+    async def publish_issue_deleted(project_id: int, issue_id: int, assigned_to: Optional[int] = None):
         """Publish issue deletion event to Redis"""
-        try:
-            channel = f"project:{project_id}:updates"
-            message = {
-                "type": "issue_deleted",
-                "data": {"issue_id": issue_id}
-            }
-            result = await async_redis_client.publish(channel, json.dumps(message))
-            Logger.info(f"Published issue deletion to Redis channel: {channel}, subscribers: {result}")
-        except Exception as e:
-            import traceback
-            Logger.error(f"Error publishing issue deletion to Redis: {e}")
-            Logger.error(f"Redis publish traceback: {traceback.format_exc()}")
-            # Don't raise - allow the API to succeed even if Redis fails
+        await RedisPublisher._publish_one(issue_deleted_event(project_id, issue_id, assigned_to), "issue deletion")
 
-redis_publisher = RedisPublisher()
\ No newline at end of file
+redis_publisher = RedisPublisher()
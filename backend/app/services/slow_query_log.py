@@ -0,0 +1,169 @@
+"""
+Slow-query log.
+
+The engine hook in app.db.connection hands every statement slower than
+DB_SLOW_QUERY_MS to `slow_query_log.record()`, which only appends it, with
+its bound parameters and the request it ran for, to a rolling in-memory
+buffer. Parameter values are redacted to their types unless
+DB_SLOW_QUERY_PARAMETERS is on. SELECTs are also queued for a plan: a background task re-runs them as
+EXPLAIN (ANALYZE, BUFFERS) on a connection of its own (never the request's
+pool), inside a rolled back transaction with a statement timeout, and attaches
+the plan to the entry. One plan per statement text per DB_SLOW_QUERY_EXPLAIN_INTERVAL
+and a small bounded queue keep a slow-query storm from doubling the load on
+the database. Writes are never explained: ANALYZE executes the statement.
+
+The buffer is per process and read through GET /api/v1/admin/slow-queries.
+"""
+import asyncio
+import itertools
+import json
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.conf import (
+    DATABASE_URL,
+    DB_SLOW_QUERY_BUFFER,
+    DB_SLOW_QUERY_PARAMETERS,
+    DB_SLOW_QUERY_EXPLAIN,
+    DB_SLOW_QUERY_EXPLAIN_INTERVAL,
+    DB_SLOW_QUERY_EXPLAIN_TIMEOUT_MS,
+)
+from app.common.logging.logging_config import get_logger
+from app.common.logging.request import get_current_request_id
+
+SlowQueryLogger = get_logger(__name__)
+
+# Plans waiting for the explain task, past this new slow queries are logged without one
+EXPLAIN_QUEUE_SIZE = 20
+# Bound parameter values are cut to this many characters in the buffer
+PARAMETER_MAX_CHARS = 200
+
+WRITE_KEYWORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|ALTER|DROP|CALL)\b", re.IGNORECASE)
+
+
+def is_explainable(statement: str) -> bool:
+    """Read-only statements only: SELECT, or a WITH query without data-modifying parts"""
+    head = statement.lstrip()[:6].upper()
+    if head == "SELECT":
+        return "FOR UPDATE" not in statement.upper()
+    return head.startswith("WITH") and not WRITE_KEYWORDS.search(statement)
+
+
+def _short(value) -> str:
+    if not DB_SLOW_QUERY_PARAMETERS:
+        return f"<{type(value).__name__}>"
+    text = repr(value)
+    return text if len(text) <= PARAMETER_MAX_CHARS else f"{text[:PARAMETER_MAX_CHARS]}...({len(text)} chars)"
+
+
+def _parameters(parameters, executemany: bool):
+    """Buffer form of a statement's parameters: one entry per value, or the whole executemany batch"""
+    if executemany and not DB_SLOW_QUERY_PARAMETERS:
+        return f"<{len(parameters)} parameter sets>"
+    if executemany or not isinstance(parameters, (list, tuple)):
+        return _short(parameters)
+    return [_short(value) for value in parameters]
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self.entries: Deque[dict] = deque(maxlen=DB_SLOW_QUERY_BUFFER)
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self._ids = itertools.count(1)
+        # Statement text -> last time it was explained
+        self._explained_at: Dict[str, float] = {}
+        self._engine: Optional[AsyncEngine] = None
+
+    def start(self):
+        if self.task and not self.task.done():
+            return
+        self.queue = asyncio.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        if DB_SLOW_QUERY_EXPLAIN:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.wait([self.task], timeout=5)
+            self.task = None
+        self.queue = None
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+    def record(self, statement: str, parameters, duration_ms: float, executemany: bool = False):
+        """Called from the engine hook on the event loop; never touches the database"""
+        entry = {
+            "id": next(self._ids),
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "request_id": get_current_request_id(),
+            "duration_ms": round(duration_ms, 1),
+            "statement": statement,
+            "parameters": _parameters(parameters, executemany),
+            "plan_status": "not_captured",
+            "plan": None,
+        }
+        self.entries.append(entry)
+        SlowQueryLogger.warning(
+            f"Slow query ({duration_ms:.1f}ms): {' '.join(statement.split())[:500]}",
+            extra={"duration_ms": entry["duration_ms"], "slow_query_id": entry["id"]},
+        )
+
+        if executemany or not is_explainable(statement):
+            entry["plan_status"] = "not_explainable"
+            return
+        if self.queue is None:
+            # Not running in the API process (Celery worker, scripts)
+            return
+        now = time.monotonic()
+        if now - self._explained_at.get(statement, -DB_SLOW_QUERY_EXPLAIN_INTERVAL) < DB_SLOW_QUERY_EXPLAIN_INTERVAL:
+            entry["plan_status"] = "recently_explained"
+            return
+        try:
+            self.queue.put_nowait((entry, statement, parameters))
+        except asyncio.QueueFull:
+            entry["plan_status"] = "explain_queue_full"
+            return
+        if len(self._explained_at) > 1000:
+            self._explained_at.clear()
+        self._explained_at[statement] = now
+        entry["plan_status"] = "pending"
+
+    def recent(self, limit: int = 50, min_ms: float = 0) -> List[dict]:
+        """Newest first"""
+        return [entry for entry in reversed(self.entries) if entry["duration_ms"] >= min_ms][:limit]
+
+    async def _run(self):
+        try:
+            while True:
+                entry, statement, parameters = await self.queue.get()
+                try:
+                    entry["plan"] = await self._explain(statement, parameters)
+                    entry["plan_status"] = "captured"
+                except Exception as e:
+                    entry["plan_status"] = f"failed: {type(e).__name__}: {e}"[:300]
+        except asyncio.CancelledError:
+            pass
+
+    async def _explain(self, statement: str, parameters) -> list:
+        if self._engine is None:
+            # Own connections, so plan capture never waits on or starves the request pool
+            self._engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+        async with self._engine.connect() as conn:
+            # Transaction rolled back when the connection closes
+            await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(DB_SLOW_QUERY_EXPLAIN_TIMEOUT_MS)}")
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", tuple(parameters or ())
+            )
+            plan = result.scalar()
+        return json.loads(plan) if isinstance(plan, str) else plan
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,304 @@
+"""
+Non-blocking Celery enqueue for async request handlers.
+
+`task.delay()` is a synchronous broker round trip; called from a handler it
+stalls the event loop, and with a slow or unreachable broker it stalls every
+in-flight request. `celery_enqueuer.enqueue()` only appends to a bounded
+in-memory buffer. A background flusher sends the buffer in batches over one
+broker connection in a dedicated thread, with a timeout. When the broker
+doesn't answer in time (or the buffer is full) messages are appended to a
+local JSON-lines spool, which is replayed once the broker is reachable again.
+Delivery is at-least-once: a send that timed out may still land after its
+batch was spooled.
+
+Every API process spools to a file of its own (CELERY_SPOOL_PATH with the pid
+inserted, logs/celery_spool.<pid>.jsonl), so uvicorn workers never replay or
+truncate each other's spool. Spools left behind by processes that are gone
+(restart, crash) are adopted by the next process that starts.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, List, Optional, Tuple
+
+from app.core.conf import (
+    CELERY_ENQUEUE_BUFFER_SIZE,
+    CELERY_ENQUEUE_BATCH_SIZE,
+    CELERY_ENQUEUE_TIMEOUT_SECONDS,
+    CELERY_SPOOL_PATH,
+    CELERY_SPOOL_RETRY_SECONDS,
+)
+from app.core.celery_app import celery_app
+from app.core.metrics import CELERY_ENQUEUE_LATENCY, CELERY_ENQUEUE_PENDING, CELERY_ENQUEUE_TASKS
+from app.common.logging.logging_config import get_logger
+from app.common.logging.request import get_current_request_id, create_background_task
+
+Logger = get_logger(__name__)
+
+# (task name, kwargs, time it was enqueued, id of the request that enqueued it)
+PendingTask = Tuple[str, dict, float, Optional[str]]
+
+# Longest pause after repeated flusher errors
+FLUSHER_MAX_BACKOFF_SECONDS = 60
+
+_SPOOL_ROOT, _SPOOL_EXT = os.path.splitext(CELERY_SPOOL_PATH)
+# logs/celery_spool.<pid>.jsonl, plus .replaying while it is being replayed
+_SPOOL_NAME = re.compile(
+    rf"^{re.escape(os.path.basename(_SPOOL_ROOT))}\.(\d+){re.escape(_SPOOL_EXT)}(\.replaying)?$"
+)
+
+
+def spool_path_for(pid: int) -> str:
+    return f"{_SPOOL_ROOT}.{pid}{_SPOOL_EXT}"
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != "posix":
+        # No cheap liveness check (signal 0 is CTRL_C_EVENT on Windows), never adopt
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class CeleryEnqueuer:
+    def __init__(self):
+        self.buffer: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        # One thread: a hung broker ties up a single thread, not the default pool
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="celery-enqueue")
+        self._in_flight: Optional[Future] = None
+        self._last_replay = 0.0
+        self._spool_pending = 0
+        self.spool_path = spool_path_for(os.getpid())
+        # Overflow spooling runs in a worker thread next to the flusher's
+        self._spool_lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self.counters = {"enqueued": 0, "sent": 0, "spooled": 0, "replayed": 0, "send_failures": 0}
+
+    def start(self):
+        if self.task and not self.task.done():
+            return
+        self.buffer = asyncio.Queue(maxsize=CELERY_ENQUEUE_BUFFER_SIZE)
+        # Set after the fork, uvicorn workers start here
+        self.spool_path = spool_path_for(os.getpid())
+        # Tasks spooled by earlier processes are replayed too
+        self._adopt_orphaned_spools()
+        self._spool_pending = self._spool_size()
+        self.task = asyncio.create_task(self._run())
+        Logger.info("Started Celery enqueue flusher")
+
+    async def stop(self):
+        """Send (or spool) whatever is still buffered, called on shutdown"""
+        if not self.task:
+            return
+        self.task.cancel()
+        await asyncio.wait([self.task], timeout=5)
+        self.task = None
+        pending = self._drain(limit=None)
+        if pending:
+            await self._send_or_spool(pending)
+        self.buffer = None
+
+    def enqueue(self, task_name: str, kwargs: dict):
+        """Queue a Celery task without touching the broker; safe to call on the event loop"""
+        self.counters["enqueued"] += 1
+        if self.buffer is None:
+            # Not running in the API process (worker, scripts): a direct send is fine there
+            celery_app.send_task(task_name, kwargs=kwargs)
+            self.counters["sent"] += 1
+            return
+        try:
+            self.buffer.put_nowait((task_name, kwargs, time.monotonic(), get_current_request_id()))
+        except asyncio.QueueFull:
+            # Never drop an email: overflow goes straight to the spool, written off the event loop
+            create_background_task(self._spool_overflow([(task_name, kwargs, time.monotonic(), get_current_request_id())]))
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            **self.counters,
+            "buffered": self.buffer.qsize() if self.buffer else 0,
+            "spool_pending": self._spool_pending,
+            "latency_ms_p50": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "latency_ms_p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+        }
+
+    async def _run(self):
+        failures = 0
+        try:
+            while True:
+                try:
+                    await self._flush_once()
+                    failures = 0
+                except Exception as e:
+                    # Whatever went wrong, the flusher must keep running or every later task is spooled forever
+                    failures += 1
+                    backoff = min(2 ** failures, FLUSHER_MAX_BACKOFF_SECONDS)
+                    Logger.error(f"Celery enqueue flusher failed, retrying in {backoff}s: {e!r}")
+                    await asyncio.sleep(backoff)
+        except asyncio.CancelledError:
+            pass
+
+    async def _flush_once(self):
+        try:
+            first = await asyncio.wait_for(self.buffer.get(), timeout=CELERY_SPOOL_RETRY_SECONDS)
+        except asyncio.TimeoutError:
+            await self._maybe_replay_spool()
+            return
+        batch = [first] + self._drain(limit=CELERY_ENQUEUE_BATCH_SIZE - 1)
+        await self._send_or_spool(batch)
+        if self.buffer.empty():
+            await self._maybe_replay_spool()
+
+    def _drain(self, limit: Optional[int]) -> List[PendingTask]:
+        batch = []
+        while self.buffer is not None and not self.buffer.empty() and (limit is None or len(batch) < limit):
+            batch.append(self.buffer.get_nowait())
+        return batch
+
+    async def _send_or_spool(self, batch: List[PendingTask]) -> bool:
+        loop = asyncio.get_running_loop()
+        if self._in_flight is not None and not self._in_flight.done():
+            # A timed out send is still hanging on the broker, don't queue more sends behind it
+            await loop.run_in_executor(None, self._spool, batch)
+            return False
+        try:
+            self._in_flight = self._executor.submit(self._send_batch, batch)
+            await asyncio.wait_for(asyncio.wrap_future(self._in_flight), timeout=CELERY_ENQUEUE_TIMEOUT_SECONDS)
+        except Exception as e:
+            self.counters["send_failures"] += 1
+            Logger.warning(f"Celery broker unavailable, spooling {len(batch)} task(s): {e!r}")
+            await loop.run_in_executor(None, self._spool, batch)
+            return False
+
+        now = time.monotonic()
+        for _, _, enqueued_at, _ in batch:
+            self._latencies.append(now - enqueued_at)
+            CELERY_ENQUEUE_LATENCY.observe(now - enqueued_at)
+        self.counters["sent"] += len(batch)
+        return True
+
+    @staticmethod
+    def _send_batch(batch: List[PendingTask]):
+        """Runs in the enqueue thread, one broker connection for the whole batch"""
+        with celery_app.producer_or_acquire() as producer:
+            for task_name, kwargs, _, request_id in batch:
+                # The flusher runs outside the request's context, carry its id explicitly
+                headers = {"request_id": request_id} if request_id else None
+                celery_app.send_task(task_name, kwargs=kwargs, producer=producer, retry=False, headers=headers)
+
+    # ================= SPOOL =================
+
+    def _spool(self, batch: List[PendingTask]):
+        if not batch:
+            return
+        with self._spool_lock, open(self.spool_path, "a", encoding="utf-8") as spool:
+            for task_name, kwargs, _, request_id in batch:
+                spool.write(json.dumps({"task": task_name, "kwargs": kwargs, "request_id": request_id}) + "\n")
+        self.counters["spooled"] += len(batch)
+        self._spool_pending += len(batch)
+
+    async def _spool_overflow(self, batch: List[PendingTask]):
+        try:
+            await asyncio.to_thread(self._spool, batch)
+        except Exception as e:
+            Logger.error(f"Could not spool {len(batch)} overflowing Celery task(s): {e!r}")
+
+    def _spool_size(self) -> int:
+        try:
+            with open(self.spool_path, encoding="utf-8") as spool:
+                return sum(1 for _ in spool)
+        except FileNotFoundError:
+            return 0
+
+    def _adopt_orphaned_spools(self):
+        """Move the spools of processes that are gone into this process's spool"""
+        directory = os.path.dirname(self.spool_path) or "."
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            match = _SPOOL_NAME.match(name)
+            if not match or int(match.group(1)) == os.getpid() or _pid_alive(int(match.group(1))):
+                continue
+            adopting = f"{self.spool_path}.adopting"
+            try:
+                # Atomic: when several workers start at once only one of them gets the file
+                os.replace(os.path.join(directory, name), adopting)
+            except FileNotFoundError:
+                continue
+            with self._spool_lock, open(adopting, encoding="utf-8") as orphan, open(self.spool_path, "a", encoding="utf-8") as spool:
+                spool.writelines(line if line.endswith("\n") else line + "\n" for line in orphan if line.strip())
+            os.remove(adopting)
+            Logger.info(f"Adopted Celery spool {name} of a stopped process")
+
+    def _take_spool(self) -> List[dict]:
+        """Read and remove the spool; tasks spooled meanwhile go to a fresh file"""
+        replaying = f"{self.spool_path}.replaying"
+        with self._spool_lock:
+            try:
+                os.replace(self.spool_path, replaying)
+            except FileNotFoundError:
+                return []
+            self._spool_pending = 0
+
+        entries = []
+        with open(replaying, encoding="utf-8") as spool:
+            for number, line in enumerate(spool, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                if not isinstance(entry, dict) or "task" not in entry or "kwargs" not in entry:
+                    # A line torn by a crash mid-write; skip it rather than lose the whole spool
+                    Logger.error(f"Skipping unreadable line {number} of the Celery spool: {line[:200]!r}")
+                    continue
+                entries.append(entry)
+        os.remove(replaying)
+        return entries
+
+    async def _maybe_replay_spool(self):
+        """Re-send spooled tasks, at most every CELERY_SPOOL_RETRY_SECONDS"""
+        if time.monotonic() - self._last_replay < CELERY_SPOOL_RETRY_SECONDS or not os.path.exists(self.spool_path):
+            return
+        self._last_replay = time.monotonic()
+
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(None, self._take_spool)
+        now = time.monotonic()
+        pending = [(entry["task"], entry["kwargs"], now, entry.get("request_id")) for entry in entries]
+        for start in range(0, len(pending), CELERY_ENQUEUE_BATCH_SIZE):
+            batch = pending[start:start + CELERY_ENQUEUE_BATCH_SIZE]
+            if not await self._send_or_spool(batch):
+                # Broker still down, the failed batch was spooled again; keep the rest as well
+                await loop.run_in_executor(
+                    None, self._spool, pending[start + CELERY_ENQUEUE_BATCH_SIZE:]
+                )
+                return
+            self.counters["replayed"] += len(batch)
+        if pending:
+            Logger.info(f"Replayed {len(pending)} spooled Celery task(s)")
+
+
+celery_enqueuer = CeleryEnqueuer()
+
+CELERY_ENQUEUE_PENDING.set_function(lambda: {
+    ("buffer",): celery_enqueuer.buffer.qsize() if celery_enqueuer.buffer else 0,
+    ("spool",): celery_enqueuer._spool_pending,
+})
+CELERY_ENQUEUE_TASKS.set_function(lambda: {
+    (outcome,): count for outcome, count in celery_enqueuer.counters.items()
+})
@@ -1,3 +1,5 @@
-from app.tasks.email_task import send_email_task
+from app.tasks.email_task import send_email_task, send_template_email_task
+from app.tasks.digest_task import flush_notification_digests_task
+from app.tasks.error_summary_task import flush_error_summaries_task
 
-__all__ = ["send_email_task"]
\ No newline at end of file
+__all__ = ["send_email_task", "send_template_email_task", "flush_notification_digests_task", "flush_error_summaries_task"]
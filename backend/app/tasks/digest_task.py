@@ -0,0 +1,32 @@
+from app.core.celery_app import celery_app
+from app.services.notification_digest import notification_digest
+from app.tasks.email_task import send_template_email_task
+from app.common.email_render import digest_email
+from app.common.logging import get_logger
+
+Logger = get_logger(__name__)
+
+
+@celery_app.task(name="flush_notification_digests_task")
+def flush_notification_digests_task():
+    """
+    Send one email per recipient whose digest window has closed.
+    Runs on the beat schedule every NOTIFICATION_DIGEST_FLUSH_SECONDS.
+    A digest is dropped from Redis only once its email task is on the broker;
+    one that fails to enqueue is sent again by a later run.
+    """
+    sent = notifications = 0
+    for processing_key, email, items in notification_digest.take_abandoned() + notification_digest.take_due():
+        try:
+            if items:
+                template, context = digest_email(items)
+                send_template_email_task.delay(template=template, context=context, to_email=[email])
+                sent += 1
+                notifications += len(items)
+            notification_digest.ack(processing_key)
+        except Exception as e:
+            Logger.error(f"Could not enqueue the notification digest for {email}, it will be retried: {e}")
+
+    if sent:
+        Logger.info(f"Flushed notification digests: {notifications} notification(s) in {sent} email(s)")
+    return sent
@@ -1,8 +1,21 @@
+from celery.signals import worker_process_shutdown
 from app.core.celery_app import celery_app
-from app.services.email_service import send_email
+from app.services.email_service import send_email, smtp_pool
+from app.common.email_render import render_email
 
 
 
 @celery_app.task(name="send_email_task",max_retries=5)
 def send_email_task(subject:str,body:str,to_email:list[str]):
-    return send_email(subject,body,to_email)
\ No newline at end of file
+    return send_email(subject,body,to_email)
+
+@celery_app.task(name="send_template_email_task",max_retries=5)
+def send_template_email_task(template:str,context:dict,to_email:list[str]):
+    # Rendered here rather than in the request, only the small context travels through the broker
+    subject, body = render_email(template, context)
+    return send_email(subject,body,to_email)
+
+@worker_process_shutdown.connect
+def close_smtp_connections(**kwargs):
+    # Log out of pooled SMTP sessions instead of dropping them on exit
+    smtp_pool.clear()
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+from app.core.celery_app import celery_app
+from app.services.error_throttle import error_email_throttle
+from app.tasks.email_task import send_template_email_task
+from app.common.logging import get_logger
+
+Logger = get_logger(__name__)
+
+
+@celery_app.task(name="flush_error_summaries_task")
+def flush_error_summaries_task():
+    """
+    Mail one summary per error fingerprint whose window closed with repeats.
+    Runs on the beat schedule every ERROR_EMAIL_FLUSH_SECONDS.
+    """
+    summaries = error_email_throttle.take_due()
+    for summary in summaries:
+        context = {
+            **summary["context"],
+            "occurrences": {
+                "count": summary["count"],
+                "first_seen": datetime.fromtimestamp(summary["first_seen"], tz=timezone.utc).isoformat(),
+                "last_seen": datetime.fromtimestamp(summary["last_seen"], tz=timezone.utc).isoformat(),
+            },
+        }
+        # Rendered by the worker; route_task sends error_notification to the errors queue
+        send_template_email_task.delay(template="error_notification", context=context, to_email=summary["recipients"])
+
+    if summaries:
+        Logger.info(f"Sent {len(summaries)} error summary email(s) for {sum(s['count'] for s in summaries)} repeated error(s)")
+    return len(summaries)
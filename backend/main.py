@@ -1,5 +1,7 @@
+import asyncio
 import sqlalchemy.exc
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -12,6 +14,17 @@ from app.common.exception_handler import (
 )
 from app.common.errors import UserErrors, ClientErrors, DatabaseErrors
 from app.db.connection import engine
+from app.core.websocket_manager import manager
+from app.core.conf import OUTBOX_RELAY_ENABLED
+from app.services.outbox import outbox_relay
+from app.services.task_enqueuer import celery_enqueuer
+from app.services.queue_metrics import celery_queue_stats
+from app.services.slow_query_log import slow_query_log
+from app.common.logging import log_pipeline
+from app.core.middleware import RequestContextMiddleware
+from app.core.profiler import ProfilingMiddleware
+from app.core.tracing import TracedJSONResponse, tracer
+from app.core import metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,8 +32,22 @@ async def lifespan(app: FastAPI):
     Lifespan context manager for FastAPI app.
     Handles startup and shutdown events to properly manage database connections.
     """
-    # Startup
+    # Startup - deliver outbox rows (Redis events, Celery tasks) committed by requests
+    if OUTBOX_RELAY_ENABLED:
+        outbox_relay.start()
+    # Startup - flush Celery tasks enqueued by request handlers off the event loop
+    celery_enqueuer.start()
+    # Startup - capture EXPLAIN plans of slow queries in the background
+    slow_query_log.start()
     yield
+    # Shutdown - close WebSockets and stop their Redis listener/heartbeat tasks
+    await manager.shutdown()
+    # Shutdown - stop the outbox relay after a last flush
+    await outbox_relay.stop()
+    # Shutdown - send or spool tasks still in the enqueue buffer
+    await celery_enqueuer.stop()
+    # Shutdown - stop plan capture and close its connections
+    await slow_query_log.stop()
     # Shutdown - properly dispose of database engine connections
     await engine.dispose()
 
@@ -28,9 +55,13 @@ app = FastAPI(
     title=APP_NAME,
     version=APP_VERSION,
     debug=DEBUG,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=TracedJSONResponse
 )
 
+# Sampling profiler for single requests; inside RequestContextMiddleware, it needs the request id
+app.add_middleware(ProfilingMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -51,8 +82,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Request-ID", "Server-Timing", "X-DB-Query-Count", "X-DB-Time", "X-Profiled"],
 )
 
+# Request id and stage timings; added last so it wraps everything, CORS included
+app.add_middleware(RequestContextMiddleware)
+
 # Register exception handlers
 # Register specific exception types first (more specific to less specific)
 app.add_exception_handler(HTTPException, http_exception_handler)
@@ -95,7 +130,11 @@ async def health():
         }
         return {
             "status": "healthy",
-            "database_pool": pool_status
+            "database_pool": pool_status,
+            "celery_enqueue": celery_enqueuer.stats(),
+            "celery_queues": await asyncio.to_thread(celery_queue_stats),
+            "logging": log_pipeline.stats(),
+            "tracing": tracer.stats()
         }
     except Exception as e:
         return {
@@ -103,3 +142,9 @@ async def health():
             "error": str(e)
         }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    # Queue depth and lag are read from the broker, off the event loop
+    await asyncio.to_thread(celery_queue_stats)
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
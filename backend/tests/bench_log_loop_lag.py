@@ -0,0 +1,134 @@
+"""
+Event-loop lag under a logging burst, with and without the log pipeline.
+
+100 concurrent "requests" log 200 INFO lines each while a ticker measures
+how late its 1ms sleeps wake up. The handlers are the production ones: a
+JSON file that rotates and gzips every ROTATE_BYTES, and a console stream.
+The console write takes CONSOLE_DELAY_MS, like a slow terminal or a
+container log pipe that is full.
+
+- "direct": the handlers sit on the logger, so every log call blocks the
+  loop on its I/O, including rotation and gzip.
+- "pipeline": the logger only has the QueueHandler of a LogPipeline. The
+  I/O runs on the listener thread. Records that don't fit in
+  LOG_QUEUE_SIZE are dropped and counted.
+
+    python -m tests.bench_log_loop_lag [console_delay_ms]
+
+Not collected by pytest.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app.common.logging.pipeline import LogPipeline
+from app.common.logging.structured import JsonFormatter, rotating_file_handler
+from app.core.conf import LOG_QUEUE_SIZE
+
+REQUESTS = 100
+LINES_PER_REQUEST = 200
+ROTATE_BYTES = 1024 * 1024
+CONSOLE_DELAY_MS = 0.05
+TICK_SECONDS = 0.001
+
+
+class SlowStream:
+    """Console stream whose writes take a fixed time"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, text: str):
+        time.sleep(self.delay)
+
+    def flush(self):
+        pass
+
+
+def _handlers(directory: str, console_delay: float) -> list:
+    formatter = JsonFormatter()
+    file_handler = rotating_file_handler(os.path.join(directory, "app.log"), ROTATE_BYTES, None, 3)
+    console_handler = logging.StreamHandler(SlowStream(console_delay))
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, console_handler]
+
+
+async def _ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+
+async def _request(logger: logging.Logger, n: int):
+    for line in range(LINES_PER_REQUEST):
+        logger.info("Handled step %s of request %s", line, n, extra={"user_id": n, "project_id": 7})
+        await asyncio.sleep(0)
+
+
+async def measure(mode: str, console_delay: float) -> dict:
+    logger = logging.getLogger(f"bench.{mode}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as directory:
+        handlers = _handlers(directory, console_delay)
+        pipeline = None
+        if mode == "pipeline":
+            pipeline = LogPipeline(LOG_QUEUE_SIZE)
+            pipeline.configure(*handlers)
+            logger.addHandler(pipeline.queue_handler)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+
+        lags, stop = [], asyncio.Event()
+        ticker = asyncio.create_task(_ticker(lags, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(_request(logger, n) for n in range(REQUESTS)))
+        burst_seconds = time.perf_counter() - started
+        stop.set()
+        await ticker
+
+        dropped = 0
+        if pipeline:
+            # Waits for the listener to write out what is still queued
+            pipeline.stop()
+            dropped = sum(pipeline.dropped.values())
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+        for handler in handlers:
+            handler.close()
+
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    return {
+        "mode": mode,
+        "burst_ms": burst_seconds * 1000,
+        "p50": statistics.median(lags_ms),
+        "p99": lags_ms[int(len(lags_ms) * 0.99) - 1],
+        "max": lags_ms[-1],
+        "dropped": dropped,
+    }
+
+
+async def main(console_delay_ms: float):
+    records = REQUESTS * LINES_PER_REQUEST
+    print(f"{records} records, console write {console_delay_ms}ms, queue {LOG_QUEUE_SIZE}")
+    print(f"{'mode':>9}  {'burst':>9}  {'lag p50':>8}  {'lag p99':>8}  {'lag max':>8}  {'dropped':>7}")
+    for mode in ("direct", "pipeline"):
+        result = await measure(mode, console_delay_ms / 1000)
+        print(
+            f"{result['mode']:>9}  {result['burst_ms']:>7.0f}ms  {result['p50']:>6.2f}ms  "
+            f"{result['p99']:>6.2f}ms  {result['max']:>6.2f}ms  {result['dropped']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else CONSOLE_DELAY_MS))
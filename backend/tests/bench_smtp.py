@@ -0,0 +1,130 @@
+"""
+Pooled vs per-message SMTP connections against a local aiosmtpd sink.
+
+The sink requires STARTTLS (self-signed certificate) and AUTH like a real
+provider, so every new connection pays the same handshake send_email pays in
+production: connect, EHLO, STARTTLS, EHLO, AUTH. "per-message" runs send_email
+with a pool of size 0, which closes each connection after its message;
+"pooled" uses a pool of SMTP_POOL_SIZE. Loopback has no network latency, so
+the gap here is the lower bound; each round trip to a remote provider widens it.
+
+    pip install aiosmtpd
+    python -m tests.bench_smtp [messages]
+
+Not collected by pytest.
+"""
+import datetime
+import logging
+import os
+import socket
+import ssl
+import sys
+import tempfile
+import time
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+except ImportError:
+    sys.exit("aiosmtpd is required: pip install aiosmtpd")
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+PORT = _free_port()
+# Settings are read once at import time (app.core.conf)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+os.environ["EMAIL_HOST"] = "127.0.0.1"
+os.environ["EMAIL_PORT"] = str(PORT)
+os.environ["EMAIL_HOST_USER"] = "bench@example.com"
+os.environ["EMAIL_HOST_PASSWORD"] = "bench"
+
+from app.core.conf import SMTP_POOL_SIZE
+from app.services import email_service
+from app.services.email_service import SmtpConnectionPool, send_email
+
+MESSAGES = 200
+# aiosmtpd logs a deprecation warning about its own internals on every AUTH
+logging.getLogger("mail.log").setLevel(logging.ERROR)
+
+
+class CountingSink:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+def _tls_context(directory: str) -> ssl.SSLContext:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as cert_file:
+        cert_file.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as key_file:
+        key_file.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def run(label: str, pool: SmtpConnectionPool, messages: int) -> float:
+    email_service.smtp_pool = pool
+    started = time.perf_counter()
+    for n in range(messages):
+        send_email(f"Benchmark {n}", "<p>Digest</p>", ["dev@example.com"])
+    elapsed = time.perf_counter() - started
+    pool.clear()
+    print(f"{label:>12}  {messages / elapsed:>8.0f} msg/s  {elapsed / messages * 1000:>6.2f} ms/msg")
+    return elapsed
+
+
+def main(messages: int):
+    sink = CountingSink()
+    with tempfile.TemporaryDirectory() as directory:
+        controller = Controller(
+            sink,
+            hostname="127.0.0.1",
+            port=PORT,
+            tls_context=_tls_context(directory),
+            require_starttls=True,
+            authenticator=lambda *args: AuthResult(success=True),
+            auth_require_tls=True,
+        )
+        controller.start()
+        try:
+            per_message = run("per-message", SmtpConnectionPool(max_size=0), messages)
+            pooled = run("pooled", SmtpConnectionPool(max_size=SMTP_POOL_SIZE), messages)
+        finally:
+            controller.stop()
+
+    assert sink.received == 2 * messages, sink.received
+    print(f"pooled is {per_message / pooled:.1f}x faster over {messages} messages")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES)
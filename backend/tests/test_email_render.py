@@ -0,0 +1,24 @@
+from app.common.email_render import format_timestamp, render_email
+
+
+def test_timestamps_are_formatted_in_utc():
+    assert format_timestamp("2026-10-19T14:05:00+00:00") == "October 19, 2026 at 02:05 PM UTC"
+    assert format_timestamp("2026-10-19T16:05:00+02:00") == "October 19, 2026 at 02:05 PM UTC"
+    # Enqueued before the context carried ISO timestamps
+    assert format_timestamp("October 19, 2026 at 02:05 PM") == "October 19, 2026 at 02:05 PM"
+
+
+def test_status_update_renders_the_update_time():
+    context = {
+        "issue_name": "Login fails", "issue_code": "WEB-1", "description": None, "priority": "high",
+        "type": "bug", "project_name": "Website", "sprint_name": "Sprint 1",
+        "old_status": "todo", "new_status": "in_progress",
+        "assignee_name": "Ada", "reporter_name": "Grace",
+        "updated_by_name": "Linus", "updated_by_email": "linus@example.com",
+        "updated_at": "2026-10-19T14:05:00.123456+00:00",
+    }
+
+    subject, body = render_email("issue_status_update", context)
+
+    assert subject == "Issue Status Updated: Login fails"
+    assert "October 19, 2026 at 02:05 PM UTC" in body
@@ -0,0 +1,92 @@
+import smtplib
+import time
+
+import pytest
+
+from app.services import email_service
+from app.services.email_service import SmtpConnectionPool, SmtpDeliveryUnknown, send_email
+
+
+class FakeSmtp:
+    """Logged-in SMTP connection that can drop at a given command"""
+
+    def __init__(self, opened: list, drop_at: str = None):
+        self.drop_at = drop_at
+        self.commands = []
+        opened.append(self)
+
+    def _command(self, name: str, reply=(250, b"OK")):
+        self.commands.append(name)
+        if name == self.drop_at:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return reply
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender):
+        return self._command("mail")
+
+    def rcpt(self, recipient):
+        return self._command("rcpt")
+
+    def data(self, payload):
+        return self._command("data")
+
+    def rset(self):
+        return self._command("rset")
+
+    def noop(self):
+        return self._command("noop")
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Connections opened by send_email, the first one drops where the test says"""
+    pool = SmtpConnectionPool(max_size=1)
+    monkeypatch.setattr(email_service, "smtp_pool", pool)
+    opened = []
+
+    def open_with(drop_at=None):
+        drops = [drop_at]
+        monkeypatch.setattr(pool, "_open", lambda: FakeSmtp(opened, drops.pop() if drops else None))
+        return opened
+
+    return open_with
+
+
+def test_connection_lost_before_data_is_retried(connections):
+    opened = connections(drop_at="mail")
+
+    send_email("Hello", "<p>Hi</p>", ["dev@example.com"])
+
+    assert [server.commands for server in opened] == [["mail"], ["mail", "rcpt", "data"]]
+
+
+def test_connection_lost_during_data_is_not_retried(connections):
+    opened = connections(drop_at="data")
+
+    with pytest.raises(SmtpDeliveryUnknown):
+        send_email("Hello", "<p>Hi</p>", ["dev@example.com"])
+
+    # The server may already have queued the message, a resend could duplicate it
+    assert [server.commands for server in opened] == [["mail", "rcpt", "data"]]
+
+
+def test_retry_skips_the_other_stale_pooled_connections(connections):
+    opened = connections()
+    # The server restarted: both pooled connections are dead but were used recently, so no NOOP
+    stale = [FakeSmtp([], drop_at="mail"), FakeSmtp([], drop_at="mail")]
+    email_service.smtp_pool.max_size = 2
+    email_service.smtp_pool._idle = [(server, time.monotonic()) for server in stale]
+
+    send_email("Hello", "<p>Hi</p>", ["dev@example.com"])
+
+    assert [server.commands for server in stale] == [[], ["mail"]]
+    assert [server.commands for server in opened] == [["mail", "rcpt", "data"]]
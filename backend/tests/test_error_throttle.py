@@ -0,0 +1,53 @@
+import pytest
+
+from app.common.email_render import render_email
+from app.core.celery_app import PRIORITY_NORMAL, QUEUE_ERRORS, route_task
+from app.services import error_throttle
+from app.services.error_throttle import PENDING_KEY, ErrorEmailThrottle
+from app.tasks import error_summary_task
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis(fake_redis):
+    return fake_redis(error_throttle)
+
+
+async def test_repeats_are_counted_without_moving_the_window(redis):
+    throttle = ErrorEmailThrottle()
+    context, recipients = {"error_type": "KeyError"}, ["ops@example.com"]
+
+    assert await throttle.should_send("abc", context, recipients) is True
+    window_end = redis.zscore(PENDING_KEY, "abc")
+    assert await throttle.should_send("abc", context, recipients) is False
+    assert await throttle.should_send("abc", context, recipients) is False
+
+    assert redis.zscore(PENDING_KEY, "abc") == window_end
+    (summary,) = throttle.take_due(now=window_end + 1)
+    assert (summary["fingerprint"], summary["count"], summary["recipients"]) == ("abc", 2, recipients)
+
+
+async def test_summaries_are_enqueued_as_templates(redis, monkeypatch):
+    throttle = ErrorEmailThrottle()
+    context = {
+        "error_type": "KeyError", "error_message": "'id'", "uri": "/api/v1/issue/1", "method": "get",
+        "log_level": "ERROR", "traceback": "Traceback ...", "environment": "production",
+        "request_id": "req-1", "request_data": None, "generated_at": "2026-10-19T14:05:00+00:00",
+    }
+    for _ in range(3):
+        await throttle.should_send("abc", context, ["ops@example.com"])
+    redis.zadd(PENDING_KEY, {"abc": 0})
+    enqueued = []
+    monkeypatch.setattr(error_summary_task.send_template_email_task, "delay", lambda **kwargs: enqueued.append(kwargs))
+
+    assert error_summary_task.flush_error_summaries_task() == 1
+
+    (call,) = enqueued
+    assert call["template"] == "error_notification"
+    assert call["context"]["occurrences"]["count"] == 2
+    # Routed like any error notification, rendered in the worker
+    assert route_task("send_template_email_task", (), call, {}) == {"queue": QUEUE_ERRORS, "priority": PRIORITY_NORMAL}
+    subject, body = render_email(call["template"], call["context"])
+    assert subject.endswith("ERROR Error: KeyError - PRODUCTION (repeated 2x)")
+    assert "2026-10-19 14:05:00 UTC" in body
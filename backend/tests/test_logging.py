@@ -0,0 +1,41 @@
+import json
+import os
+
+from app.common.logging import logging_config, log_pipeline
+
+
+def test_forked_workers_write_their_own_log_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(logging_config, "LOGS_DIR", tmp_path)
+    log_pipeline.configure(*logging_config._build_handlers())
+    logger = logging_config.get_logger("tests.logging")
+    try:
+        pid = os.fork()
+        if pid == 0:
+            # Prefork worker: the at-fork hook has already switched it to app.<pid>.log
+            logger.warning("from the child")
+            log_pipeline.stop()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        logger.warning("from the parent")
+        log_pipeline.stop()
+    finally:
+        test_handlers = log_pipeline.handlers
+        monkeypatch.undo()
+        log_pipeline.configure(*logging_config._build_handlers())
+        for handler in test_handlers:
+            handler.close()
+
+    def messages(pid):
+        with open(tmp_path / f"app.{pid}.log", encoding="utf-8") as log_file:
+            return [json.loads(line)["message"] for line in log_file]
+
+    assert messages(pid) == ["from the child"]
+    assert messages(os.getpid()) == ["from the parent"]
+
+
+def test_log_levels_apply_to_module_loggers(monkeypatch):
+    monkeypatch.setattr(logging_config, "LOGGER_LEVELS", {"app.services": "ERROR", "app.services.outbox": "DEBUG"})
+
+    assert logging_config.level_for("app.services.presence_service") == "ERROR"
+    assert logging_config.level_for("app.services.outbox") == "DEBUG"
+    assert logging_config.level_for("app.api.v1.issue") == logging_config.LOG_LEVEL
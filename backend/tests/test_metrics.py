@@ -0,0 +1,27 @@
+from app.core.metrics import registry
+from app.services import queue_metrics
+from app.services.queue_metrics import celery_queue_stats
+from app.services.task_enqueuer import celery_enqueuer
+
+
+def test_enqueuer_state_is_exported(monkeypatch):
+    monkeypatch.setattr(celery_enqueuer, "_spool_pending", 3)
+    monkeypatch.setitem(celery_enqueuer.counters, "spooled", 5)
+
+    text = registry.render()
+
+    assert 'celery_enqueue_pending{where="spool"} 3' in text
+    assert 'celery_enqueue_tasks_total{outcome="spooled"} 5' in text
+    assert "# TYPE celery_enqueue_tasks_total counter" in text
+
+
+def test_queue_depth_and_lag_are_exported_after_a_read(monkeypatch):
+    monkeypatch.setattr(queue_metrics, "_latest", {})
+    monkeypatch.setattr(queue_metrics, "_read_queue_stats", lambda: {"errors": {"depth": 4, "lag_seconds": 12.5}})
+    assert "celery_queue_depth{" not in registry.render()
+
+    celery_queue_stats()
+
+    text = registry.render()
+    assert 'celery_queue_depth{queue="errors"} 4' in text
+    assert 'celery_queue_lag_seconds{queue="errors"} 12.5' in text
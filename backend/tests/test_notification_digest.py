@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from app.common.email_render import render_email
+from app.core.conf import NOTIFICATION_DIGEST_WINDOW_SECONDS
+from app.services import notification_digest as digest
+from app.services.notification_digest import PENDING_KEY, PROCESSING_KEY, notification_digest
+from app.tasks import digest_task
+from app.tasks.digest_task import flush_notification_digests_task
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis(fake_redis):
+    return fake_redis(digest)
+
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    calls = []
+    monkeypatch.setattr(digest_task.send_template_email_task, "delay", lambda **kwargs: calls.append(kwargs))
+    return calls
+
+
+def _item(n: int) -> dict:
+    return {
+        "template": "issue_assigned",
+        "context": {"issue_name": f"Issue {n}"},
+        "summary": f"Issue {n} was assigned to you",
+        "link": f"https://example.com/issues/{n}",
+        "at": "2026-10-19 10:00 UTC",
+    }
+
+
+async def _due_digest(redis, *items):
+    await notification_digest.add_many([{"recipients": [["dev@example.com", "Dev"]], "item": item} for item in items])
+    # Open the window as if the first item came in before it
+    redis.zadd(PENDING_KEY, {"dev@example.com": time.time() - NOTIFICATION_DIGEST_WINDOW_SECONDS - 1})
+
+
+async def test_flush_enqueues_the_template_not_rendered_html(redis, enqueued):
+    await _due_digest(redis, _item(1), _item(2))
+
+    assert flush_notification_digests_task() == 1
+
+    (call,) = enqueued
+    assert call["template"] == "notification_digest"
+    assert [item["summary"] for item in call["context"]["items"]] == [
+        "Issue 1 was assigned to you", "Issue 2 was assigned to you",
+    ]
+    assert call["to_email"] == ["dev@example.com"]
+    # Rendered by send_template_email_task in the worker
+    subject, body = render_email(call["template"], call["context"])
+    assert subject == "2 updates on your issues"
+    assert "Hello Dev," in body
+    # Acknowledged: nothing is left in Redis
+    assert redis.keys("digest:*") == []
+
+
+async def test_a_single_notification_is_sent_with_its_own_template(redis, enqueued):
+    await _due_digest(redis, _item(1))
+
+    flush_notification_digests_task()
+
+    assert [(call["template"], call["context"]) for call in enqueued] == [("issue_assigned", {"issue_name": "Issue 1"})]
+
+
+async def test_digest_survives_a_failed_enqueue(redis, monkeypatch):
+    await _due_digest(redis, _item(1), _item(2))
+
+    def broker_down(**kwargs):
+        raise ConnectionError("broker unreachable")
+
+    monkeypatch.setattr(digest_task.send_template_email_task, "delay", broker_down)
+    assert flush_notification_digests_task() == 0
+    (processing_key,) = redis.zrange(PROCESSING_KEY, 0, -1)
+    assert redis.llen(processing_key) == 2
+
+    # Claimed by the failed run, so not resent before the claim expires
+    sent = []
+    monkeypatch.setattr(digest_task.send_template_email_task, "delay", lambda **kwargs: sent.append(kwargs))
+    flush_notification_digests_task()
+    assert sent == []
+
+    redis.delete(f"{processing_key}:claim")
+    assert flush_notification_digests_task() == 1
+    assert len(sent[0]["context"]["items"]) == 2
+    assert redis.keys("digest:*") == []
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app.common.logging.request import set_request_id, remove_request_id_from_pool
+from app.db.connection import engine
+from app.db.crud.outbox_crud import add_outbox_event
+from app.models.model import OutboxEvent
+from app.services import outbox
+from app.services.outbox import (
+    OUTBOX_REDIS,
+    OUTBOX_CELERY,
+    OUTBOX_DIGEST,
+    OutboxRelay,
+    stage_redis_event,
+    stage_celery_task,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingSession:
+    """Stands in for an AsyncSession where only add() is used"""
+
+    def __init__(self):
+        self.added = []
+
+    def add(self, row):
+        self.added.append(row)
+
+
+def test_staged_rows_carry_the_request_id():
+    session = RecordingSession()
+    token = set_request_id("req-outbox-1")
+    try:
+        stage_redis_event(session, ["project:1:updates"], {"type": "issue_created"})
+        stage_celery_task(session, "send_template_email_task", {"template": "invite"})
+    finally:
+        remove_request_id_from_pool(token)
+
+    redis_row, celery_row = session.added
+    assert redis_row.topic == OUTBOX_REDIS
+    assert redis_row.payload["channels"] == ["project:1:updates"]
+    assert redis_row.payload["trace"]["request_id"] == "req-outbox-1"
+    assert celery_row.topic == OUTBOX_CELERY
+    assert celery_row.payload["request_id"] == "req-outbox-1"
+
+
+async def _outbox_rows(db):
+    db.expire_all()
+    return list((await db.execute(select(OutboxEvent).order_by(OutboxEvent.id))).scalars().all())
+
+
+async def test_create_and_update_issue_stage_outbox_rows(client, db, seed):
+    project, employee = seed["project"], seed["employee"]
+
+    response = await client.post("/api/v1/issue/", headers=seed["manager_headers"], json={
+        "name": "Checkout button",
+        "story_point": 3,
+        "status": "todo",
+        "type": "task",
+        "priority": "high",
+        "assigned_to": employee.id,
+        "project_id": project.id,
+        "time_estimate": 2,
+    })
+    assert response.status_code == 200, response.text
+    issue_id = response.json()["data"]["id"]
+    request_id = response.headers["X-Request-ID"]
+
+    rows = await _outbox_rows(db)
+    created = [row for row in rows if row.topic == OUTBOX_REDIS]
+    assert len(created) == 1
+    assert created[0].payload["message"]["type"] == "issue_created"
+    assert created[0].payload["trace"]["request_id"] == request_id
+    # Assignment notification, committed with the issue
+    assert [row.topic for row in rows if row.topic != OUTBOX_REDIS] == [OUTBOX_DIGEST]
+
+    response = await client.put(f"/api/v1/issue/{issue_id}", headers=seed["manager_headers"], json={"status": "in_progress"})
+    assert response.status_code == 200, response.text
+
+    rows = await _outbox_rows(db)
+    updated = [row for row in rows if row.topic == OUTBOX_REDIS and row.payload["message"]["type"] == "issue_updated"]
+    assert len(updated) == 1
+    assert updated[0].payload["trace"]["request_id"] == response.headers["X-Request-ID"]
+    assert len([row for row in rows if row.topic == OUTBOX_DIGEST]) == 2
+
+
+@pytest.fixture
+async def pending(db):
+    """One committed Redis row and one Celery row"""
+    add_outbox_event(db, OUTBOX_REDIS, {"channels": ["project:1:updates"], "message": {"type": "issue_created"}})
+    add_outbox_event(db, OUTBOX_CELERY, {"task": "send_template_email_task", "kwargs": {}})
+    await db.commit()
+
+
+async def _delivered(event_ids, error=None):
+    return event_ids, error
+
+
+async def test_relay_delivers_with_no_transaction_open(db, pending, monkeypatch):
+    seen = {}
+
+    async def deliver_redis(events):
+        # The lease is committed and visible, and no pool connection is held during the send
+        seen["leased"] = [row.locked_until is not None for row in await _outbox_rows(db)]
+        seen["checked_out"] = engine.pool.checkedout()
+        return await _delivered([event.id for event in events])
+
+    monkeypatch.setattr(OutboxRelay, "_deliver_redis", staticmethod(deliver_redis))
+    monkeypatch.setattr(OutboxRelay, "_deliver_celery", staticmethod(lambda events: _delivered([e.id for e in events])))
+
+    assert await OutboxRelay().relay_batch() == 2
+    # Only the test's own session holds a connection
+    assert seen == {"leased": [True, True], "checked_out": 1}
+    assert await _outbox_rows(db) == []
+
+
+async def test_leased_rows_are_not_claimed_twice(db, pending, monkeypatch):
+    release = asyncio.Event()
+
+    async def slow_redis(events):
+        await release.wait()
+        return [event.id for event in events], None
+
+    monkeypatch.setattr(OutboxRelay, "_deliver_redis", staticmethod(slow_redis))
+    monkeypatch.setattr(OutboxRelay, "_deliver_celery", staticmethod(lambda events: _delivered([e.id for e in events])))
+
+    first = asyncio.create_task(OutboxRelay().relay_batch())
+    while not [row for row in await _outbox_rows(db) if row.locked_until is not None]:
+        await asyncio.sleep(0.01)
+    assert await OutboxRelay().relay_batch() == 0
+
+    release.set()
+    assert await first == 2
+
+
+async def test_send_timeout_releases_rows_for_retry(db, pending, monkeypatch):
+    async def hanging_celery(events):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(outbox, "OUTBOX_SEND_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(OutboxRelay, "_deliver_redis", staticmethod(lambda events: _delivered([e.id for e in events])))
+    monkeypatch.setattr(OutboxRelay, "_deliver_celery", staticmethod(hanging_celery))
+
+    assert await OutboxRelay().relay_batch() == 2
+
+    (row,) = await _outbox_rows(db)
+    assert row.topic == OUTBOX_CELERY
+    assert (row.attempts, row.locked_until) == (1, None)
+    assert row.last_error.startswith("celery: timed out")
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+from redis.asyncio.client import Pipeline
+
+from app.core import membership
+from app.core.conf import PRESENCE_TTL_SECONDS
+from app.core.membership import invalidate_project_members
+from app.models.model import ProjectMember
+from app.services import presence_service as presence
+from app.services.presence_service import PresenceService, presence_key, presence_names_key
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis(fake_redis, monkeypatch):
+    fake_redis(presence)
+    client = presence.async_redis_client
+
+    # Every round trip yields to the loop first, like a real network call, so
+    # concurrent callers interleave between their commands
+    def yielding(call):
+        async def wrapper(self, *args, **kwargs):
+            await asyncio.sleep(0)
+            return await call(self, *args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(type(client), "execute_command", yielding(type(client).execute_command))
+    monkeypatch.setattr(Pipeline, "execute", yielding(Pipeline.execute))
+    return client
+
+
+@pytest.fixture
+def published(monkeypatch):
+    events = []
+
+    async def publish(project_id, event_type, user_id, user_name):
+        events.append((project_id, event_type, user_id, user_name))
+
+    monkeypatch.setattr(PresenceService, "publish_presence_event", staticmethod(publish))
+    return events
+
+
+async def _join_from(node_id: str, monkeypatch) -> bool:
+    monkeypatch.setattr(presence, "NODE_ID", node_id)
+    return await PresenceService.join(1, 7, "Ada")
+
+
+async def test_concurrent_joins_on_two_nodes_report_one_join(redis, monkeypatch):
+    joined = await asyncio.gather(_join_from("node-a", monkeypatch), _join_from("node-b", monkeypatch))
+
+    assert sorted(joined) == [False, True]
+    assert await redis.zcard(presence_key(1)) == 2
+
+
+async def test_heartbeat_announces_users_of_dead_nodes(redis, published, monkeypatch):
+    monkeypatch.setattr(presence, "NODE_ID", "live")
+    stale = time.time() - PRESENCE_TTL_SECONDS - 1
+    await redis.zadd(presence_key(1), {"5:dead": stale, "6:dead": stale, "6:live": time.time()})
+    await redis.hset(presence_names_key(1), mapping={"5": "Grace", "6": "Linus"})
+
+    await PresenceService.heartbeat([(1, 6)])
+
+    # User 6 is still present through this node, only user 5 left
+    assert published == [(1, "presence_left", 5, "Grace")]
+    assert await redis.zrange(presence_key(1), 0, -1) == ["6:live"]
+
+
+@pytest.fixture
+def membership_cache(fake_redis, monkeypatch):
+    monkeypatch.setattr(membership, "_local_cache", {})
+    return fake_redis(membership)
+
+
+async def test_presence_endpoint_requires_membership(client, seed, membership_cache):
+    project = seed["project"]
+
+    response = await client.get(f"/api/v1/project/{project.id}/presence", headers=seed["employee_headers"])
+    assert response.status_code == 200, response.text
+
+    # The admin is not a member of the project
+    response = await client.get(f"/api/v1/project/{project.id}/presence", headers=seed["admin_headers"])
+    assert response.status_code == 404, response.text
+
+
+async def test_presence_membership_is_cached(client, seed, membership_cache, query_budget):
+    url = f"/api/v1/project/{seed['project'].id}/presence"
+
+    response = await client.get(url, headers=seed["employee_headers"])
+    assert response.status_code == 200, response.text
+    query_budget(response, 1)
+
+    # Local cache, then Redis once the local entry is gone: no query either way
+    response = await client.get(url, headers=seed["employee_headers"])
+    assert query_budget(response, 0) == 0
+    membership._local_cache.clear()
+    response = await client.get(url, headers=seed["employee_headers"])
+    assert response.status_code == 200, response.text
+    assert query_budget(response, 0) == 0
+
+
+async def test_new_members_are_seen_after_invalidation(client, db, seed, membership_cache):
+    project, admin = seed["project"], seed["admin"]
+    url = f"/api/v1/project/{project.id}/presence"
+    assert (await client.get(url, headers=seed["admin_headers"])).status_code == 404
+
+    db.add(ProjectMember(organization_id=project.organization_id, project_id=project.id, user_id=admin.id))
+    await db.commit()
+    await invalidate_project_members(project.id)
+
+    response = await client.get(url, headers=seed["admin_headers"])
+    assert response.status_code == 200, response.text
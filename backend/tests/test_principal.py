@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from app.core import principal
+from app.core.enums import Role, UserStatus
+from app.core.principal import Principal, get_principal
+
+pytestmark = pytest.mark.anyio
+
+ADA = Principal(id=7, name="Ada", email="ada@example.com", role=Role.EMPLOYEE, status=UserStatus.ACTIVE)
+
+
+async def test_followers_retry_when_the_leader_is_cancelled(monkeypatch):
+    monkeypatch.setattr(principal, "_local_cache", {})
+    loads = []
+
+    async def slow_load(user_id):
+        loads.append(user_id)
+        await asyncio.sleep(0.05)
+        return ADA
+
+    monkeypatch.setattr(principal, "_load", slow_load)
+
+    leader = asyncio.create_task(get_principal(7))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(get_principal(7))
+    await asyncio.sleep(0)
+
+    # The leader's client disconnects mid-lookup
+    leader.cancel()
+
+    assert await asyncio.wait_for(follower, timeout=1) == ADA
+    assert leader.cancelled()
+    assert loads == [7, 7]
+    assert principal._inflight == {}
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from app.core import profiler
+from app.core.profiler import ProfilingMiddleware, list_profiles, save_profile
+
+pytestmark = pytest.mark.anyio
+
+
+def _scope(profile_header: bool = True) -> dict:
+    headers = [(b"authorization", b"Bearer token")]
+    if profile_header:
+        headers.append((b"x-profile", b"1"))
+    return {"type": "http", "headers": headers}
+
+
+async def test_concurrent_admin_checks_share_the_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(profiler, "PROFILE_SAMPLE_RATE", 0)
+
+    async def slow_admin(headers):
+        await asyncio.sleep(0.01)
+        return True
+
+    monkeypatch.setattr(profiler, "_is_admin", slow_admin)
+    middleware = ProfilingMiddleware(app=None)
+
+    triggers = await asyncio.gather(*(middleware._trigger(_scope()) for _ in range(5)))
+
+    assert triggers.count("header") == 1
+    # The winner's slot stays reserved for its request
+    assert middleware.active == 1
+
+
+async def test_slot_is_released_when_nothing_triggers(monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_SAMPLE_RATE", 0)
+
+    async def not_admin(headers):
+        return False
+
+    monkeypatch.setattr(profiler, "_is_admin", not_admin)
+    middleware = ProfilingMiddleware(app=None)
+
+    assert await middleware._trigger(_scope()) is None
+    assert await middleware._trigger(_scope(profile_header=False)) is None
+    assert middleware.active == 0
+
+
+def _write_profile(directory, request_id: str, mtime: float):
+    path = os.path.join(directory, f"{request_id}.json")
+    with open(path, "w", encoding="utf-8") as out:
+        json.dump({"request_id": request_id, "collapsed": "main 1"}, out)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+async def test_list_profiles_skips_profiles_pruned_meanwhile(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    _write_profile(tmp_path, "kept", 2)
+    pruned = _write_profile(tmp_path, "pruned", 1)
+
+    # Another worker prunes the oldest profile between listing and reading
+    listed = profiler._profiles_by_age
+
+    def prune_after_listing():
+        entries = listed()
+        os.remove(pruned)
+        return entries
+
+    monkeypatch.setattr(profiler, "_profiles_by_age", prune_after_listing)
+
+    assert list_profiles() == [{"request_id": "kept"}]
+
+
+async def test_save_profile_tolerates_a_concurrent_prune(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiler, "PROFILE_KEEP", 1)
+    oldest = _write_profile(tmp_path, "oldest", 1)
+
+    listed = profiler._profiles_by_age
+
+    def pruned_by_other_worker():
+        entries = listed()
+        os.remove(oldest)
+        return entries
+
+    monkeypatch.setattr(profiler, "_profiles_by_age", pruned_by_other_worker)
+
+    save_profile({"request_id": "newest"})
+
+    assert os.listdir(tmp_path) == ["newest.json"]
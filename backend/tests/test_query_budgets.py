@@ -0,0 +1,111 @@
+"""
+SQL statement budgets per router.
+
+Each test makes a representative request with enough rows behind it (several
+issues, assignees, sprints) that a per-row query would show up as a higher
+count; the budgets are the counts of the current queries, so a new lazy load
+or N+1 fails here instead of in production. Raise a budget only together with
+the change that needs the extra statement.
+"""
+import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.core.enums import IssueStatus, IssueType, Priority, SprintStatus
+from app.core.security import hash_password
+from app.models.model import Sprint, Issue, Logs
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def board(db, seed):
+    """Two sprints with six issues spread over both seed users, and one work log"""
+    manager, employee, project = seed["manager"], seed["employee"], seed["project"]
+    sprints = [
+        Sprint(sprint_id=f"SPR-{n}", name=f"Sprint {n}", project_id=project.id, status=SprintStatus.IN_PROGRESS)
+        for n in (1, 2)
+    ]
+    db.add_all(sprints)
+    await db.flush()
+    issues = [
+        Issue(
+            name=f"Issue {n}",
+            story_point=n,
+            status=IssueStatus.IN_PROGRESS if n % 2 else IssueStatus.TODO,
+            type=IssueType.TASK,
+            priority=Priority.MODERATE,
+            sprint_id=sprints[n % 2].id,
+            project_id=project.id,
+            assigned_to=employee.id if n % 3 else manager.id,
+            assigned_by=manager.id,
+            time_estimate=Decimal(n),
+        )
+        for n in range(1, 7)
+    ]
+    db.add_all(issues)
+    await db.flush()
+    log = Logs(issue_id=issues[0].id, log_id="LOG-1", date=datetime.date.today(), hour_worked=Decimal(2))
+    db.add(log)
+    await db.commit()
+    return {**seed, "sprints": sprints, "issues": issues, "log": log}
+
+
+async def test_auth_login(client, db, seed, query_budget):
+    seed["manager"].password = await hash_password("correct horse")
+    await db.commit()
+
+    response = await client.post("/api/v1/auth/login", json={"email": "manager@example.com", "password": "correct horse"})
+    assert response.status_code == 200, response.text
+    query_budget(response, 1)
+
+
+async def test_dashboard_employee(client, board, query_budget):
+    response = await client.get("/api/v1/dashboard/employee", headers=board["employee_headers"])
+    assert response.status_code == 200, response.text
+    query_budget(response, 4)
+
+
+async def test_project_list(client, board, query_budget):
+    response = await client.get("/api/v1/project/", headers=board["manager_headers"])
+    assert response.status_code == 200, response.text
+    query_budget(response, 3)
+
+
+async def test_organization_list(client, board, query_budget):
+    response = await client.get("/api/v1/organization/", headers=board["manager_headers"])
+    assert response.status_code == 200, response.text
+    query_budget(response, 2)
+
+
+async def test_user_team(client, board, query_budget):
+    manager = board["manager"]
+    response = await client.get(f"/api/v1/user/{manager.id}/team", headers=board["manager_headers"])
+    assert response.status_code == 200, response.text
+    query_budget(response, 3)
+
+
+async def test_issue_list(client, board, query_budget):
+    response = await client.get("/api/v1/issue/", headers=board["manager_headers"])
+    assert response.status_code == 200, response.text
+    assert response.json()["issue_count"] == 6
+    query_budget(response, 7)
+
+
+async def test_sprint_list(client, board, query_budget):
+    response = await client.get("/api/v1/sprint/", headers=board["manager_headers"])
+    assert response.status_code == 200, response.text
+    query_budget(response, 9)
+
+
+async def test_log_by_id(client, board, query_budget):
+    response = await client.get(f"/api/v1/logs/{board['log'].id}", headers=board["employee_headers"])
+    assert response.status_code == 200, response.text
+    query_budget(response, 2)
+
+
+async def test_admin_slow_queries(client, seed, query_budget):
+    response = await client.get("/api/v1/admin/slow-queries", headers=seed["admin_headers"])
+    assert response.status_code == 200, response.text
+    query_budget(response, 1)
@@ -0,0 +1,28 @@
+from app.services import slow_query_log as module
+from app.services.slow_query_log import SlowQueryLog
+
+LOGIN = "SELECT users.id FROM users WHERE users.email = $1 AND users.password = $2"
+INSERT = "INSERT INTO audit_log (user_id, token) VALUES ($1, $2)"
+
+
+def test_parameters_are_redacted_by_default():
+    log = SlowQueryLog()
+
+    log.record(LOGIN, ("dev@example.com", "$2b$12$hash"), 250)
+    log.record(INSERT, [(1, "secret-token"), (2, "other-token")], 250, executemany=True)
+
+    login, insert = log.entries
+    assert login["parameters"] == ["<str>", "<str>"]
+    assert insert["parameters"] == "<2 parameter sets>"
+    assert "example.com" not in repr(list(log.entries))
+
+
+def test_parameters_are_kept_when_enabled(monkeypatch):
+    monkeypatch.setattr(module, "DB_SLOW_QUERY_PARAMETERS", True)
+    log = SlowQueryLog()
+
+    log.record(LOGIN, ("dev@example.com", "x" * 300), 250)
+
+    (entry,) = log.entries
+    assert entry["parameters"][0] == "'dev@example.com'"
+    assert entry["parameters"][1].endswith("...(302 chars)")
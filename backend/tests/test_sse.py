@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.api.v1 import sse
+from app.common.errors import CredentialError
+from app.core import middleware
+from app.core.conf import SSE_QUEUE_SIZE
+from app.core.dependencies import get_principal_from_token
+from app.core.enums import Role, UserStatus
+from app.core.event_codec import EncodedEvent
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+from app.core.connection_registry import NO_FILTER
+from app.core.principal import Principal
+from app.core.websocket_manager import ConnectionManager, SseStream
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_shutdown_ends_a_stream_with_a_full_queue():
+    manager = ConnectionManager()
+    stream = await manager.open_stream(project_id=1, user_id=7, filters=NO_FILTER)
+    for n in range(SSE_QUEUE_SIZE + 1):
+        stream.offer(EncodedEvent.from_message({"type": "issue_updated", "data": {"n": n}}))
+    assert stream.queue.full()
+
+    await manager.shutdown()
+
+    assert await stream.next_event(timeout=1) is None
+    assert manager.sse_streams == {}
+
+
+async def test_closing_wakes_a_waiting_stream():
+    stream = SseStream(project_id=1, user_id=7, filters=NO_FILTER)
+    waiting = asyncio.create_task(stream.next_event(timeout=5))
+    await asyncio.sleep(0)
+
+    stream.closed.set()
+
+    assert await asyncio.wait_for(waiting, timeout=1) is None
+
+
+async def test_next_event_times_out_when_idle():
+    stream = SseStream(project_id=1, user_id=7, filters=NO_FILTER)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await stream.next_event(timeout=0.01)
+
+
+async def test_streams_are_left_out_of_request_metrics():
+    in_flight = []
+
+    async def app(scope, receive, send):
+        in_flight.append(HTTP_REQUESTS_IN_FLIGHT.labels("GET").value)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    def observed() -> int:
+        child = HTTP_REQUEST_DURATION.labels("GET", "<unmatched>", 200)
+        return sum(child.counts)
+
+    before = observed()
+    for path in ("/api/v1/sse/issues/1", "/api/v1/issue/1"):
+        scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+        await middleware.RequestContextMiddleware(app)(scope, None, send)
+
+    # Only the plain request was counted in flight and in the latency histogram
+    assert in_flight[1] == in_flight[0] + 1
+    assert observed() == before + 1
+
+
+async def test_stream_tokens_are_checked_like_request_tokens():
+    with pytest.raises(CredentialError, match="Authentication required"):
+        await get_principal_from_token(None)
+    with pytest.raises(CredentialError, match="Invalid token"):
+        await get_principal_from_token("not-a-jwt")
+
+
+async def test_stream_is_registered_only_once_the_response_streams(monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr(sse, "manager", manager)
+
+    async def authenticate(request):
+        return Principal(id=7, name="Ada", email="ada@example.com", role=Role.EMPLOYEE, status=UserStatus.ACTIVE)
+
+    monkeypatch.setattr(sse, "_authenticate", authenticate)
+    request = Request({"type": "http", "method": "GET", "path": "/api/v1/sse/issues/1", "query_string": b"", "headers": []})
+
+    response = await sse.project_event_stream(1, request)
+    # A client that disconnects now leaves nothing behind
+    assert manager.sse_streams == {}
+
+    body = response.body_iterator
+    assert (await body.__anext__()).startswith("retry:")
+    assert len(manager.sse_streams[1]) == 1
+    await body.aclose()
+    assert manager.sse_streams == {}
+    await manager.shutdown()
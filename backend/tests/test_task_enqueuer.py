@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.services import task_enqueuer
+from app.services.task_enqueuer import CeleryEnqueuer
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def enqueuer(tmp_path, monkeypatch):
+    enqueuer = CeleryEnqueuer()
+    monkeypatch.setattr(task_enqueuer, "spool_path_for", lambda pid: str(tmp_path / f"celery_spool.{pid}.jsonl"))
+    monkeypatch.setattr(task_enqueuer, "CELERY_SPOOL_RETRY_SECONDS", 0.05)
+    sent = []
+    monkeypatch.setattr(CeleryEnqueuer, "_send_batch", staticmethod(lambda batch: sent.extend(batch)))
+    enqueuer.sent = sent
+    yield enqueuer
+    enqueuer._executor.shutdown(wait=False)
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+async def test_replay_skips_torn_lines(enqueuer):
+    enqueuer.spool_path = task_enqueuer.spool_path_for(os.getpid())
+    with open(enqueuer.spool_path, "w", encoding="utf-8") as spool:
+        spool.write(json.dumps({"task": "send_template_email_task", "kwargs": {"template": "invite"}}) + "\n")
+        spool.write('{"task": "send_template_email_ta\n')
+        spool.write(json.dumps({"task": "send_template_email_task", "kwargs": {"template": "digest"}}) + "\n")
+
+    await enqueuer._maybe_replay_spool()
+
+    assert [kwargs["template"] for _, kwargs, _, _ in enqueuer.sent] == ["invite", "digest"]
+    assert not os.path.exists(enqueuer.spool_path)
+
+
+async def test_flusher_survives_replay_errors(enqueuer, monkeypatch):
+    calls = []
+
+    async def failing_replay():
+        calls.append(1)
+        if len(calls) <= 3:
+            raise FileNotFoundError("spool vanished")
+
+    monkeypatch.setattr(enqueuer, "_maybe_replay_spool", failing_replay)
+    monkeypatch.setattr(task_enqueuer, "FLUSHER_MAX_BACKOFF_SECONDS", 0)
+    enqueuer.start()
+    await asyncio.sleep(0.3)
+
+    enqueuer.enqueue("send_template_email_task", {"template": "invite"})
+    for _ in range(50):
+        if enqueuer.sent:
+            break
+        await asyncio.sleep(0.02)
+    await enqueuer.stop()
+
+    assert len(calls) > 3
+    assert [task_name for task_name, _, _, _ in enqueuer.sent] == ["send_template_email_task"]
+
+
+async def test_overflow_is_spooled_off_the_loop(enqueuer):
+    enqueuer.start()
+    enqueuer.task.cancel()
+    enqueuer.buffer = asyncio.Queue(maxsize=1)
+    enqueuer.enqueue("send_template_email_task", {"template": "a"})
+    enqueuer.enqueue("send_template_email_task", {"template": "b"})
+    for _ in range(50):
+        if enqueuer.counters["spooled"]:
+            break
+        await asyncio.sleep(0.02)
+
+    with open(enqueuer.spool_path, encoding="utf-8") as spool:
+        assert [json.loads(line)["kwargs"]["template"] for line in spool] == ["b"]
+
+
+def test_spools_of_stopped_processes_are_adopted(enqueuer, tmp_path):
+    orphan = task_enqueuer.spool_path_for(_dead_pid())
+    with open(orphan, "w", encoding="utf-8") as spool:
+        spool.write(json.dumps({"task": "send_template_email_task", "kwargs": {}}) + "\n")
+    living = task_enqueuer.spool_path_for(os.getppid())
+    with open(living, "w", encoding="utf-8") as spool:
+        spool.write(json.dumps({"task": "send_template_email_task", "kwargs": {}}) + "\n")
+
+    enqueuer.spool_path = task_enqueuer.spool_path_for(os.getpid())
+    enqueuer._adopt_orphaned_spools()
+
+    assert not os.path.exists(orphan)
+    # Another running worker's spool is left alone
+    assert os.path.exists(living)
+    assert enqueuer._spool_size() == 1
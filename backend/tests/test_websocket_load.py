@@ -0,0 +1,149 @@
+"""
+Connection storm against the WebSocket handshake.
+
+1000 sockets from 250 users connect at once while HTTP requests keep coming
+in. Authentication goes through app.core.principal: a lookup per user shared
+by every concurrent connect of that user (single-flight), at most
+PRINCIPAL_DB_CONCURRENCY of them on the database at a time, and nothing held
+past the lookup. The engine pool (pool_size 5, max_overflow 5) must never be
+exhausted, so HTTP requests in the middle of the storm still get connections.
+
+Redis may be unreachable here: the principal cache then misses and every
+distinct user goes to the database, the worst case for the pool.
+"""
+import asyncio
+import random
+
+import pytest
+from sqlalchemy import event, insert, select
+
+from app.core import principal
+from app.core.conf import PRINCIPAL_DB_CONCURRENCY
+from app.core.enums import Role, UserStatus
+from app.core.security import create_access_token
+from app.core.websocket_manager import manager
+from app.db.connection import engine
+from app.models.model import User
+from main import app
+
+pytestmark = pytest.mark.anyio
+
+CONNECTIONS = 1000
+USERS = 250
+HTTP_REQUESTS = 20
+
+
+class StormSocket:
+    """Client side of one in-process WebSocket: connects, waits for the welcome frame, then hangs up"""
+
+    def __init__(self, path: str, token: str):
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": f"token={token}".encode(),
+            "headers": [(b"host", b"test")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("test", 80),
+            "subprotocols": [],
+        }
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.inbox.put_nowait({"type": "websocket.connect"})
+        self.welcomed = asyncio.Event()
+        self.closed_with = None
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    async def send(self, message):
+        if message["type"] == "websocket.send":
+            self.welcomed.set()
+        elif message["type"] == "websocket.close":
+            self.closed_with = message.get("code")
+            self.welcomed.set()
+
+    def hang_up(self):
+        self.inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+
+
+@pytest.fixture
+async def storm_users(db, seed):
+    project = seed["project"]
+    await db.execute(insert(User), [
+        {"name": f"User {n}", "email": f"user{n}@example.com", "role": Role.EMPLOYEE, "status": UserStatus.ACTIVE}
+        for n in range(USERS)
+    ])
+    await db.commit()
+    user_ids = (await db.execute(select(User.id).where(User.email.like("user%@example.com")))).scalars().all()
+    tokens = {user_id: await create_access_token({"user_id": user_id}) for user_id in user_ids}
+    return project, tokens
+
+
+@pytest.fixture
+def pool_checkouts():
+    """Current and peak connections checked out of the engine pool"""
+    counts = {"current": 0, "peak": 0}
+
+    def on_checkout(*args):
+        counts["current"] += 1
+        counts["peak"] = max(counts["peak"], counts["current"])
+
+    def on_checkin(*args):
+        counts["current"] -= 1
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "checkin", on_checkin)
+    yield counts
+    event.remove(engine.sync_engine, "checkout", on_checkout)
+    event.remove(engine.sync_engine, "checkin", on_checkin)
+
+
+async def test_connect_storm_stays_within_the_pool(client, seed, storm_users, pool_checkouts, monkeypatch):
+    project, tokens = storm_users
+    # Ids restart in every test, principals cached by earlier tests would be wrong
+    monkeypatch.setattr(principal, "_local_cache", {})
+    monkeypatch.setattr(principal, "_db_semaphore", asyncio.Semaphore(PRINCIPAL_DB_CONCURRENCY))
+
+    # Lookups that got past the semaphore, i.e. hold a pool connection
+    loads = {"calls": 0, "running": 0, "peak": 0}
+    get_user_by_id = principal.get_user_by_id
+
+    async def counting_lookup(**kwargs):
+        loads["calls"] += 1
+        loads["running"] += 1
+        loads["peak"] = max(loads["peak"], loads["running"])
+        try:
+            return await get_user_by_id(**kwargs)
+        finally:
+            loads["running"] -= 1
+
+    monkeypatch.setattr(principal, "get_user_by_id", counting_lookup)
+
+    user_ids = [user_id for user_id in tokens for _ in range(CONNECTIONS // USERS)]
+    random.shuffle(user_ids)
+    sockets = [StormSocket(f"/api/v1/ws/issues/{project.id}", tokens[user_id]) for user_id in user_ids]
+    handlers = [asyncio.create_task(app(socket.scope, socket.receive, socket.send)) for socket in sockets]
+
+    http_responses = await asyncio.gather(*(
+        client.get("/api/v1/project/", headers=seed["manager_headers"]) for _ in range(HTTP_REQUESTS)
+    ))
+    await asyncio.wait_for(asyncio.gather(*(socket.welcomed.wait() for socket in sockets)), timeout=60)
+
+    try:
+        assert [socket.closed_with for socket in sockets if socket.closed_with is not None] == []
+        assert len(manager.registry) == CONNECTIONS
+        assert [response.status_code for response in http_responses] == [200] * HTTP_REQUESTS
+
+        # Single-flight: at most one database lookup per user, however many sockets they open
+        assert loads["calls"] <= USERS
+        assert loads["peak"] <= PRINCIPAL_DB_CONCURRENCY
+        assert pool_checkouts["peak"] <= engine.pool.size() + engine.pool._max_overflow
+        # Nothing is held once the handshakes are done, the sockets stay open without a connection
+        assert pool_checkouts["current"] == 0
+    finally:
+        for socket in sockets:
+            socket.hang_up()
+        await asyncio.wait_for(asyncio.gather(*handlers, return_exceptions=True), timeout=30)
+        await manager.shutdown()